@@ -2,19 +2,26 @@ from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 
-db = SQLAlchemy()
+from config import Config
+from app.banco import SessaoRoteada
+
+db = SQLAlchemy(session_options={'class_': SessaoRoteada})
 migrate = Migrate()
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
-    
-    app.config['SECRET_KEY'] = 'chave-secreta'
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///sgsv.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.from_object(config_class)
+
+    # Banco: pool por worker, engine somente leitura e PRAGMAs do SQLite (WAL, busy_timeout...)
+    from app.banco import configurar_banco, registrar_engines
+    configurar_banco(app)
 
     db.init_app(app)
     migrate.init_app(app, db)
 
+    with app.app_context():
+        registrar_engines(db, app.config)
+
     # -----------------------------------
     # TRATAMENTO DE ERROS (1 HTML só)
     # -----------------------------------
@@ -49,6 +56,28 @@ def create_app():
     from app.routes import bp
     app.register_blueprint(bp)
 
+    from app.rotas_exportacao import bp as exportacao_bp
+    app.register_blueprint(exportacao_bp)
+
     from app import models  
 
+    # Comandos de linha (flask reconstruir-mensal / reconstruir-busca / verificar-indices / importar-ceps / geocodificar-pendentes / inicializar-banco)
+    from app.mensal import reconstruir_mensal_command
+    app.cli.add_command(reconstruir_mensal_command)
+
+    from app.busca import reconstruir_busca_command
+    app.cli.add_command(reconstruir_busca_command)
+
+    from app.indices import verificar_indices_command
+    app.cli.add_command(verificar_indices_command)
+
+    from app.cep import importar_ceps_command
+    app.cli.add_command(importar_ceps_command)
+
+    from app.geocodificacao import geocodificar_pendentes_command
+    app.cli.add_command(geocodificar_pendentes_command)
+
+    from app.inicializacao import inicializar_banco_command
+    app.cli.add_command(inicializar_banco_command)
+
     return app
@@ -0,0 +1,129 @@
+from collections import Counter
+from datetime import datetime, MINYEAR, MAXYEAR
+
+from app import db
+from app.models import Usuario, Solicitacao
+
+
+# =======================================================================
+# Função Auxiliar de Filtros (Reutilizada em todas as rotas)
+# =======================================================================
+
+def intervalo_mes(filtro_data):
+    """Converte 'AAAA-MM' no intervalo semiaberto [início do mês, início do mês seguinte)."""
+    ano, mes = (int(parte) for parte in filtro_data.split('-'))
+    inicio = datetime(ano, mes, 1)
+    fim = datetime(ano + 1, 1, 1) if mes == 12 else datetime(ano, mes + 1, 1)
+    return inicio, fim
+
+
+def ler_mes_ano(args):
+    """
+    (ano, mes) do relatório lidos da query string. Mês fora de 1..12, ano
+    fora do calendário ou valor não numérico caem no mês atual, em vez de
+    estourar ValueError no intervalo_mes.
+    """
+    agora = datetime.now()
+    ano = args.get('ano', agora.year, type=int)
+    mes = args.get('mes', agora.month, type=int)
+    if not (1 <= mes <= 12 and MINYEAR <= ano < MAXYEAR):
+        return agora.year, agora.month
+    return ano, mes
+
+
+def aplicar_filtros_base(query, filtro_data, uvis_id):
+    """Aplica o filtro de mês/ano e opcionalmente o filtro de UVIS (usuario_id)."""
+
+    # Filtro de Mês/Ano (obrigatório) como intervalo em data_criacao,
+    # para que o índice ix_solicitacoes_data_usuario_status seja usado
+    inicio, fim = intervalo_mes(filtro_data)
+    query = query.filter(
+        Solicitacao.data_criacao >= inicio,
+        Solicitacao.data_criacao < fim
+    )
+
+    # Filtro de UVIS (opcional)
+    if uvis_id:
+        query = query.filter(Solicitacao.usuario_id == uvis_id)
+
+    return query
+
+
+# =======================================================================
+# Agregação única para Relatórios (HTML, PDF e Excel)
+# =======================================================================
+
+def _ordenar(contador):
+    """Converte um Counter em lista de tuplas (chave, total), maior primeiro (empate: pela chave)."""
+    return sorted(contador.items(), key=lambda item: (-item[1], str(item[0] or '')))
+
+
+def consulta_agregada(filtro_data, uvis_id=None):
+    """Contagem por combinação de todas as dimensões do relatório (poucas linhas)."""
+    query = db.session.query(
+        Usuario.regiao,
+        Usuario.nome_uvis,
+        Usuario.tipo_usuario,
+        Solicitacao.status,
+        Solicitacao.foco,
+        Solicitacao.tipo_visita,
+        Solicitacao.altura_voo,
+        db.func.count(Solicitacao.id)
+    ).join(Usuario, Usuario.id == Solicitacao.usuario_id)
+
+    query = aplicar_filtros_base(query, filtro_data, uvis_id).group_by(
+        Usuario.regiao,
+        Usuario.nome_uvis,
+        Usuario.tipo_usuario,
+        Solicitacao.status,
+        Solicitacao.foco,
+        Solicitacao.tipo_visita,
+        Solicitacao.altura_voo
+    )
+    return query
+
+
+def resumir(linhas):
+    """
+    Pivota linhas (regiao, nome_uvis, tipo_usuario, status, foco,
+    tipo_visita, altura_voo, quantidade) nos totais e agrupamentos do
+    relatório: o dict com as chaves usadas pelo template 'relatorios.html'.
+    """
+    regiao, status, foco = Counter(), Counter(), Counter()
+    tipo_visita, altura_voo, unidade = Counter(), Counter(), Counter()
+    total = 0
+
+    for r_regiao, r_nome, r_tipo_usuario, r_status, r_foco, r_tipo, r_altura, qtd in linhas:
+        total += qtd
+        regiao[r_regiao] += qtd
+        status[r_status] += qtd
+        foco[r_foco] += qtd
+        tipo_visita[r_tipo] += qtd
+        altura_voo[r_altura] += qtd
+        # Unidades: somente usuários do tipo UVIS
+        if r_tipo_usuario == 'uvis':
+            unidade[r_nome] += qtd
+
+    return {
+        'total_solicitacoes': total,
+        'total_aprovadas': status.get("APROVADO", 0),
+        'total_recusadas': status.get("NEGADO", 0),
+        'total_analise': status.get("EM ANÁLISE", 0),
+        'total_pendentes': status.get("PENDENTE", 0),
+        'dados_regiao': _ordenar(regiao),
+        'dados_status': _ordenar(status),
+        'dados_foco': _ordenar(foco),
+        'dados_tipo_visita': _ordenar(tipo_visita),
+        'dados_altura_voo': _ordenar(altura_voo),
+        'dados_unidade': _ordenar(unidade),
+    }
+
+
+def agregar_solicitacoes(filtro_data, uvis_id=None):
+    """
+    Calcula todos os totais e agrupamentos do relatório com UMA consulta.
+
+    A consulta agrupa pela combinação de todas as dimensões e o resultado
+    (poucas linhas) é pivotado em Python.
+    """
+    return resumir(consulta_agregada(filtro_data, uvis_id))
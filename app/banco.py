@@ -0,0 +1,187 @@
+import os
+from functools import wraps
+from pathlib import Path
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+# -------------------------------------------------------------
+# CONFIGURAÇÃO DO BANCO (engine, pool e PRAGMAs do SQLite)
+# -------------------------------------------------------------
+# A URL vem de config.Config (DATABASE_URL ou instance/sgsv.db). Para
+# SQLite cada conexão nova recebe os PRAGMAs abaixo:
+#
+#   journal_mode=WAL     leitores não esperam o escritor (e vice-versa)
+#   synchronous=NORMAL   com WAL, fsync só no checkpoint (seguro contra queda do processo)
+#   busy_timeout         escritores concorrentes esperam em vez de "database is locked"
+#   cache_size/mmap_size páginas quentes em memória por conexão / leitura via mmap
+#
+# Com PostgreSQL nada disso se aplica: só o pool é dimensionado.
+#
+# Rotas marcadas com @somente_leitura (relatórios, exportações, agenda)
+# consultam por um segundo engine: a réplica em DATABASE_REPLICA_URL ou,
+# no SQLite, o mesmo arquivo aberto com mode=ro. Assim as varreduras
+# longas dos relatórios não disputam o pool (nem o lock) das gravações.
+
+CHAVE_LEITURA = 'leitura'  # bind do engine somente leitura
+
+
+def eh_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def _sqlite_em_memoria(uri):
+    return make_url(uri).database in (None, '', ':memory:')
+
+
+def opcoes_engine(config):
+    """SQLALCHEMY_ENGINE_OPTIONS para a URL configurada."""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if eh_sqlite(uri) and _sqlite_em_memoria(uri):
+        return {}  # pool próprio do SQLAlchemy (conexão única)
+
+    opcoes = {
+        'pool_size': config.get('BANCO_POOL_TAMANHO', 8),
+        'max_overflow': config.get('BANCO_POOL_EXTRA', 4),
+        'pool_timeout': config.get('BANCO_POOL_ESPERA', 30),
+    }
+    if eh_sqlite(uri):
+        # O sqlite3 também espera o lock por conta própria (segundos)
+        opcoes['connect_args'] = {'timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}
+    else:
+        opcoes['pool_pre_ping'] = True
+        opcoes['pool_recycle'] = config.get('BANCO_POOL_RECICLAR', 1800)
+    return opcoes
+
+
+def pragmas_sqlite(config, somente_leitura=False):
+    # Modo do journal e sincronismo são do arquivo: só a conexão de escrita define
+    escrita = () if somente_leitura else (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+    )
+    return escrita + (
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))),
+        ('cache_size', -int(config.get('SQLITE_CACHE_KB', 20000))),  # negativo = KiB
+        ('mmap_size', int(config.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024))),
+        ('temp_store', 'MEMORY'),
+    )
+
+
+def _caminho_sqlite(uri, instance_path):
+    caminho = make_url(uri).database
+    return caminho if os.path.isabs(caminho) else os.path.join(instance_path, caminho)
+
+
+def url_leitura(config, instance_path):
+    """
+    URL do engine somente leitura: a réplica configurada ou, para um
+    arquivo SQLite, o mesmo arquivo como URI com mode=ro. None se não houver.
+    """
+    if config.get('SQLALCHEMY_LEITURA_URI'):
+        return config['SQLALCHEMY_LEITURA_URI']
+
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if not eh_sqlite(uri) or _sqlite_em_memoria(uri):
+        return None
+
+    arquivo = Path(_caminho_sqlite(uri, instance_path)).resolve().as_uri()
+    return make_url(uri).set(database=arquivo, query={'mode': 'ro', 'uri': 'true'})
+
+
+def configurar_banco(app):
+    """Chamado em create_app antes de db.init_app: URL, pool, engine de leitura e pasta do arquivo."""
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', opcoes_engine(app.config))
+
+    if eh_sqlite(uri) and not _sqlite_em_memoria(uri):
+        os.makedirs(os.path.dirname(_caminho_sqlite(uri, app.instance_path)), exist_ok=True)
+
+    leitura = url_leitura(app.config, app.instance_path)
+    if leitura is not None:
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.setdefault(CHAVE_LEITURA, {
+            **opcoes_engine({**app.config, 'SQLALCHEMY_DATABASE_URI': leitura}),
+            'url': leitura,
+        })
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def registrar_pragmas(engine, config, somente_leitura=False):
+    """Aplica os PRAGMAs em cada conexão nova do engine (só SQLite)."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = pragmas_sqlite(config, somente_leitura)
+
+    @event.listens_for(engine, 'connect')
+    def _aplicar_pragmas(conexao, registro):
+        cursor = conexao.cursor()
+        try:
+            for nome, valor in pragmas:
+                cursor.execute(f"PRAGMA {nome} = {valor}")
+        finally:
+            cursor.close()
+
+
+def registrar_engines(db, config):
+    """PRAGMAs do engine principal e do engine somente leitura (se houver)."""
+    registrar_pragmas(db.engine, config)
+    if CHAVE_LEITURA in db.engines:
+        registrar_pragmas(db.engines[CHAVE_LEITURA], config, somente_leitura=True)
+
+
+# -------------------------------------------------------------
+# UPSERT (INSERT ... ON CONFLICT) no dialeto do banco
+# -------------------------------------------------------------
+def insert_upsert(modelo):
+    """
+    insert(modelo) do dialeto atual, com on_conflict_do_update/do_nothing.
+    Contadores e caches usam isso para gravar numa instrução só, sem ler
+    a linha antes (o que perderia incrementos com gravações concorrentes).
+    """
+    from app import db
+
+    dialeto = db.engine.dialect.name
+    if dialeto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialeto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise NotImplementedError(f"UPSERT não suportado no banco '{dialeto}'.")
+    return insert(modelo)
+
+
+# -------------------------------------------------------------
+# Roteamento da sessão (rotas somente leitura)
+# -------------------------------------------------------------
+def em_leitura():
+    return has_app_context() and g.get('somente_leitura', False)
+
+
+class SessaoRoteada(Session):
+    """db.session: nas rotas @somente_leitura todas as consultas vão para o engine de leitura."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and em_leitura():
+            engine = self._db.engines.get(CHAVE_LEITURA)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def somente_leitura(view):
+    """
+    Marca a rota como só de consulta: a sessão da requisição passa a usar o
+    engine de leitura (uma gravação nela falha em vez de ir para o principal).
+    Rotas que exibem o que o usuário acabou de gravar ficam no principal,
+    porque uma réplica pode estar atrasada.
+    """
+    @wraps(view)
+    def decorada(*args, **kwargs):
+        g.somente_leitura = True
+        return view(*args, **kwargs)
+    return decorada
@@ -0,0 +1,182 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text, select, or_, and_, bindparam, literal_column, table, column
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import Usuario, Solicitacao
+
+
+# -------------------------------------------------------------
+# BUSCA TEXTUAL (SQLite FTS5, tokenizer trigram)
+# -------------------------------------------------------------
+# A tabela virtual solicitacoes_busca guarda, por solicitação (rowid = id),
+# o nome e a região da UVIS e os campos de endereço/protocolo/observação.
+# Triggers no banco a mantêm em dia. O tokenizer trigram indexa trechos de
+# 3 letras, então "contém" (LIKE '%...%') vira consulta no índice, sem
+# varrer o JOIN. Fora do SQLite (ou sem FTS5) cai para ILIKE normal.
+
+TABELA_BUSCA = 'solicitacoes_busca'
+COLUNAS_BUSCA = ('nome_uvis', 'regiao', 'logradouro', 'bairro', 'cep', 'protocolo', 'observacao')
+TAMANHO_MINIMO = 3  # trigram: termos menores não usam o índice
+
+_busca = table(TABELA_BUSCA, column('rowid'), *[column(nome) for nome in COLUNAS_BUSCA])
+
+_VALORES_NOVOS = """
+    new.id,
+    (SELECT nome_uvis FROM usuarios WHERE id = new.usuario_id),
+    (SELECT regiao FROM usuarios WHERE id = new.usuario_id),
+    new.logradouro, new.bairro, new.cep, new.protocolo, new.observacao
+"""
+
+DDL_BUSCA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_BUSCA}
+        USING fts5({', '.join(COLUNAS_BUSCA)}, tokenize='trigram')""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS solicitacoes_busca_ai AFTER INSERT ON solicitacoes BEGIN
+        INSERT INTO {TABELA_BUSCA}(rowid, {', '.join(COLUNAS_BUSCA)}) VALUES ({_VALORES_NOVOS});
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS solicitacoes_busca_au
+        AFTER UPDATE OF usuario_id, logradouro, bairro, cep, protocolo, observacao ON solicitacoes BEGIN
+        DELETE FROM {TABELA_BUSCA} WHERE rowid = old.id;
+        INSERT INTO {TABELA_BUSCA}(rowid, {', '.join(COLUNAS_BUSCA)}) VALUES ({_VALORES_NOVOS});
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS solicitacoes_busca_ad AFTER DELETE ON solicitacoes BEGIN
+        DELETE FROM {TABELA_BUSCA} WHERE rowid = old.id;
+    END""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS usuarios_busca_au AFTER UPDATE OF nome_uvis, regiao ON usuarios BEGIN
+        UPDATE {TABELA_BUSCA} SET nome_uvis = new.nome_uvis, regiao = new.regiao
+        WHERE rowid IN (SELECT id FROM solicitacoes WHERE usuario_id = new.id);
+    END""",
+]
+
+_disponivel = {}
+
+
+def busca_disponivel():
+    """True se o banco atual tem o índice FTS5 (resultado guardado por engine)."""
+    engine = db.engine
+    if engine.url not in _disponivel:
+        existe = False
+        if engine.dialect.name == 'sqlite':
+            existe = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nome"),
+                {'nome': TABELA_BUSCA}
+            ).scalar() is not None
+        _disponivel[engine.url] = existe
+    return _disponivel[engine.url]
+
+
+def garantir_indice_busca():
+    """
+    Cria a tabela e os triggers (se o banco for SQLite com FTS5) e popula
+    o índice quando ele acabou de ser criado. Retorna True se ficou ativo.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    ja_existia = busca_disponivel()
+    try:
+        for ddl in DDL_BUSCA:
+            db.session.execute(text(ddl))
+        db.session.commit()
+    except OperationalError:
+        # SQLite compilado sem FTS5/trigram: segue com ILIKE
+        db.session.rollback()
+        return False
+
+    _disponivel[db.engine.url] = True
+    if not ja_existia:
+        reconstruir_busca()
+    return True
+
+
+def reconstruir_busca():
+    """Recria o conteúdo do índice a partir das tabelas. Retorna o nº de linhas."""
+    db.session.execute(text(f"DELETE FROM {TABELA_BUSCA}"))
+    db.session.execute(text(f"""
+        INSERT INTO {TABELA_BUSCA}(rowid, {', '.join(COLUNAS_BUSCA)})
+        SELECT s.id, u.nome_uvis, u.regiao, s.logradouro, s.bairro, s.cep, s.protocolo, s.observacao
+        FROM solicitacoes s LEFT JOIN usuarios u ON u.id = s.usuario_id
+    """))
+    db.session.commit()
+    return db.session.execute(text(f"SELECT count(*) FROM {TABELA_BUSCA}")).scalar()
+
+
+# -------------------------------------------------------------
+# Filtros
+# -------------------------------------------------------------
+def _colunas_origem():
+    return {
+        'nome_uvis': Usuario.nome_uvis,
+        'regiao': Usuario.regiao,
+        'logradouro': Solicitacao.logradouro,
+        'bairro': Solicitacao.bairro,
+        'cep': Solicitacao.cep,
+        'protocolo': Solicitacao.protocolo,
+        'observacao': Solicitacao.observacao,
+    }
+
+
+def _frase(termo):
+    """Termo como frase FTS5 (aspas escapadas)."""
+    return '"' + termo.replace('"', '""') + '"'
+
+
+def aplicar_busca(query, termo=None, unidade=None, regiao=None):
+    """
+    Aplica a busca livre (`termo`, em todos os campos, cada palavra
+    obrigatória) e os filtros "contém" de unidade e região.
+
+    A query precisa ter Usuario no JOIN (usado no caminho sem FTS5 e nos
+    termos curtos demais para o trigram).
+    """
+    origem = _colunas_origem()
+    palavras = (termo or '').split()
+
+    if not busca_disponivel():
+        for palavra in palavras:
+            query = query.filter(or_(*[col.ilike(f"%{palavra}%") for col in origem.values()]))
+        if unidade:
+            query = query.filter(Usuario.nome_uvis.ilike(f"%{unidade}%"))
+        if regiao:
+            query = query.filter(Usuario.regiao.ilike(f"%{regiao}%"))
+        return query
+
+    condicoes = []
+    longas = [p for p in palavras if len(p) >= TAMANHO_MINIMO]
+    if longas:
+        condicoes.append(
+            literal_column(TABELA_BUSCA).op('MATCH')(
+                bindparam('busca_match', ' AND '.join(_frase(p) for p in longas))
+            )
+        )
+    # LIKE direto na tabela FTS5 também usa o índice trigram
+    if unidade:
+        condicoes.append(_busca.c.nome_uvis.like(f"%{unidade}%"))
+    if regiao:
+        condicoes.append(_busca.c.regiao.like(f"%{regiao}%"))
+
+    if condicoes:
+        query = query.filter(Solicitacao.id.in_(select(_busca.c.rowid).where(and_(*condicoes))))
+
+    # Palavras de 1-2 letras: filtradas só sobre o que o índice já restringiu
+    for palavra in palavras:
+        if len(palavra) < TAMANHO_MINIMO:
+            query = query.filter(or_(*[col.ilike(f"%{palavra}%") for col in origem.values()]))
+
+    return query
+
+
+@click.command('reconstruir-busca')
+@with_appcontext
+def reconstruir_busca_command():
+    """Cria (se preciso) e repopula o índice de busca textual."""
+    if not garantir_indice_busca():
+        click.echo(">>> Banco sem suporte a FTS5; a busca usa ILIKE.")
+        return
+    total = reconstruir_busca()
+    click.echo(f">>> Índice de busca reconstruído ({total} linhas).")
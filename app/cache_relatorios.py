@@ -0,0 +1,168 @@
+import glob
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+
+from flask import current_app
+
+from app import db
+from app.models import Solicitacao, RevisaoMensal
+from app.agregacoes import aplicar_filtros_base
+from app.banco import insert_upsert
+
+
+# -------------------------------------------------------------
+# CACHE DE RELATÓRIOS RENDERIZADOS (PDF / XLSX mensais)
+# -------------------------------------------------------------
+# O arquivo é endereçado pelo hash de (tipo, filtros, versão dos dados).
+# A versão do mês é o maior data_criacao + o contador de revisões que as
+# rotas de escrita incrementam; qualquer alteração muda a chave. Os
+# arquivos ficam em instance/cache_relatorios com prefixo AAAA-MM, e o
+# total em disco é limitado com descarte LRU (pela data de modificação).
+
+LIMITE_BYTES_PADRAO = 200 * 1024 * 1024
+
+
+def _diretorio():
+    caminho = os.path.join(current_app.instance_path, 'cache_relatorios')
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+
+def _limite_bytes():
+    return current_app.config.get('RELATORIOS_CACHE_MAX_BYTES', LIMITE_BYTES_PADRAO)
+
+
+def versao_dados(ano, mes, uvis_id=None):
+    """Versão dos dados de um mês: (maior data_criacao, revisão do mês)."""
+    filtro_data = f"{ano}-{mes:02d}"
+
+    ultima_criacao = aplicar_filtros_base(
+        db.session.query(db.func.max(Solicitacao.data_criacao)), filtro_data, uvis_id
+    ).scalar()
+
+    revisao = db.session.query(RevisaoMensal.revisao) \
+        .filter(RevisaoMensal.mes == filtro_data) \
+        .scalar()
+
+    return (ultima_criacao.isoformat() if ultima_criacao else None, revisao or 0)
+
+
+def registrar_alteracao(pedido):
+    """
+    Chamado pelas rotas de escrita: incrementa a revisão do mês do pedido
+    e remove do cache os arquivos desse mês.
+    """
+    registrar_alteracoes([pedido])
+
+
+def registrar_alteracoes(pedidos):
+    """Versão em lote: uma revisão (e uma invalidação) por mês distinto."""
+    meses = {(pedido.data_criacao or datetime.utcnow()).strftime('%Y-%m') for pedido in pedidos}
+    if not meses:
+        return
+
+    # revisao = revisao + 1 no próprio banco: duas edições concorrentes do
+    # mesmo mês geram duas revisões (ler e somar aqui perderia uma delas)
+    comando = insert_upsert(RevisaoMensal)
+    comando = comando.on_conflict_do_update(
+        index_elements=[RevisaoMensal.mes],
+        set_={'revisao': RevisaoMensal.revisao + 1}
+    )
+    db.session.execute(comando, [{'mes': mes, 'revisao': 1} for mes in sorted(meses)])
+
+    for mes in sorted(meses):
+        invalidar_mes(mes)
+
+
+def _arquivos_publicados(padrao):
+    """Arquivos do cache (ignora os .tmp ainda em geração)."""
+    return [
+        caminho for caminho in glob.glob(os.path.join(_diretorio(), padrao))
+        if not caminho.endswith('.tmp')
+    ]
+
+
+def invalidar_mes(mes):
+    for caminho in _arquivos_publicados(f"{mes}_*"):
+        try:
+            os.remove(caminho)
+        except OSError:  # já removido (ou aberto, no Windows)
+            pass
+
+
+def _aplicar_limite():
+    """Descarta os arquivos usados há mais tempo até caber no limite."""
+    arquivos = []
+    for caminho in _arquivos_publicados("*"):
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            continue
+        arquivos.append((info.st_mtime, info.st_size, caminho))
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= _limite_bytes():
+            break
+        try:
+            os.remove(caminho)
+        except OSError:
+            continue
+        total -= tamanho
+
+
+def relatorio_em_cache(tipo, parametros, gerar, extensao):
+    """
+    Retorna o relatório mensal do cache já aberto (modo binário), gerando-o
+    se preciso; quem chama fecha o arquivo.
+
+    `parametros` precisa conter ano, mes e uvis_id; `gerar(destino, **parametros)`
+    é a função de app/exportacao.py. Com limite 0 o cache fica desligado e
+    a função retorna None (também se o arquivo recém-gerado for descartado
+    pelo limite antes de ser aberto): quem chama gera sem cache.
+
+    O arquivo é devolvido aberto, e não pelo caminho, porque o descarte LRU
+    de outra requisição pode apagá-lo entre a consulta e o envio; depois de
+    aberto, a leitura continua válida mesmo que ele seja removido.
+    """
+    if not _limite_bytes():
+        return None
+
+    versao = versao_dados(parametros['ano'], parametros['mes'], parametros.get('uvis_id'))
+    conteudo = json.dumps([tipo, parametros, versao], sort_keys=True, default=str)
+    chave = hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    mes = f"{parametros['ano']}-{parametros['mes']:02d}"
+    caminho = os.path.join(_diretorio(), f"{mes}_{chave}.{extensao}")
+
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        arquivo = None  # ainda não gerado, ou descartado: gera de novo
+
+    if arquivo is not None:
+        try:
+            os.utime(caminho)  # marca como usado recentemente (LRU)
+        except FileNotFoundError:
+            pass
+        return arquivo
+
+    # Gera num arquivo temporário e publica com rename atômico
+    temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+    try:
+        gerar(temporario, **parametros)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        return None
+
+    _aplicar_limite()
+    return arquivo
@@ -0,0 +1,217 @@
+import mmap
+import os
+import re
+import struct
+import threading
+from functools import lru_cache
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.importacao import ler_linhas
+
+
+# -------------------------------------------------------------
+# BASE LOCAL DE CEPs (arquivo binário mapeado em memória)
+# -------------------------------------------------------------
+# O autopreenchimento de endereço consulta um arquivo local em vez do
+# ViaCEP. O arquivo (instance/ceps.bin) é gerado por
+# `flask importar-ceps dump.csv` e tem três partes:
+#
+#   cabeçalho  'SGSVCEP1' + quantidade de CEPs (uint32)
+#   índice     (cep uint32, deslocamento uint32, tamanho uint32), ordenado por cep
+#   textos     'logradouro|bairro|cidade|uf' em UTF-8 (repetidos são gravados uma vez)
+#
+# A busca é binária direto no mmap (o SO carrega só as páginas lidas e
+# as compartilha entre processos) e um LRU guarda os CEPs mais pedidos.
+
+ASSINATURA = b'SGSVCEP1'
+CABECALHO = struct.Struct('<8sI')
+ENTRADA = struct.Struct('<III')
+SEPARADOR = '|'
+CAMPOS = ('logradouro', 'bairro', 'cidade', 'uf')
+TAMANHO_LRU = 4096
+
+_CABECALHOS_DUMP = {
+    'cep': 'cep',
+    'logradouro': 'logradouro', 'endereco': 'logradouro', 'rua': 'logradouro',
+    'bairro': 'bairro',
+    'cidade': 'cidade', 'localidade': 'cidade', 'municipio': 'cidade',
+    'uf': 'uf', 'estado': 'uf',
+}
+_NAO_DIGITO = re.compile(r'\D')
+
+
+def normalizar_cep(valor):
+    """'01001-000' -> 1001000 (int). Retorna None se não tiver 8 dígitos."""
+    digitos = _NAO_DIGITO.sub('', str(valor or ''))
+    return int(digitos) if len(digitos) == 8 else None
+
+
+def formatar_cep(numero):
+    texto = f"{numero:08d}"
+    return f"{texto[:5]}-{texto[5:]}"
+
+
+def caminho_tabela():
+    return current_app.config.get('CEP_ARQUIVO') or os.path.join(current_app.instance_path, 'ceps.bin')
+
+
+# -------------------------------------------------------------
+# Leitura
+# -------------------------------------------------------------
+class TabelaCep:
+    """Arquivo ceps.bin aberto via mmap (somente leitura)."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.assinatura_arquivo = _assinatura_arquivo(caminho)
+        with open(caminho, 'rb') as arquivo:
+            self._mm = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        assinatura, self.quantidade = CABECALHO.unpack_from(self._mm, 0)
+        if assinatura != ASSINATURA:
+            self._mm.close()
+            raise ValueError(f"{caminho} não é uma base de CEPs do SGSV.")
+
+        self._inicio_textos = CABECALHO.size + self.quantidade * ENTRADA.size
+
+    def buscar(self, cep):
+        """Busca binária no índice. Retorna o dict do endereço ou None."""
+        mm, inicio, tamanho = self._mm, CABECALHO.size, ENTRADA.size
+        baixo, alto = 0, self.quantidade
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            atual, deslocamento, comprimento = ENTRADA.unpack_from(mm, inicio + meio * tamanho)
+            if atual < cep:
+                baixo = meio + 1
+            elif atual > cep:
+                alto = meio
+            else:
+                posicao = self._inicio_textos + deslocamento
+                texto = mm[posicao:posicao + comprimento].decode('utf-8')
+                return dict(zip(CAMPOS, texto.split(SEPARADOR)), cep=formatar_cep(cep))
+        return None
+
+
+def _assinatura_arquivo(caminho):
+    """(inode, mtime, tamanho): muda quando o arquivo é substituído."""
+    estado = os.stat(caminho)
+    return (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+
+
+_tabela = None
+_trava = threading.Lock()
+
+
+def _tabela_atual(caminho):
+    """
+    Tabela aberta para `caminho` (reabre se o arquivo foi regerado).
+    Retorna None se ainda não existe base de CEPs.
+    """
+    global _tabela
+    try:
+        assinatura = _assinatura_arquivo(caminho)
+    except FileNotFoundError:
+        return None
+
+    if _tabela is None or _tabela.caminho != caminho or _tabela.assinatura_arquivo != assinatura:
+        with _trava:
+            if _tabela is None or _tabela.caminho != caminho or _tabela.assinatura_arquivo != assinatura:
+                _tabela = TabelaCep(caminho)  # o mmap antigo é liberado pelo coletor
+                _buscar_em_cache.cache_clear()
+    return _tabela
+
+
+@lru_cache(maxsize=TAMANHO_LRU)
+def _buscar_em_cache(caminho, cep):
+    tabela = _tabela_atual(caminho)
+    return tabela.buscar(cep) if tabela else None
+
+
+def base_disponivel():
+    return os.path.exists(caminho_tabela())
+
+
+def buscar_cep(valor):
+    """
+    Endereço do CEP ({cep, logradouro, bairro, cidade, uf}) ou None se
+    o CEP for inválido, não existir ou a base não tiver sido carregada.
+    """
+    cep = normalizar_cep(valor)
+    if cep is None:
+        return None
+
+    caminho = caminho_tabela()
+    _tabela_atual(caminho)  # só um stat: reabre (e limpa o LRU) se a base foi regerada
+    endereco = _buscar_em_cache(caminho, cep)
+    return dict(endereco) if endereco else None
+
+
+# -------------------------------------------------------------
+# Geração do arquivo a partir de um dump (CSV/XLSX)
+# -------------------------------------------------------------
+def _limpar(valor):
+    return ' '.join(str(valor or '').replace(SEPARADOR, '/').split())
+
+
+def gerar_tabela(linhas, destino):
+    """
+    Grava `destino` a partir das linhas do dump (a primeira é o cabeçalho,
+    com cep, logradouro, bairro, cidade/localidade, uf). CEP repetido:
+    vale a última linha. Retorna (CEPs gravados, linhas descartadas).
+    """
+    linhas = iter(linhas)
+    cabecalho = [_CABECALHOS_DUMP.get(str(nome or '').strip().lower()) for nome in next(linhas, [])]
+    if 'cep' not in cabecalho:
+        raise ValueError("O dump precisa de uma coluna 'cep'.")
+
+    enderecos = {}
+    descartadas = 0
+    for valores in linhas:
+        registro = {campo: valor for campo, valor in zip(cabecalho, valores) if campo}
+        cep = registro.get('cep')
+        # Planilha pode trazer o CEP como número (zero à esquerda perdido)
+        cep = int(cep) if isinstance(cep, (int, float)) and 0 < cep < 10 ** 8 else normalizar_cep(cep)
+        if cep is None:
+            descartadas += 1
+            continue
+        texto = SEPARADOR.join(_limpar(registro.get(campo)) for campo in CAMPOS[:-1])
+        texto += SEPARADOR + _limpar(registro.get('uf')).upper()
+        enderecos[cep] = texto
+
+    # Textos repetidos (CEP geral de cidade, mesma rua) ocupam espaço uma vez
+    pool = bytearray()
+    posicoes = {}
+    indice = []
+    for cep in sorted(enderecos):
+        texto = enderecos[cep]
+        if texto not in posicoes:
+            dados = texto.encode('utf-8')
+            posicoes[texto] = (len(pool), len(dados))
+            pool += dados
+        indice.append(ENTRADA.pack(cep, *posicoes[texto]))
+
+    # Grava ao lado e troca no fim: quem está lendo a base antiga não é afetado
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(CABECALHO.pack(ASSINATURA, len(indice)))
+        arquivo.write(b''.join(indice))
+        arquivo.write(pool)
+    os.replace(temporario, destino)
+
+    return len(indice), descartadas
+
+
+@click.command('importar-ceps')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def importar_ceps_command(arquivo):
+    """Gera a base local de CEPs (instance/ceps.bin) a partir de um dump CSV/XLSX."""
+    destino = caminho_tabela()
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with open(arquivo, 'rb') as entrada:
+        gravados, descartadas = gerar_tabela(ler_linhas(entrada, arquivo), destino)
+
+    click.echo(f">>> {gravados} CEPs gravados em {destino} ({descartadas} linhas descartadas).")
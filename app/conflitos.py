@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models import Usuario, Solicitacao
+from app.geo import filtro_area, area_ao_redor, distancia_metros
+
+
+# -------------------------------------------------------------
+# CONFLITOS DE AGENDA (voos próximos no mesmo horário)
+# -------------------------------------------------------------
+# Dois pedidos conflitam quando estão a menos de RAIO metros e a menos de
+# JANELA minutos um do outro. A busca usa o índice (data_agendamento,
+# geohash): o dia é o "balde" de tempo e os prefixos de geohash ao redor
+# do ponto são o balde espacial. Distância e horário exatos são conferidos
+# só nos poucos candidatos que saem do índice.
+
+RAIO_PADRAO = 500          # metros
+JANELA_PADRAO = 60         # minutos
+STATUS_IGNORADOS = ('NEGADO',)
+
+
+def _parametros(raio, janela):
+    config = current_app.config
+    return (
+        raio if raio is not None else config.get('CONFLITO_RAIO_METROS', RAIO_PADRAO),
+        janela if janela is not None else config.get('CONFLITO_JANELA_MINUTOS', JANELA_PADRAO)
+    )
+
+
+def _momento(data, hora):
+    return datetime.combine(data, hora) if data and hora else None
+
+
+def consulta_candidatos(pedido, datas, raio):
+    """Pedidos nos dias `datas` dentro da área de `raio` metros ao redor de `pedido` (pelo índice)."""
+    candidatos = db.session.query(
+        Solicitacao.id,
+        Solicitacao.data_agendamento,
+        Solicitacao.hora_agendamento,
+        Solicitacao.latitude,
+        Solicitacao.longitude,
+        Solicitacao.status,
+        Usuario.nome_uvis
+    ).join(Usuario, Usuario.id == Solicitacao.usuario_id) \
+        .filter(Solicitacao.data_agendamento.in_(datas)) \
+        .filter(filtro_area(Solicitacao, *area_ao_redor(pedido.latitude, pedido.longitude, raio))) \
+        .filter(Solicitacao.status.notin_(STATUS_IGNORADOS))
+
+    if pedido.id is not None:
+        candidatos = candidatos.filter(Solicitacao.id != pedido.id)
+    return candidatos
+
+
+def conflitos_de(pedido, raio=None, janela=None):
+    """
+    Lista os pedidos que conflitam com `pedido` (não precisa estar salvo).
+
+    Retorna [{'id', 'unidade', 'status', 'distancia', 'minutos'}], do mais
+    próximo no tempo para o mais distante.
+    """
+    raio, janela = _parametros(raio, janela)
+    inicio = _momento(pedido.data_agendamento, pedido.hora_agendamento)
+    if inicio is None or pedido.latitude is None or pedido.longitude is None:
+        return []
+
+    # Baldes de tempo: o dia do voo e, se a janela cruzar a meia-noite, o vizinho
+    folga = timedelta(minutes=janela)
+    datas = sorted({(inicio - folga).date(), inicio.date(), (inicio + folga).date()})
+
+    conflitos = []
+    for outro in consulta_candidatos(pedido, datas, raio):
+        momento = _momento(outro.data_agendamento, outro.hora_agendamento)
+        minutos = abs((momento - inicio).total_seconds()) / 60 if momento else None
+        if minutos is None or minutos > janela:
+            continue
+
+        distancia = distancia_metros(pedido.latitude, pedido.longitude, outro.latitude, outro.longitude)
+        if distancia > raio:
+            continue
+
+        conflitos.append({
+            'id': outro.id,
+            'unidade': outro.nome_uvis,
+            'status': outro.status,
+            'distancia': round(distancia),
+            'minutos': round(minutos)
+        })
+
+    return sorted(conflitos, key=lambda c: (c['minutos'], c['distancia']))
+
+
+def conflitos_por_pedido(pedidos, raio=None, janela=None):
+    """{id: [conflitos]} para uma página de pedidos (só os que têm conflito)."""
+    resultado = {}
+    for pedido in pedidos:
+        if pedido.status in STATUS_IGNORADOS:
+            continue
+        encontrados = conflitos_de(pedido, raio, janela)
+        if encontrados:
+            resultado[pedido.id] = encontrados
+    return resultado
+
+
+def resumo_conflitos(conflitos):
+    """Texto curto para flash: '#12 (UVIS X, 120 m, 15 min), ...'."""
+    return ', '.join(
+        f"#{c['id']} ({c['unidade']}, {c['distancia']} m, {c['minutos']} min)"
+        for c in conflitos[:5]
+    ) + ('...' if len(conflitos) > 5 else '')
@@ -0,0 +1,827 @@
+import csv
+import os
+import zlib
+from collections import Counter
+from datetime import datetime, date, timedelta
+from io import BytesIO, StringIO
+
+# openpyxl e reportlab são importados dentro das funções que os usam:
+# importar este módulo (rotas, fila de exportação) não os carrega, e o
+# worker só paga por eles na primeira exportação.
+
+from app import db
+from app.models import Usuario, Solicitacao
+from app.agregacoes import aplicar_filtros_base, resumir
+from app.mensal import historico_mensal
+from app.busca import aplicar_busca
+from app.usuarios import nome_uvis
+
+# matplotlib é opcional — os gráficos só são desenhados se estiver instalado
+from app.graficos import MATPLOTLIB_DISPONIVEL, renderizar_graficos
+
+
+# -------------------------------------------------------------
+# PLANILHAS EM MODO STREAMING (write-only)
+# -------------------------------------------------------------
+# O Workbook em modo write_only grava cada linha direto num arquivo
+# temporário, então a memória não cresce com o número de registros.
+# Os estilos são NamedStyle compartilhados (um objeto por workbook,
+# não um por célula) e as larguras são fixas, definidas antes das linhas.
+
+TAMANHO_BLOCO = 64 * 1024
+MIMETYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _borda_fina():
+    from openpyxl.styles import Border, Side
+
+    lado = Side(style='thin')
+    return Border(left=lado, right=lado, top=lado, bottom=lado)
+
+
+def _estilos_planilha(cor_cabecalho):
+    """Cria os estilos nomeados usados pelas planilhas de exportação."""
+    from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
+
+    cabecalho = NamedStyle(
+        name="sgsv_cabecalho",
+        font=Font(color="FFFFFF", bold=True),
+        fill=PatternFill(start_color=cor_cabecalho, end_color=cor_cabecalho, fill_type="solid"),
+        alignment=Alignment(horizontal="center", vertical="center"),
+        border=_borda_fina(),
+    )
+    celula = NamedStyle(
+        name="sgsv_celula",
+        alignment=Alignment(vertical="center", wrap_text=True),
+        border=_borda_fina(),
+    )
+    return cabecalho, celula
+
+
+def escrever_xlsx(destino, titulo, colunas, linhas, cor_cabecalho="1F4E78"):
+    """
+    Gera uma planilha .xlsx em modo write-only e grava em `destino`.
+
+    `colunas` é uma lista de (nome, largura) e `linhas` qualquer iterável
+    de sequências (ex.: um cursor com yield_per). `destino` pode ser um
+    caminho ou um arquivo aberto em modo binário.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    estilo_cabecalho, estilo_celula = _estilos_planilha(cor_cabecalho)
+    wb.add_named_style(estilo_cabecalho)
+    wb.add_named_style(estilo_celula)
+
+    ws = wb.create_sheet(title=titulo)
+
+    # Larguras precisam ser definidas antes da primeira linha
+    for indice, (_, largura) in enumerate(colunas, 1):
+        ws.column_dimensions[get_column_letter(indice)].width = largura
+
+    ws.freeze_panes = "A2"
+
+    def _linha(valores, estilo):
+        celulas = []
+        for valor in valores:
+            cell = WriteOnlyCell(ws, value=valor)
+            cell.style = estilo
+            celulas.append(cell)
+        return celulas
+
+    ws.append(_linha([nome for nome, _ in colunas], estilo_cabecalho.name))
+    for valores in linhas:
+        ws.append(_linha(valores, estilo_celula.name))
+
+    wb.save(destino)
+
+
+def transmitir_arquivo(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """Gerador que envia o arquivo em blocos e o fecha ao final."""
+    try:
+        while True:
+            bloco = arquivo.read(tamanho_bloco)
+            if not bloco:
+                break
+            yield bloco
+    finally:
+        arquivo.close()
+
+
+def nome_relatorio(ano, mes, uvis_id=None):
+    """Nome base (sem extensão) dos arquivos de relatório mensal."""
+    nome_arquivo = f"relatorio_SGSV_{ano}_{mes:02d}"
+    if uvis_id:
+        nome_arquivo += f"_UVIS_{uvis_id}"
+    return nome_arquivo
+
+
+# =======================================================================
+# Planilha de Solicitações (Painel de Gestão)
+# =======================================================================
+
+NOME_PLANILHA_SOLICITACOES = "relatorio_solicitacoes.xlsx"
+
+
+def gerar_planilha_solicitacoes(destino, filtro_status=None, filtro_unidade=None, filtro_regiao=None, filtro_busca=None):
+    """Gera a planilha do painel de gestão (mesmos filtros da tela /admin)."""
+    # Query base (somente as colunas usadas na planilha)
+    query = db.session.query(
+        Solicitacao.id,
+        Usuario.nome_uvis,
+        Usuario.regiao,
+        Solicitacao.data_agendamento,
+        Solicitacao.hora_agendamento,
+        Solicitacao.logradouro,
+        Solicitacao.numero,
+        Solicitacao.bairro,
+        Solicitacao.cidade,
+        Solicitacao.uf,
+        Solicitacao.cep,
+        Solicitacao.complemento,
+        Solicitacao.latitude,
+        Solicitacao.longitude,
+        Solicitacao.foco,
+        Solicitacao.tipo_visita,
+        Solicitacao.altura_voo,
+        Solicitacao.criadouro,
+        Solicitacao.apoio_cet,
+        Solicitacao.observacao,
+        Solicitacao.status,
+        Solicitacao.protocolo,
+        Solicitacao.justificativa
+    ).join(Usuario, Usuario.id == Solicitacao.usuario_id)
+
+    if filtro_status:
+        query = query.filter(Solicitacao.status == filtro_status)
+
+    query = aplicar_busca(query, filtro_busca, filtro_unidade, filtro_regiao)
+
+    # Cursor no servidor: as linhas chegam em lotes, sem .all()
+    pedidos = query.order_by(Solicitacao.data_criacao.desc()).yield_per(1000)
+
+    # Cabeçalho atualizado com ENDEREÇO ÚNICO (nome, largura fixa)
+    colunas = [
+        ("ID", 8), ("Unidade", 30), ("Região", 16),
+        ("Data Agendada", 14), ("Hora", 10),
+        ("Endereço Completo", 60),       # <-- CAMPO ÚNICO
+        ("Latitude", 14), ("Longitude", 14),
+        ("Foco", 24), ("Tipo Visita", 16), ("Altura", 10),
+        ("Criadouro?", 12), ("Apoio CET?", 12),
+        ("Observação", 50),
+        ("Status", 14), ("Protocolo", 20), ("Justificativa", 40)
+    ]
+
+    def linhas():
+        for p in pedidos:
+            # --- ENDEREÇO COMPLETO ---
+            endereco_completo = (
+                f"{p.logradouro or ''}, {p.numero or ''} - "
+                f"{p.bairro or ''} - "
+                f"{(p.cidade or '')}/{(p.uf or '')} - "
+                f"{p.cep or ''}"
+            )
+
+            if p.complemento:
+                endereco_completo += f" - {p.complemento}"
+
+            # Data formatada
+            if p.data_agendamento:
+                try:
+                    if isinstance(p.data_agendamento, (date, datetime)):
+                        data_formatada = p.data_agendamento.strftime("%d-%m-%y")
+                    else:
+                        data_formatada = datetime.strptime(str(p.data_agendamento), "%Y-%m-%d").strftime("%d-%m-%y")
+                except ValueError:
+                    data_formatada = str(p.data_agendamento)
+            else:
+                data_formatada = ""
+
+            # Hora formatada (o estilo nomeado não carrega formato de hora)
+            hora_formatada = p.hora_agendamento.strftime("%H:%M") if p.hora_agendamento else ""
+
+            # Linha completa
+            yield [
+                p.id,
+                p.nome_uvis,
+                p.regiao,
+                data_formatada,
+                hora_formatada,
+
+                endereco_completo,     # <-- CAMPO ÚNICO AQUI
+
+                p.latitude,
+                p.longitude,
+
+                p.foco,
+                p.tipo_visita,
+                p.altura_voo,
+                "SIM" if p.criadouro else "NÃO",
+                "SIM" if p.apoio_cet else "NÃO",
+                p.observacao,
+                p.status,
+                p.protocolo,
+                p.justificativa
+            ]
+
+    escrever_xlsx(destino, "Relatório de Solicitações", colunas, linhas())
+
+
+# =======================================================================
+# Exportação SARPAS (CSV em streaming, opcionalmente gzip)
+# =======================================================================
+# Uma operação por linha, no layout de importação em massa do SARPAS.
+# As linhas saem de um cursor no servidor (yield_per) e são escritas em
+# lotes num buffer de texto; cada lote é codificado (e comprimido, se o
+# cliente aceitar gzip) e enviado, então a memória não cresce com o
+# número de pedidos.
+
+NOME_CSV_SARPAS = "sarpas_solicitacoes.csv"
+LOTE_SARPAS = 1000
+DURACAO_SARPAS_MINUTOS = 60     # janela de voo informada a partir do horário agendado
+RAIO_SARPAS_METROS = 200        # raio de operação em torno da coordenada
+
+COLUNAS_SARPAS = (
+    "IDENTIFICADOR", "DATA_INICIO", "HORA_INICIO", "DATA_FIM", "HORA_FIM",
+    "LATITUDE", "LONGITUDE", "RAIO_M", "ALTURA_MAX_M",
+    "ENDERECO", "MUNICIPIO", "UF", "CEP",
+    "OPERADOR", "FINALIDADE", "PROTOCOLO"
+)
+
+
+def _altura_metros(altura_voo):
+    """'30m' -> 30 (vazio se não der para ler)."""
+    digitos = ''.join(c for c in (altura_voo or '') if c.isdigit())
+    return int(digitos) if digitos else ''
+
+
+def _janela_voo(data, hora, folga):
+    """(data início, hora início, data fim, hora fim) já formatados."""
+    if not data or not hora:
+        return ('', '', '', '')
+    inicio = datetime.combine(data, hora)
+    fim = inicio + folga
+    return (inicio.strftime('%d/%m/%Y'), inicio.strftime('%H:%M'),
+            fim.strftime('%d/%m/%Y'), fim.strftime('%H:%M'))
+
+
+def gerar_csv_sarpas(filtro_status=None, filtro_unidade=None, filtro_regiao=None, filtro_busca=None,
+                     comprimir=False, duracao=DURACAO_SARPAS_MINUTOS, raio=RAIO_SARPAS_METROS):
+    """
+    Gerador de blocos (bytes) do CSV SARPAS, com os mesmos filtros do
+    painel de gestão. Precisa de contexto de app enquanto é consumido
+    (use stream_with_context na rota).
+    """
+    # A ordem das colunas é a do desempacotamento no laço abaixo
+    query = db.session.query(
+        Solicitacao.id,
+        Solicitacao.data_agendamento,
+        Solicitacao.hora_agendamento,
+        Solicitacao.latitude,
+        Solicitacao.longitude,
+        Solicitacao.altura_voo,
+        Solicitacao.logradouro,
+        Solicitacao.numero,
+        Solicitacao.bairro,
+        Solicitacao.cidade,
+        Solicitacao.uf,
+        Solicitacao.cep,
+        Solicitacao.tipo_visita,
+        Solicitacao.foco,
+        Solicitacao.protocolo,
+        Usuario.nome_uvis
+    ).join(Usuario, Usuario.id == Solicitacao.usuario_id)
+
+    if filtro_status:
+        query = query.filter(Solicitacao.status == filtro_status)
+
+    query = aplicar_busca(query, filtro_busca, filtro_unidade, filtro_regiao)
+
+    pedidos = query.order_by(Solicitacao.data_agendamento, Solicitacao.hora_agendamento, Solicitacao.id) \
+        .yield_per(LOTE_SARPAS)
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None  # 31 = cabeçalho gzip
+    buffer = StringIO()
+    escritor = csv.writer(buffer, delimiter=';', lineterminator='\r\n')
+    folga = timedelta(minutes=duracao)
+
+    def _despejar(final=False):
+        dados = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor is None:
+            return dados
+        dados = compressor.compress(dados)
+        return dados + compressor.flush() if final else dados
+
+    buffer.write('\ufeff')  # BOM: o Excel abre com acentos
+    escritor.writerow(COLUNAS_SARPAS)
+
+    # Datas/horas e alturas se repetem muito entre os voos: formata cada
+    # valor distinto uma vez só (strftime era o maior custo por linha)
+    janelas = {}
+    alturas = {}
+    finalidades = {}
+
+    contador = 0
+    for (pedido_id, data, hora, latitude, longitude, altura_voo, logradouro, numero,
+         bairro, cidade, uf, cep, tipo_visita, foco, protocolo, unidade) in pedidos:
+        janela = janelas.get((data, hora))
+        if janela is None:
+            janela = janelas[(data, hora)] = _janela_voo(data, hora, folga)
+
+        altura = alturas.get(altura_voo)
+        if altura is None:
+            altura = alturas[altura_voo] = _altura_metros(altura_voo)
+
+        finalidade = finalidades.get((tipo_visita, foco))
+        if finalidade is None:
+            finalidade = finalidades[(tipo_visita, foco)] = ' - '.join(filter(None, (tipo_visita, foco)))
+
+        escritor.writerow((
+            f"SGSV-{pedido_id}",
+            *janela,
+            f"{latitude:.6f}" if latitude is not None else '',
+            f"{longitude:.6f}" if longitude is not None else '',
+            raio,
+            altura,
+            f"{logradouro or ''}, {numero or 'S/N'} - {bairro or ''}",
+            cidade or '',
+            uf or '',
+            cep or '',
+            unidade,
+            finalidade,
+            protocolo or ''
+        ))
+
+        contador += 1
+        if contador % LOTE_SARPAS == 0:
+            bloco = _despejar()
+            if bloco:
+                yield bloco
+
+    bloco = _despejar(final=True)
+    if bloco:
+        yield bloco
+
+
+# =======================================================================
+# Relatório Mensal em Excel (Com Filtro UVIS)
+# =======================================================================
+
+def gerar_planilha_relatorio(destino, ano, mes, uvis_id=None):
+    """Gera a planilha do relatório mensal e grava em `destino`."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+    from openpyxl.utils import get_column_letter
+
+    filtro_data = f"{ano}-{mes:02d}"
+
+    # 2. Busca de Dados
+    query_dados = db.session.query(
+        Solicitacao.id,
+        Solicitacao.status,
+        Solicitacao.foco,
+        Solicitacao.tipo_visita,
+        Solicitacao.altura_voo,
+        Solicitacao.data_agendamento,
+        Solicitacao.hora_agendamento,
+        Solicitacao.cep,
+        Solicitacao.logradouro,
+        Solicitacao.numero,
+        Solicitacao.bairro,
+        Solicitacao.cidade,
+        Solicitacao.uf,
+        Solicitacao.latitude,
+        Solicitacao.longitude,
+        Usuario.nome_uvis,
+        Usuario.regiao
+    ) \
+        .join(Usuario, Usuario.id == Solicitacao.usuario_id)
+
+    # Mesmo filtro de mês/UVIS usado pelo relatório e pelo PDF
+    query_dados = aplicar_filtros_base(query_dados, filtro_data, uvis_id)
+
+    dados = query_dados.all()
+
+    # 3. Criar arquivo Excel
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Relatório"
+
+    # Cabeçalho
+    colunas = [
+        "ID", "Status", "Foco", "Tipo Visita", "Altura Voo",
+        "Data Agendamento", "Hora Agendamento",
+        "CEP", "Logradouro", "Número", "Bairro", "Cidade", "UF",
+        "Latitude", "Longitude", "UVIS", "Região"
+    ]
+
+    # ... (Estilos e escrita do cabeçalho) ...
+    header_fill = PatternFill(start_color="1E90FF", end_color="1E90FF", fill_type="solid")
+    header_font = Font(color="FFFFFF", bold=True)
+    center = Alignment(horizontal="center", vertical="center")
+    thin = Side(style='thin', color="000000")
+    thin_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    zebra1 = PatternFill(start_color="FFFFFFFF", end_color="FFFFFFFF", fill_type="solid")
+    zebra2 = PatternFill(start_color="FFF7FBFF", end_color="FFF7FBFF", fill_type="solid")
+
+    for col_num, col_name in enumerate(colunas, 1):
+        cell = ws.cell(row=1, column=col_num, value=col_name)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = center
+        cell.border = thin_border
+
+    # 4. Preenchimento das linhas
+    for row_num, row in enumerate(dados, 2):
+
+        # ---- FORMATAR DATAS ----
+        data_agendamento_fmt = ""
+        if row.data_agendamento:
+            try:
+                data_agendamento_fmt = row.data_agendamento.strftime("%d/%m/%Y")
+            except:
+                data_agendamento_fmt = str(row.data_agendamento)
+
+        # ---- FORMATAR HORA ----
+        hora_agendamento_fmt = ""
+        if row.hora_agendamento:
+            try:
+                hora_agendamento_fmt = row.hora_agendamento.strftime("%H:%M")
+            except:
+                hora_agendamento_fmt = str(row.hora_agendamento)
+
+        # ---- PREENCHER LINHAS ----
+        values = [
+            row.id,
+            row.status,
+            row.foco,
+            row.tipo_visita,
+            row.altura_voo,
+            data_agendamento_fmt,
+            hora_agendamento_fmt,
+            row.cep,
+            row.logradouro,
+            row.numero,
+            row.bairro,
+            row.cidade,
+            row.uf,
+            row.latitude,
+            row.longitude,
+            row.nome_uvis,
+            row.regiao
+        ]
+
+        for col_index, value in enumerate(values, 1):
+            cell = ws.cell(row=row_num, column=col_index, value=value)
+            cell.border = thin_border
+            if col_index in (1, 3, 6, 8, 15, 16):
+                cell.alignment = center
+            else:
+                cell.alignment = Alignment(vertical="top", horizontal="left")
+
+            fill = zebra1 if (row_num % 2 == 0) else zebra2
+            cell.fill = fill
+
+    # 5. Ajustar e Finalizar
+    for col in ws.columns:
+        max_length = 0
+        column = col[0].column_letter
+        for cell in col:
+            try:
+                if cell.value is not None:
+                    max_length = max(max_length, len(str(cell.value)))
+            except:
+                pass
+        ws.column_dimensions[column].width = max(10, min(max_length + 2, 60))
+
+    ws.freeze_panes = "A2"
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(colunas))}1"
+
+    wb.save(destino)
+
+
+# =======================================================================
+# Relatório Mensal em PDF (Com Filtro UVIS)
+# =======================================================================
+
+def _linha_registro(s, u):
+    """Linha da tabela de registros detalhados do PDF."""
+    # data/hora safe formatting
+    data_str = ''
+    try:
+        if getattr(s, 'data_agendamento', None):
+            data_str = s.data_agendamento.strftime("%d/%m/%Y") if hasattr(s.data_agendamento, 'strftime') else str(s.data_agendamento)
+        else:
+            data_str = s.data_criacao.strftime("%d/%m/%Y") if hasattr(s.data_criacao, 'strftime') else str(s.data_criacao)
+    except:
+        data_str = str(getattr(s, 'data_agendamento', '') or getattr(s, 'data_criacao', ''))
+
+    hora = getattr(s, 'hora_agendamento', '')
+    hora_str = hora.strftime("%H:%M") if hasattr(hora, 'strftime') else str(hora or '')
+
+    unidade = getattr(u, 'nome_uvis', '') or "Não informado"
+    protocolo = getattr(s, 'protocolo', '') or ''
+    status = getattr(s, 'status', '') or ''
+    regiao = getattr(u, 'regiao', '') or ''
+    foco = getattr(s, 'foco', '') or ''
+    tipo_visita = getattr(s, 'tipo_visita', '') or ''
+    obs = getattr(s, 'observacao', '') or ''
+
+    return [data_str, hora_str, unidade, protocolo, status, regiao, foco, tipo_visita, obs]
+
+
+def gerar_pdf_relatorio(destino, ano, mes, uvis_id=None, orient='portrait'):
+    """Gera o PDF do relatório mensal e grava em `destino` (caminho ou arquivo)."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import mm
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import (
+        SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
+        PageBreak, Image as RLImage
+    )
+
+    filtro_data = f"{ano}-{mes:02d}"
+
+    # 2. Busca Principal: uma leitura só das linhas do mês, que vira a
+    #    tabela de registros detalhados e, contada no mesmo laço, os totais
+    query_base = db.session.query(Solicitacao, Usuario).join(Usuario, Usuario.id == Solicitacao.usuario_id)
+    query_base = aplicar_filtros_base(query_base, filtro_data, uvis_id)
+
+    registros_header = ['Data', 'Hora', 'Unidade', 'Protocolo', 'Status', 'Região', 'Foco', 'Tipo Visita', 'Observação']
+    registros_rows = [registros_header]
+    combinacoes = Counter()
+
+    for s, u in query_base.order_by(Solicitacao.data_criacao.desc()):
+        combinacoes[(u.regiao, u.nome_uvis, u.tipo_usuario, s.status, s.foco, s.tipo_visita, s.altura_voo)] += 1
+        registros_rows.append(_linha_registro(s, u))
+
+    # 3. Totais e 4. Agrupamentos (mesmo pivô da tela de relatórios)
+    resumo = resumir((*chave, qtd) for chave, qtd in combinacoes.items())
+
+    total_solicitacoes = resumo['total_solicitacoes']
+    total_aprovadas = resumo['total_aprovadas']
+    total_recusadas = resumo['total_recusadas']
+    total_analise = resumo['total_analise']
+    total_pendentes = resumo['total_pendentes']
+
+    def _rotular(dados):
+        return [(chave or "Não informado", c) for chave, c in dados]
+
+    dados_regiao = _rotular(resumo['dados_regiao'])
+    dados_status = _rotular(resumo['dados_status'])
+    dados_foco = _rotular(resumo['dados_foco'])
+    dados_tipo_visita = _rotular(resumo['dados_tipo_visita'])
+    dados_altura_voo = _rotular(resumo['dados_altura_voo'])
+    dados_unidade = _rotular(resumo['dados_unidade'])
+
+    dados_mensais = historico_mensal()
+
+    # -------------------------
+    # 5. Preparar documento PDF
+    # -------------------------
+    pagesize = A4
+    if orient == 'landscape':
+        pagesize = landscape(A4)
+
+    doc = SimpleDocTemplate(destino,
+                            pagesize=pagesize,
+                            leftMargin=16*mm, rightMargin=16*mm,
+                            topMargin=16*mm, bottomMargin=20*mm)
+
+    # Styles aprimorados
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('title', parent=styles['Title'], fontSize=22, leading=26, alignment=1, spaceAfter=8, textColor=colors.HexColor('#0d6efd'))
+    subtitle_style = ParagraphStyle('subtitle', parent=styles['Normal'], fontSize=10, textColor=colors.HexColor('#666'), alignment=1, spaceAfter=6)
+    section_h = ParagraphStyle('sec', parent=styles['Heading2'], fontSize=12, spaceAfter=6, textColor=colors.HexColor('#0d6efd'))
+    normal = styles['Normal']
+    small = ParagraphStyle('small', parent=styles['BodyText'], fontSize=9, textColor=colors.HexColor('#555'))
+
+    story = []
+
+    # -------------------------
+    # Funções utilitárias
+    # -------------------------
+    def img_from_png(png):
+        """Recebe os bytes de um PNG, retorna ReportLab Image (BytesIO)."""
+        return RLImage(BytesIO(png), width=170*mm)  # escala automática
+
+    def render_small_table(rows, colWidths):
+        tbl = Table(rows, colWidths=colWidths)
+        tbl.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0d6efd')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('ALIGN', (0,0), (-1,0), 'CENTER'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor('#fbfdff')]),
+            ('LEFTPADDING', (0,0), (-1,-1), 6),
+            ('RIGHTPADDING', (0,0), (-1,-1), 6),
+            ('TOPPADDING', (0,0), (-1,-1), 4),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+        ]))
+        return tbl
+
+    # -------------------------
+    # Cabeçalho / Capa
+    # -------------------------
+    # Logo: procura em static/logo.png por padrão — se não existir, pula
+    logo_path = os.path.join(os.getcwd(), 'static', 'logo.png')
+    if os.path.exists(logo_path):
+        try:
+            logo = RLImage(logo_path, width=36*mm, height=36*mm)
+        except Exception:
+            logo = None
+    else:
+        logo = None
+
+    # Título e capa
+    story.append(Spacer(1, 6))
+    if logo:
+        # coloca o logo e título lado a lado
+        h = [[logo, Paragraph(f"<b>Relatório Mensal — {mes:02d}/{ano}</b>", title_style)]]
+        cap_tbl = Table(h, colWidths=[40*mm, (doc.width - 40*mm)])
+        cap_tbl.setStyle(TableStyle([('VALIGN', (0,0), (-1,-1), 'MIDDLE')]))
+        story.append(cap_tbl)
+    else:
+        story.append(Paragraph(f"Relatório Mensal — {mes:02d}/{ano}", title_style))
+
+    # subtítulo e linhas
+    titulo_uvis = ""
+    if uvis_id:
+        nome = nome_uvis(uvis_id)
+        if nome:
+            titulo_uvis = f" — {nome}"
+    story.append(Paragraph(f"Sistema de Gestão de Solicitações{titulo_uvis}", subtitle_style))
+    story.append(Spacer(1, 8))
+
+    # capa: box com resumo principal (centralizado)
+    resumo_box = [
+        ['Métrica', 'Quantidade'],
+        ['Total de Solicitações', str(total_solicitacoes)],
+        ['Aprovadas', str(total_aprovadas)],
+        ['Recusadas', str(total_recusadas)],
+        ['Em Análise', str(total_analise)],
+        ['Pendentes', str(total_pendentes)]
+    ]
+    story.append(render_small_table(resumo_box, [80*mm, 40*mm]))
+    story.append(Spacer(1, 12))
+
+    # Capa: breve meta-infos
+    story.append(Paragraph(f"Gerado por: Sistema SGSV — Gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}", small))
+    story.append(Spacer(1, 18))
+
+    # -------------------------
+    # Sumário simples (lista de seções)
+    # -------------------------
+    story.append(Paragraph("Sumário", section_h))
+    sumario_itens = [
+        "Resumo Geral",
+        "Solicitações por Região",
+        "Status Detalhado",
+        "Solicitações por Foco / Tipo / Altura",
+        "Solicitações por Unidade (UVIS)",
+        "Histórico Mensal",
+        "Gráficos (Visão Geral)",
+        "Registros Detalhados"
+    ]
+    for i, it in enumerate(sumario_itens, 1):
+        story.append(Paragraph(f"{i}. {it}", normal))
+    story.append(PageBreak())
+
+    # -------------------------
+    # Seções com tabelas (formatadas)
+    # -------------------------
+    # 1) Resumo Geral (repetição do box com estilo)
+    story.append(Paragraph("Resumo Geral", section_h))
+    story.append(render_small_table(resumo_box, [110*mm, 50*mm]))
+    story.append(Spacer(1, 8))
+
+    # 2) Regiões
+    story.append(Paragraph("Solicitações por Região", section_h))
+    rows = [['Região', 'Total']] + [[r, str(c)] for r, c in dados_regiao]
+    story.append(render_small_table(rows, [110*mm, 50*mm]))
+    story.append(Spacer(1, 8))
+
+    # 3) Status
+    story.append(Paragraph("Status Detalhado", section_h))
+    rows = [['Status', 'Total']] + [[s, str(c)] for s, c in dados_status]
+    story.append(render_small_table(rows, [110*mm, 50*mm]))
+    story.append(Spacer(1, 8))
+
+    # 4) Foco / Tipo / Altura
+    story.append(Paragraph("Solicitações por Foco", section_h))
+    rows = [['Foco', 'Total']] + [[f, str(c)] for f, c in dados_foco]
+    story.append(render_small_table(rows, [110*mm, 50*mm]))
+    story.append(Spacer(1, 6))
+
+    story.append(Paragraph("Solicitações por Tipo de Visita", section_h))
+    rows = [['Tipo', 'Total']] + [[t, str(c)] for t, c in dados_tipo_visita]
+    story.append(render_small_table(rows, [110*mm, 50*mm]))
+    story.append(Spacer(1, 6))
+
+    story.append(Paragraph("Solicitações por Altura de Voo", section_h))
+    rows = [['Altura (m)', 'Total']] + [[str(a), str(c)] for a, c in dados_altura_voo]
+    story.append(render_small_table(rows, [110*mm, 50*mm]))
+    story.append(Spacer(1, 8))
+
+    # 5) UVIS
+    story.append(Paragraph("Solicitações por Unidade (UVIS) — Top", section_h))
+    rows = [['Unidade', 'Total']] + [[u, str(c)] for u, c in dados_unidade]
+    story.append(render_small_table(rows, [110*mm, 50*mm]))
+    story.append(Spacer(1, 8))
+
+    # 6) Histórico mensal
+    story.append(Paragraph("Histórico Mensal (Total por Mês)", section_h))
+    rows = [['Mês', 'Total']] + [[m, str(c)] for m, c in dados_mensais]
+    story.append(render_small_table(rows, [70*mm, 40*mm]))
+    story.append(Spacer(1, 12))
+
+    # 7) Gráficos — somente se matplotlib disponível
+    story.append(PageBreak())
+    story.append(Paragraph("Gráficos (Visão Geral)", section_h))
+    if MATPLOTLIB_DISPONIVEL:
+        try:
+            # Os três gráficos são desenhados em paralelo (app/graficos.py):
+            # pizza por status, barras com o top UVIS e linha do histórico
+            graficos = renderizar_graficos([
+                ('status', ([s for s, _ in dados_status], [c for _, c in dados_status])),
+                ('unidades', ([u for u, _ in dados_unidade[:8]], [c for _, c in dados_unidade[:8]])),
+                ('mensal', ([m for m, _ in dados_mensais], [c for _, c in dados_mensais])),
+            ])
+
+            for i, png in enumerate(graficos):
+                story.append(img_from_png(png))
+                story.append(Spacer(1, 8 if i < len(graficos) - 1 else 6))
+        except Exception:
+            # se algo falhar nos gráficos, apenas passa
+            story.append(Paragraph("Gráficos indisponíveis (erro ao gerar).", normal))
+            story.append(Spacer(1, 8))
+    else:
+        story.append(Paragraph("Matplotlib não disponível — gráficos foram omitidos.", normal))
+        story.append(Spacer(1, 8))
+
+    # 8) Registros detalhados (tabela grande)
+    story.append(PageBreak())
+    story.append(Paragraph("Registros Detalhados", section_h))
+    story.append(Spacer(1, 6))
+
+    # (linhas montadas no passo 2, junto com os totais)
+    # Dividimos a tabela em pedaços para evitar problemas de memória/páginas
+    # e garantir que não estoure
+    chunk_size = 40
+    for i in range(0, len(registros_rows), chunk_size):
+        chunk = registros_rows[i:i+chunk_size]
+        tbl = Table(chunk, repeatRows=1, colWidths=[18*mm, 14*mm, 35*mm, 26*mm, 22*mm, 28*mm, 28*mm, 30*mm, 45*mm])
+        tbl.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#0d6efd')),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0,0), (-1,0), 9),
+            ('GRID', (0,0), (-1,-1), 0.25, colors.lightgrey),
+            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor('#fbfdff')]),
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('LEFTPADDING', (0,0), (-1,-1), 4),
+            ('RIGHTPADDING', (0,0), (-1,-1), 4),
+            ('TOPPADDING', (0,0), (-1,-1), 3),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 3),
+        ]))
+        story.append(tbl)
+        story.append(Spacer(1, 8))
+        # adiciona quebra de página entre chunks (exceto se for o último)
+        if i + chunk_size < len(registros_rows):
+            story.append(PageBreak())
+
+    # -------------------------
+    # Footer fixo e page numbers
+    # -------------------------
+    # Usaremos canvas callbacks quando build() for chamado.
+    def _header_footer(canvas, doc):
+        # header (linha superior colorida)
+        canvas.saveState()
+        w, h = pagesize
+        # linha azul
+        canvas.setFillColor(colors.HexColor('#0d6efd'))
+        canvas.rect(doc.leftMargin, h - (12*mm), doc.width, 4, fill=1, stroke=0)
+
+        # rodapé: texto e número de página
+        footer_text = "Sistema de Gestão de Solicitações — SGSV"
+        canvas.setFont("Helvetica", 8)
+        canvas.setFillColor(colors.HexColor('#777'))
+        canvas.drawString(doc.leftMargin, 10*mm, footer_text)
+
+        # número de páginas
+        page_num_text = f"Página {canvas.getPageNumber()}"
+        canvas.drawRightString(doc.leftMargin + doc.width, 10*mm, page_num_text)
+        canvas.restoreState()
+
+    # -------------------------
+    # Build
+    # -------------------------
+    doc.build(story, onFirstPage=_header_footer, onLaterPages=_header_footer)
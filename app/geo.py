@@ -0,0 +1,197 @@
+import math
+import re
+
+from sqlalchemy import and_, or_
+
+
+# -------------------------------------------------------------
+# COORDENADAS E GEOHASH
+# -------------------------------------------------------------
+# latitude/longitude ficam como REAL e cada solicitação guarda também o
+# geohash do ponto. Como pontos próximos compartilham o prefixo do
+# geohash, uma área do mapa vira poucos intervalos no índice da coluna
+# (geohash >= 'prefixo' AND geohash < 'prefixo~'); o filtro exato por
+# latitude/longitude roda só sobre o que sobrou.
+
+GEOHASH_PRECISAO = 9          # ~5 m
+MAX_PREFIXOS = 32             # intervalos por consulta de área
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_NUMERO = re.compile(r'[-+]?\d+(?:[.,]\d+)?')
+
+
+def ler_coordenada(valor, limite):
+    """
+    Converte o texto do formulário/banco antigo ("-23,5505", " -23.55° ")
+    em float. Retorna None se vazio, ilegível ou fora de [-limite, limite].
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        numero = float(valor)
+    else:
+        encontrado = _NUMERO.search(str(valor))
+        if not encontrado:
+            return None
+        numero = float(encontrado.group().replace(',', '.'))
+
+    if math.isnan(numero) or abs(numero) > limite:
+        return None
+    return numero
+
+
+def ler_latitude(valor):
+    return ler_coordenada(valor, 90)
+
+
+def ler_longitude(valor):
+    return ler_coordenada(valor, 180)
+
+
+def geohash(latitude, longitude, precisao=GEOHASH_PRECISAO):
+    """Codifica o ponto em geohash (base32, `precisao` caracteres)."""
+    lat_min, lat_max = -90.0, 90.0
+    lon_min, lon_max = -180.0, 180.0
+    resultado = []
+    bits, valor, usar_longitude = 0, 0, True
+
+    while len(resultado) < precisao:
+        if usar_longitude:
+            meio = (lon_min + lon_max) / 2
+            if longitude >= meio:
+                valor = valor * 2 + 1
+                lon_min = meio
+            else:
+                valor = valor * 2
+                lon_max = meio
+        else:
+            meio = (lat_min + lat_max) / 2
+            if latitude >= meio:
+                valor = valor * 2 + 1
+                lat_min = meio
+            else:
+                valor = valor * 2
+                lat_max = meio
+
+        usar_longitude = not usar_longitude
+        bits += 1
+        if bits == 5:
+            resultado.append(_BASE32[valor])
+            bits, valor = 0, 0
+
+    return ''.join(resultado)
+
+
+def _tamanho_celula(precisao):
+    """(altura, largura) em graus de uma célula de geohash com `precisao` caracteres."""
+    bits = 5 * precisao
+    bits_lon = (bits + 1) // 2
+    bits_lat = bits // 2
+    return 180.0 / (2 ** bits_lat), 360.0 / (2 ** bits_lon)
+
+
+def prefixos_area(sul, oeste, norte, leste, maximo=MAX_PREFIXOS):
+    """
+    Prefixos de geohash que cobrem o retângulo. Usa a maior precisão que
+    gere no máximo `maximo` células (quanto menor a área, mais fino).
+    """
+    for precisao in range(GEOHASH_PRECISAO, 0, -1):
+        altura, largura = _tamanho_celula(precisao)
+        linhas = range(math.floor((sul + 90) / altura), math.floor((norte + 90) / altura) + 1)
+        colunas = range(math.floor((oeste + 180) / largura), math.floor((leste + 180) / largura) + 1)
+
+        if len(linhas) * len(colunas) > maximo:
+            continue
+
+        # Codifica o centro de cada célula da grade
+        return sorted({
+            geohash(
+                min(-90 + (i + 0.5) * altura, 90),
+                min(-180 + (j + 0.5) * largura, 180),
+                precisao
+            )
+            for i in linhas for j in colunas
+        })
+
+    return ['']  # área do tamanho do mundo: sem restrição de prefixo
+
+
+def _sucessor(prefixo):
+    """Próximo prefixo irmão na ordem base32 (None se for o último)."""
+    posicao = _BASE32.index(prefixo[-1])
+    if posicao + 1 == len(_BASE32):
+        return None
+    return prefixo[:-1] + _BASE32[posicao + 1]
+
+
+def intervalos_prefixos(prefixos):
+    """Junta prefixos irmãos consecutivos em intervalos [inicio, fim) de texto."""
+    intervalos = []
+    for prefixo in sorted(prefixos):
+        if intervalos and prefixo and _sucessor(intervalos[-1][1]) == prefixo:
+            intervalos[-1][1] = prefixo
+        else:
+            intervalos.append([prefixo, prefixo])
+    return [(inicio, ultimo + '~') for inicio, ultimo in intervalos]
+
+
+def filtro_area(modelo, sul, oeste, norte, leste, condicoes=()):
+    """
+    Condição SQLAlchemy "ponto dentro do retângulo" para um model com as
+    colunas latitude, longitude e geohash: intervalos de prefixo (índice)
+    + conferência exata das coordenadas.
+
+    `condicoes` de igualdade (ex.: status == 'APROVADO') são repetidas em
+    cada intervalo, para cada faixa ser uma busca num índice (coluna,
+    geohash). Fora do OR, sem estatísticas (ANALYZE) o SQLite prefere a
+    igualdade sozinha e lê todas as linhas daquele valor.
+    """
+    intervalos = [
+        and_(*condicoes, modelo.geohash >= inicio, modelo.geohash < fim)
+        for inicio, fim in intervalos_prefixos(prefixos_area(sul, oeste, norte, leste))
+    ]
+    return and_(
+        or_(*intervalos),
+        modelo.latitude.between(sul, norte),
+        modelo.longitude.between(oeste, leste)
+    )
+
+
+def ler_bbox(valor):
+    """Lê 'oeste,sul,leste,norte' (ordem do Leaflet/GeoJSON). Retorna a tupla (sul, oeste, norte, leste) ou None."""
+    try:
+        oeste, sul, leste, norte = (float(parte) for parte in (valor or '').split(','))
+    except ValueError:
+        return None
+
+    if not (-90 <= sul <= norte <= 90 and -180 <= oeste <= leste <= 180):
+        return None
+    return sul, oeste, norte, leste
+
+
+# -------------------------------------------------------------
+# Distâncias
+# -------------------------------------------------------------
+RAIO_TERRA_METROS = 6371008.8
+METROS_POR_GRAU = 111320.0
+
+
+def distancia_metros(lat1, lon1, lat2, lon2):
+    """Distância (haversine) entre dois pontos, em metros."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAIO_TERRA_METROS * math.asin(math.sqrt(a))
+
+
+def area_ao_redor(latitude, longitude, metros):
+    """Retângulo (sul, oeste, norte, leste) que contém o círculo de `metros` ao redor do ponto."""
+    dlat = metros / METROS_POR_GRAU
+    dlon = metros / (METROS_POR_GRAU * max(math.cos(math.radians(latitude)), 0.01))
+    return (
+        max(latitude - dlat, -90.0),
+        max(longitude - dlon, -180.0),
+        min(latitude + dlat, 90.0),
+        min(longitude + dlon, 180.0)
+    )
@@ -0,0 +1,295 @@
+import os
+import re
+import threading
+import unicodedata
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import update
+
+from app import db
+from app import geo
+from app.models import Solicitacao, Geocodificacao
+from app.banco import insert_upsert
+from app.importacao import ler_linhas
+from app.cache_relatorios import registrar_alteracoes
+from app.tarefas import executar_em_segundo_plano
+
+
+# -------------------------------------------------------------
+# GEOCODIFICAÇÃO OFFLINE (gazetteer local + cache no banco)
+# -------------------------------------------------------------
+# O endereço (cep, logradouro, número) vira uma chave normalizada. A
+# chave é procurada primeiro na tabela geocodificacoes; só se não estiver
+# lá o gazetteer local (instance/gazetteer.csv: cep, logradouro, numero,
+# latitude, longitude) é consultado, do ponto exato para o CEP inteiro.
+# O resultado, inclusive "não encontrado", é gravado na tabela, então o
+# mesmo endereço não é geocodificado duas vezes. Um "não encontrado" só
+# vale enquanto o gazetteer não mudar: gravado antes da última alteração
+# do arquivo, o endereço é procurado de novo (e o registro, atualizado).
+
+LOTE_PREENCHIMENTO = 500
+
+_ABREVIACOES = {
+    'r': 'rua', 'av': 'avenida', 'al': 'alameda', 'tv': 'travessa', 'trav': 'travessa',
+    'pca': 'praca', 'pc': 'praca', 'est': 'estrada', 'estr': 'estrada', 'rod': 'rodovia',
+    'lgo': 'largo', 'vl': 'vila', 'jd': 'jardim', 'pq': 'parque',
+}
+_NAO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+_DIGITOS = re.compile(r'\d+')
+
+
+def _normalizar_logradouro(logradouro):
+    """'R. São  Bento' -> 'rua sao bento'."""
+    texto = unicodedata.normalize('NFKD', logradouro or '').encode('ascii', 'ignore').decode().lower()
+    palavras = _NAO_ALFANUMERICO.sub(' ', texto).split()
+    if palavras and palavras[0] in _ABREVIACOES:
+        palavras[0] = _ABREVIACOES[palavras[0]]
+    return ' '.join(palavras)
+
+
+def chave_endereco(cep, logradouro, numero):
+    """Chave 'cep|logradouro|numero' normalizada ('' se não houver CEP nem logradouro)."""
+    cep = ''.join(_DIGITOS.findall(str(cep or '')))
+    cep = cep if len(cep) == 8 else ''
+    logradouro = _normalizar_logradouro(logradouro)
+    if not cep and not logradouro:
+        return ''
+    encontrado = _DIGITOS.match(str(numero or '').strip())
+    return f"{cep}|{logradouro}|{encontrado.group() if encontrado else ''}"
+
+
+def _tentativas(chave):
+    """Chaves do gazetteer, da mais precisa para a menos: [(chave, precisao)]."""
+    cep, logradouro, numero = chave.split('|')
+    tentativas = []
+    if numero and logradouro:
+        tentativas.append((chave, 'numero'))
+    if logradouro:
+        tentativas.append((f"{cep}|{logradouro}|", 'logradouro'))
+    if cep:
+        tentativas.append((f"{cep}||", 'cep'))
+    return tentativas
+
+
+# -------------------------------------------------------------
+# Gazetteer (carregado uma vez por processo, recarregado se mudar)
+# -------------------------------------------------------------
+_gazetteer = None
+_trava = threading.Lock()
+
+
+def caminho_gazetteer():
+    return current_app.config.get('GAZETTEER_ARQUIVO') or os.path.join(current_app.instance_path, 'gazetteer.csv')
+
+
+def _carregar_gazetteer(caminho):
+    """{chave: (latitude, longitude)}; o mesmo ponto também vale para rua e CEP."""
+    pontos = {}
+    with open(caminho, 'rb') as arquivo:
+        linhas = ler_linhas(arquivo, caminho)
+        cabecalho = [str(nome or '').strip().lower() for nome in next(linhas, [])]
+        for valores in linhas:
+            registro = dict(zip(cabecalho, valores))
+            latitude = geo.ler_latitude(registro.get('latitude'))
+            longitude = geo.ler_longitude(registro.get('longitude'))
+            chave = chave_endereco(registro.get('cep'), registro.get('logradouro'), registro.get('numero'))
+            if latitude is None or longitude is None or not chave:
+                continue
+            pontos[chave] = (latitude, longitude)
+
+    # Rua e CEP sem número: usa o primeiro ponto informado para eles
+    for chave, ponto in list(pontos.items()):
+        for tentativa, _ in _tentativas(chave)[1:]:
+            pontos.setdefault(tentativa, ponto)
+    return pontos
+
+
+def _pontos_gazetteer():
+    """Dicionário do gazetteer atual, ou None se o arquivo não existir."""
+    global _gazetteer
+    caminho = caminho_gazetteer()
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+
+    assinatura = (caminho, estado.st_ino, estado.st_mtime_ns, estado.st_size)
+    if _gazetteer is None or _gazetteer[0] != assinatura:
+        with _trava:
+            if _gazetteer is None or _gazetteer[0] != assinatura:
+                _gazetteer = (assinatura, _carregar_gazetteer(caminho))
+    return _gazetteer[1]
+
+
+def gazetteer_disponivel():
+    return os.path.exists(caminho_gazetteer())
+
+
+def _atualizacao_gazetteer():
+    """Momento (UTC) da última alteração do gazetteer, ou None se ele não existir."""
+    try:
+        return datetime.utcfromtimestamp(os.stat(caminho_gazetteer()).st_mtime)
+    except FileNotFoundError:
+        return None
+
+
+# -------------------------------------------------------------
+# Consulta (cache no banco -> gazetteer)
+# -------------------------------------------------------------
+def _ponto(registro):
+    if registro is None or registro.latitude is None:
+        return None
+    return registro.latitude, registro.longitude
+
+
+def _vale(registro, atualizacao):
+    """Ponto encontrado, ou "não encontrado" gravado depois da última alteração do gazetteer."""
+    if registro.latitude is not None or atualizacao is None:
+        return True
+    return registro.data_criacao is not None and registro.data_criacao >= atualizacao
+
+
+def geocodificar(cep, logradouro, numero, cache=None):
+    """
+    (latitude, longitude) do endereço, ou None. Grava o resultado no
+    cache (sem commit: quem chama decide). Sem gazetteer, nada é gravado.
+
+    `cache` ({chave: (latitude, longitude) ou None}) evita a consulta por
+    endereço quando quem chama já trouxe as chaves do lote; os resultados
+    novos também entram nele.
+    """
+    chave = chave_endereco(cep, logradouro, numero)
+    if not chave:
+        return None
+
+    if cache is not None:
+        if chave in cache:
+            return cache[chave]
+    else:
+        em_cache = db.session.get(Geocodificacao, chave)
+        if em_cache is not None and _vale(em_cache, _atualizacao_gazetteer()):
+            return _ponto(em_cache)
+
+    pontos = _pontos_gazetteer()
+    if pontos is None:
+        return None
+
+    valores = {'chave': chave, 'latitude': None, 'longitude': None, 'precisao': None,
+               'data_criacao': datetime.utcnow()}
+    for tentativa, precisao in _tentativas(chave):
+        if tentativa in pontos:
+            valores['latitude'], valores['longitude'] = pontos[tentativa]
+            valores['precisao'] = precisao
+            break
+
+    # ON CONFLICT: dois pedidos com o mesmo endereço gravados ao mesmo tempo
+    # chegam ao mesmo resultado, e quem gravar depois não derruba a própria
+    # transação com a chave primária repetida. Só um "não encontrado" (o
+    # antigo, vencido pelo gazetteer novo) é sobrescrito; ponto achado fica.
+    comando = insert_upsert(Geocodificacao).values(**valores)
+    db.session.execute(comando.on_conflict_do_update(
+        index_elements=[Geocodificacao.chave],
+        set_={coluna: comando.excluded[coluna] for coluna in ('latitude', 'longitude', 'precisao', 'data_criacao')},
+        where=Geocodificacao.latitude.is_(None)
+    ))
+
+    ponto = None if valores['latitude'] is None else (valores['latitude'], valores['longitude'])
+    if cache is not None:
+        cache[chave] = ponto
+    return ponto
+
+
+def preencher_coordenadas(pedido):
+    """Se o pedido está sem coordenadas, tenta preenchê-las pelo endereço. Retorna True se preencheu."""
+    if pedido.latitude is not None and pedido.longitude is not None:
+        return False
+
+    ponto = geocodificar(pedido.cep, pedido.logradouro, pedido.numero)
+    if ponto is None:
+        return False
+    return pedido.set_coordenadas(*ponto)
+
+
+# -------------------------------------------------------------
+# Preenchimento em lote dos pedidos antigos
+# -------------------------------------------------------------
+def preencher_pendentes(lote=LOTE_PREENCHIMENTO, limite=None):
+    """
+    Geocodifica os pedidos sem coordenadas, em lotes por id (um UPDATE
+    executemany + um commit por lote). Retorna (verificados, preenchidos).
+    """
+    verificados = preenchidos = 0
+    ultimo_id = 0
+    while limite is None or verificados < limite:
+        tamanho = lote if limite is None else min(lote, limite - verificados)
+        pedidos = db.session.query(
+            Solicitacao.id, Solicitacao.cep, Solicitacao.logradouro, Solicitacao.numero,
+            Solicitacao.data_criacao
+        ).filter(Solicitacao.id > ultimo_id, Solicitacao.latitude.is_(None)) \
+            .order_by(Solicitacao.id).limit(tamanho).all()
+        if not pedidos:
+            break
+
+        # Traz as chaves já em cache de uma vez (uma consulta por lote, não por pedido)
+        chaves = {chave_endereco(p.cep, p.logradouro, p.numero) for p in pedidos} - {''}
+        atualizacao = _atualizacao_gazetteer()
+        em_cache = {
+            registro.chave: _ponto(registro)
+            for registro in Geocodificacao.query.filter(Geocodificacao.chave.in_(chaves))
+            if _vale(registro, atualizacao)
+        }
+
+        parametros = []
+        alterados = []
+        for pedido in pedidos:
+            ponto = geocodificar(pedido.cep, pedido.logradouro, pedido.numero, em_cache)
+            if ponto is not None:
+                latitude, longitude = ponto
+                parametros.append({
+                    'id': pedido.id, 'latitude': latitude, 'longitude': longitude,
+                    'geohash': geo.geohash(latitude, longitude)
+                })
+                alterados.append(pedido)
+
+        if parametros:
+            db.session.execute(update(Solicitacao), parametros)
+            registrar_alteracoes(alterados)
+        db.session.commit()  # grava também as chaves novas do cache
+
+        verificados += len(pedidos)
+        preenchidos += len(parametros)
+        ultimo_id = pedidos[-1].id
+
+    return verificados, preenchidos
+
+
+_preenchimento = None  # Future do preenchimento em segundo plano (um por processo web)
+
+
+def iniciar_preenchimento():
+    """
+    Dispara preencher_pendentes no pool de processos. Retorna False se
+    já houver um preenchimento em andamento.
+    """
+    global _preenchimento
+    with _trava:
+        if _preenchimento is not None and not _preenchimento.done():
+            return False
+        _preenchimento = executar_em_segundo_plano(preencher_pendentes)
+    return True
+
+
+@click.command('geocodificar-pendentes')
+@click.option('--limite', type=int, default=None, help='Máximo de pedidos verificados.')
+@with_appcontext
+def geocodificar_pendentes_command(limite):
+    """Preenche latitude/longitude dos pedidos antigos pelo gazetteer local."""
+    if not gazetteer_disponivel():
+        click.echo(f">>> Gazetteer não encontrado em {caminho_gazetteer()}.")
+        return
+
+    verificados, preenchidos = preencher_pendentes(limite=limite)
+    click.echo(f">>> {verificados} pedidos sem coordenadas verificados, {preenchidos} preenchidos.")
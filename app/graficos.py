@@ -0,0 +1,163 @@
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+
+# -------------------------------------------------------------
+# GRÁFICOS DO RELATÓRIO PDF (matplotlib)
+# -------------------------------------------------------------
+# Cada gráfico é desenhado num pool de processos com o backend Agg já
+# carregado, então o PDF espera apenas pelo gráfico mais lento. O PNG
+# resultante fica num cache LRU em memória, indexado pelo hash da série
+# de entrada: distribuições iguais não são redesenhadas.
+
+MATPLOTLIB_DISPONIVEL = importlib.util.find_spec('matplotlib') is not None
+
+DPI = 150
+MAX_CACHE = 128
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# -------------------------------------------------------------
+# Desenho (roda dentro dos processos do pool)
+# -------------------------------------------------------------
+def _preparar_processo():
+    """Initializer do pool: carrega matplotlib com backend Agg uma vez só."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+
+
+def _png(fig):
+    import matplotlib.pyplot as plt
+    bio = BytesIO()
+    fig.tight_layout()
+    fig.savefig(bio, format='png', dpi=DPI, bbox_inches='tight')
+    plt.close(fig)
+    return bio.getvalue()
+
+
+def _grafico_status(labels, values):
+    """Pizza: distribuição por status."""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(6, 3))
+    ax.pie(values or [1], labels=labels, autopct=lambda p: f'{p:.0f}%' if p > 0 else '', startangle=90, textprops={'fontsize': 8})
+    ax.axis('equal')
+    return _png(fig)
+
+
+def _grafico_unidades(nomes, valores):
+    """Barras horizontais: top UVIS."""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(8, 2.6))
+    ax.barh(nomes[::-1] or ['Nenhum'], valores[::-1] or [0])
+    ax.set_xlabel('Total')
+    ax.set_title('Top UVIS (maiores)', fontsize=9)
+    ax.tick_params(axis='y', labelsize=8)
+    return _png(fig)
+
+
+def _grafico_mensal(meses, totais):
+    """Linha: histórico mensal."""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(8, 2.6))
+    if meses:
+        ax.plot(meses, totais, marker='o', linewidth=1)
+        ax.set_xticks(range(len(meses)))
+        ax.set_xticklabels(meses, rotation=45, fontsize=8)
+    ax.set_title('Histórico Mensal', fontsize=9)
+    ax.grid(axis='y', linestyle=':', linewidth=0.5)
+    return _png(fig)
+
+
+GRAFICOS = {
+    'status': _grafico_status,
+    'unidades': _grafico_unidades,
+    'mensal': _grafico_mensal,
+}
+
+
+def desenhar(tipo, dados):
+    """Desenha um gráfico e retorna os bytes do PNG."""
+    return GRAFICOS[tipo](*dados)
+
+
+# -------------------------------------------------------------
+# Cache e despacho para o pool
+# -------------------------------------------------------------
+def _chave(tipo, dados):
+    conteudo = json.dumps([tipo, dados, DPI], default=str)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def _do_cache(chave):
+    with _cache_lock:
+        png = _cache.get(chave)
+        if png is not None:
+            _cache.move_to_end(chave)
+        return png
+
+
+def _guardar(chave, png):
+    with _cache_lock:
+        _cache[chave] = png
+        _cache.move_to_end(chave)
+        while len(_cache) > MAX_CACHE:
+            _cache.popitem(last=False)
+
+
+def _obter_executor():
+    """Pool criado sob demanda (nunca no import, por causa do fork)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=len(GRAFICOS),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_preparar_processo
+            )
+        return _executor
+
+
+def renderizar_graficos(pedidos):
+    """
+    Recebe [(tipo, dados), ...] e retorna a lista de PNGs na mesma ordem.
+
+    Os que não estão no cache são desenhados em paralelo no pool; se o
+    pool não estiver disponível, desenha no próprio processo.
+    """
+    global _executor
+    chaves = [_chave(tipo, dados) for tipo, dados in pedidos]
+    resultado = [_do_cache(chave) for chave in chaves]
+    faltando = [i for i, png in enumerate(resultado) if png is None]
+
+    if not faltando:
+        return resultado
+
+    try:
+        executor = _obter_executor()
+        futuros = {i: executor.submit(desenhar, *pedidos[i]) for i in faltando}
+        for i, futuro in futuros.items():
+            resultado[i] = futuro.result()
+    except (BrokenProcessPool, OSError):
+        with _executor_lock:
+            _executor = None
+        _preparar_processo()
+        for i in faltando:
+            resultado[i] = desenhar(*pedidos[i])
+
+    for i in faltando:
+        _guardar(chaves[i], resultado[i])
+
+    return resultado
@@ -0,0 +1,320 @@
+import csv
+import io
+import unicodedata
+from collections import Counter
+from datetime import datetime, date, time
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+
+from app import db
+from app import geo
+from app.models import Solicitacao
+from app.mensal import chave_mensal, aplicar_deltas_mensal
+from app.cache_relatorios import registrar_alteracoes
+
+
+# -------------------------------------------------------------
+# IMPORTAÇÃO EM LOTE (planilha CSV/XLSX -> solicitacoes)
+# -------------------------------------------------------------
+# A planilha é lida linha a linha (csv ou openpyxl em modo read_only),
+# validada com as mesmas regras do formulário de cadastro e gravada em
+# blocos: cada bloco é um INSERT executemany + ajuste do consolidado e
+# do cache + um commit. Linhas com erro não entram e voltam no
+# relatório com o número da linha na planilha.
+
+TAMANHO_BLOCO = 200
+LIMITE_LINHAS = 2000
+EXTENSOES = ('.csv', '.xlsx')
+
+# Coluna do model -> nomes aceitos no cabeçalho (já normalizados)
+COLUNAS = {
+    'data_agendamento': ('data', 'data_agendamento', 'data_voo'),
+    'hora_agendamento': ('hora', 'hora_agendamento', 'horario'),
+    'foco': ('foco',),
+    'tipo_visita': ('tipo_visita', 'tipo', 'visita'),
+    'altura_voo': ('altura_voo', 'altura'),
+    'criadouro': ('criadouro',),
+    'apoio_cet': ('apoio_cet', 'cet'),
+    'observacao': ('observacao', 'observacoes', 'obs'),
+    'cep': ('cep',),
+    'logradouro': ('logradouro', 'endereco', 'rua'),
+    'numero': ('numero', 'n', 'no'),  # 'Nº' normaliza para 'no'
+    'complemento': ('complemento',),
+    'bairro': ('bairro',),
+    'cidade': ('cidade', 'municipio'),
+    'uf': ('uf', 'estado'),
+    'latitude': ('latitude', 'lat'),
+    'longitude': ('longitude', 'lon', 'lng'),
+}
+
+OBRIGATORIAS = ('data_agendamento', 'hora_agendamento', 'foco', 'cep', 'logradouro', 'bairro', 'cidade', 'uf')
+
+# Cabeçalho da planilha modelo (mesma ordem do formulário)
+MODELO = (
+    'data', 'hora', 'foco', 'tipo_visita', 'altura_voo', 'criadouro', 'apoio_cet',
+    'cep', 'logradouro', 'numero', 'complemento', 'bairro', 'cidade', 'uf',
+    'latitude', 'longitude', 'observacao'
+)
+EXEMPLO = (
+    '2026-11-05', '09:30', 'Terreno Baldio', 'aedes', '20m', 'sim', 'nao',
+    '01001-000', 'Praça da Sé', '100', '', 'Sé', 'São Paulo', 'SP',
+    '-23.550520', '-46.633308', ''
+)
+
+_VERDADEIROS = {'sim', 's', 'x', 'true', '1', 'yes'}
+_FALSOS = {'nao', 'n', 'false', '0', 'no', ''}
+_FORMATOS_DATA = ('%Y-%m-%d', '%d/%m/%Y', '%d/%m/%y', '%d-%m-%Y')
+_FORMATOS_HORA = ('%H:%M', '%H:%M:%S', '%Hh%M', '%Hh')
+
+
+def _normalizar(texto):
+    """'Data do Voo ' -> 'data_do_voo' (sem acento, minúsculo, com _)."""
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode()
+    return '_'.join(texto.lower().replace('.', ' ').split())
+
+
+_ALIASES = {nome: coluna for coluna, nomes in COLUNAS.items() for nome in nomes}
+
+
+def mapear_cabecalho(cabecalho):
+    """
+    Retorna ({índice: coluna}, [colunas obrigatórias que faltam]).
+    Colunas desconhecidas são ignoradas.
+    """
+    mapa = {}
+    for indice, nome in enumerate(cabecalho):
+        coluna = _ALIASES.get(_normalizar(nome))
+        if coluna and coluna not in mapa.values():
+            mapa[indice] = coluna
+    faltando = [coluna for coluna in OBRIGATORIAS if coluna not in mapa.values()]
+    return mapa, faltando
+
+
+# -------------------------------------------------------------
+# Leitura (gera listas de valores, a primeira é o cabeçalho)
+# -------------------------------------------------------------
+def _linhas_csv(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', errors='replace', newline='')
+    amostra = texto.read(4096)
+    texto.seek(0)
+    try:
+        delimitador = csv.Sniffer().sniff(amostra, delimiters=';,\t').delimiter
+    except csv.Error:
+        delimitador = ';' if amostra.count(';') > amostra.count(',') else ','
+    try:
+        yield from csv.reader(texto, delimiter=delimitador)
+    finally:
+        texto.detach()
+
+
+def _linhas_xlsx(arquivo):
+    from openpyxl import load_workbook  # só quando chega uma planilha .xlsx
+
+    livro = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        for linha in livro.active.iter_rows(values_only=True):
+            yield list(linha)
+    finally:
+        livro.close()
+
+
+def ler_linhas(arquivo, nome_arquivo):
+    """Iterador de linhas da planilha enviada (CSV ou XLSX)."""
+    nome = (nome_arquivo or '').lower()
+    if nome.endswith('.xlsx'):
+        return _linhas_xlsx(arquivo)
+    if nome.endswith('.csv'):
+        return _linhas_csv(arquivo)
+    raise ValueError(f"Formato não suportado (use {' ou '.join(EXTENSOES)}).")
+
+
+# -------------------------------------------------------------
+# Validação de uma linha
+# -------------------------------------------------------------
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)  # CEP/número lidos como número pelo Excel
+    return str(valor).strip()
+
+
+def _ler_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor)
+    for formato in _FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _ler_hora(valor):
+    if isinstance(valor, datetime):
+        return valor.time().replace(microsecond=0)
+    if isinstance(valor, time):
+        return valor.replace(microsecond=0)
+    texto = _texto(valor).lower()
+    for formato in _FORMATOS_HORA:
+        try:
+            return datetime.strptime(texto, formato).time()
+        except ValueError:
+            continue
+    return None
+
+
+def _ler_booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    texto = _normalizar(valor)
+    if texto in _VERDADEIROS:
+        return True
+    if texto in _FALSOS:
+        return False
+    return None
+
+
+def _tamanho_maximo(coluna):
+    return getattr(Solicitacao.__table__.c[coluna].type, 'length', None)
+
+
+def validar_linha(valores, mapa):
+    """
+    Converte uma linha da planilha nos campos de Solicitacao.
+    Retorna (campos, erros); `campos` só vale se `erros` estiver vazio.
+    """
+    brutos = {coluna: valores[indice] if indice < len(valores) else None for indice, coluna in mapa.items()}
+    campos = {}
+    erros = []
+
+    for coluna in OBRIGATORIAS:
+        if _texto(brutos.get(coluna)) == '':
+            erros.append(f"{coluna}: obrigatório")
+
+    if 'data_agendamento' in brutos and _texto(brutos['data_agendamento']):
+        campos['data_agendamento'] = _ler_data(brutos['data_agendamento'])
+        if campos['data_agendamento'] is None:
+            erros.append("data_agendamento: use AAAA-MM-DD ou DD/MM/AAAA")
+
+    if 'hora_agendamento' in brutos and _texto(brutos['hora_agendamento']):
+        campos['hora_agendamento'] = _ler_hora(brutos['hora_agendamento'])
+        if campos['hora_agendamento'] is None:
+            erros.append("hora_agendamento: use HH:MM")
+
+    for coluna in ('criadouro', 'apoio_cet'):
+        valor = _ler_booleano(brutos.get(coluna))
+        if valor is None:
+            erros.append(f"{coluna}: use sim ou não")
+        campos[coluna] = bool(valor)
+
+    for coluna in ('foco', 'tipo_visita', 'altura_voo', 'observacao', 'cep', 'logradouro',
+                   'numero', 'complemento', 'bairro', 'cidade', 'uf'):
+        texto = _texto(brutos.get(coluna))
+        maximo = _tamanho_maximo(coluna)
+        if maximo and len(texto) > maximo:
+            erros.append(f"{coluna}: máximo de {maximo} caracteres")
+        campos[coluna] = texto or None
+
+    if campos.get('uf'):
+        campos['uf'] = campos['uf'].upper()
+
+    # O Excel grava CEP como número e perde o zero à esquerda (01001000 -> 1001000)
+    if campos.get('cep') and campos['cep'].isdigit() and len(campos['cep']) <= 8:
+        cep = campos['cep'].zfill(8)
+        campos['cep'] = f"{cep[:5]}-{cep[5:]}"
+
+    # Mesma regra de set_coordenadas: informado e inválido é erro
+    latitude, longitude = brutos.get('latitude'), brutos.get('longitude')
+    campos['latitude'] = geo.ler_latitude(latitude)
+    campos['longitude'] = geo.ler_longitude(longitude)
+    if campos['latitude'] is None or campos['longitude'] is None:
+        if _texto(latitude) or _texto(longitude):
+            erros.append("latitude/longitude: coordenada inválida (use -23.550520)")
+        campos['latitude'] = campos['longitude'] = campos['geohash'] = None
+    else:
+        campos['geohash'] = geo.geohash(campos['latitude'], campos['longitude'])
+
+    return campos, erros
+
+
+# -------------------------------------------------------------
+# Importação
+# -------------------------------------------------------------
+def _gravar_bloco(registros):
+    """INSERT executemany + consolidado mensal + cache, num único commit."""
+    db.session.execute(insert(Solicitacao), registros)
+
+    pedidos = [SimpleNamespace(**registro) for registro in registros]  # só p/ as chaves, sem ORM
+    aplicar_deltas_mensal(Counter(chave_mensal(pedido) for pedido in pedidos))
+    registrar_alteracoes(pedidos)
+    db.session.commit()
+
+
+def importar(linhas, usuario_id, somente_validar=False,
+             tamanho_bloco=TAMANHO_BLOCO, limite=LIMITE_LINHAS):
+    """
+    Valida e grava as linhas (a primeira é o cabeçalho) como pedidos
+    PENDENTE do usuário. Retorna o relatório:
+
+        {'total': n, 'importadas': n, 'erros': [{'linha': 3, 'erros': [...]}],
+         'faltando': [...], 'limite_excedido': bool}
+    """
+    from app.geocodificacao import geocodificar  # import local: geocodificacao usa ler_linhas deste módulo
+
+    relatorio = {'total': 0, 'importadas': 0, 'erros': [], 'faltando': [], 'limite_excedido': False}
+
+    linhas = iter(linhas)
+    cabecalho = next(linhas, None)
+    mapa, relatorio['faltando'] = mapear_cabecalho(cabecalho or [])
+    if relatorio['faltando']:
+        return relatorio
+
+    criacao = datetime.utcnow()
+    bloco = []
+    for numero, valores in enumerate(linhas, start=2):
+        if not any(_texto(valor) for valor in valores):
+            continue  # linha em branco
+        if relatorio['total'] >= limite:
+            relatorio['limite_excedido'] = True
+            break
+        relatorio['total'] += 1
+
+        campos, erros = validar_linha(valores, mapa)
+        if erros:
+            relatorio['erros'].append({'linha': numero, 'erros': erros})
+            continue
+
+        # Sem coordenadas na planilha: tenta pelo endereço (cache/gazetteer local)
+        if campos['latitude'] is None and not somente_validar:
+            ponto = geocodificar(campos['cep'], campos['logradouro'], campos['numero'])
+            if ponto is not None:
+                campos['latitude'], campos['longitude'] = ponto
+                campos['geohash'] = geo.geohash(*ponto)
+
+        bloco.append(dict(campos, usuario_id=usuario_id, status='PENDENTE', data_criacao=criacao))
+        if len(bloco) >= tamanho_bloco:
+            if not somente_validar:
+                _gravar_bloco(bloco)
+            relatorio['importadas'] += len(bloco)
+            bloco = []
+
+    if bloco:
+        if not somente_validar:
+            _gravar_bloco(bloco)
+        relatorio['importadas'] += len(bloco)
+
+    return relatorio
+
+
+def planilha_modelo():
+    """CSV (texto) com o cabeçalho aceito e uma linha de exemplo."""
+    saida = io.StringIO()
+    escritor = csv.writer(saida, delimiter=';')
+    escritor.writerow(MODELO)
+    escritor.writerow(EXEMPLO)
+    return '\ufeff' + saida.getvalue()  # BOM: o Excel abre com acentos
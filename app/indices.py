@@ -0,0 +1,111 @@
+import sys
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import click
+from flask.cli import with_appcontext
+
+from app import db
+from app.models import Solicitacao
+from app.agregacoes import consulta_agregada
+from app.conflitos import consulta_candidatos
+from app.paginacao import consulta_pagina
+from app.routes import consulta_painel_uvis, consulta_painel_gestao, consulta_agenda, consulta_mapa
+
+
+# -------------------------------------------------------------
+# CONFERÊNCIA DOS PLANOS DE CONSULTA (EXPLAIN QUERY PLAN)
+# -------------------------------------------------------------
+# Monta as consultas das rotas mais acessadas com as mesmas funções que
+# as rotas usam (com valores de exemplo) e pede ao SQLite o plano de cada
+# uma. `flask verificar-indices` termina com código 1 se alguma delas
+# fizer varredura completa em solicitacoes, o que indica índice faltando
+# (ou consulta que deixou de usá-lo). As consultas por área também
+# precisam buscar por faixa de geohash: ler todas as linhas de um status
+# e só depois conferir a área não é varredura completa, mas é quase.
+
+TABELA = Solicitacao.__tablename__
+
+POR_PAGINA = 6
+_CURSOR = (datetime(2026, 1, 1), 100)
+_AREA = (-23.60, -46.70, -23.50, -46.60)
+_PEDIDO = SimpleNamespace(id=None, latitude=-23.55, longitude=-46.63)
+
+CONSULTAS = {
+    'dashboard': lambda: consulta_pagina(consulta_painel_uvis(1), POR_PAGINA),
+    'dashboard ?status': lambda: consulta_pagina(consulta_painel_uvis(1, 'PENDENTE'), POR_PAGINA),
+    'dashboard ?status&apos': lambda: consulta_pagina(
+        consulta_painel_uvis(1, 'PENDENTE'), POR_PAGINA, apos=_CURSOR),
+    'admin_dashboard': lambda: consulta_pagina(consulta_painel_gestao(), POR_PAGINA),
+    'admin_dashboard ?status': lambda: consulta_pagina(consulta_painel_gestao('PENDENTE'), POR_PAGINA),
+    'admin_dashboard ?status&apos': lambda: consulta_pagina(
+        consulta_painel_gestao('PENDENTE'), POR_PAGINA, apos=_CURSOR),
+    'admin_dashboard ?status&antes': lambda: consulta_pagina(
+        consulta_painel_gestao('PENDENTE'), POR_PAGINA, antes=_CURSOR),
+    'agenda_eventos (gestão)': lambda: consulta_agenda(date(2026, 1, 1), date(2026, 2, 1)),
+    'agenda_eventos (uvis)': lambda: consulta_agenda(date(2026, 1, 1), date(2026, 2, 1), usuario_id=1),
+    'mapa_solicitacoes': lambda: consulta_mapa(_AREA),
+    'mapa_solicitacoes ?status': lambda: consulta_mapa(_AREA, status='APROVADO'),
+    'conflitos_de': lambda: consulta_candidatos(_PEDIDO, [date(2026, 1, 1)], 500),
+    'relatorios': lambda: consulta_agregada('2026-01'),
+    'relatorios ?uvis_id': lambda: consulta_agregada('2026-01', uvis_id=1),
+}
+
+# Consultas que precisam usar as faixas de geohash (filtro_area) no índice
+CONSULTAS_AREA = ('mapa_solicitacoes', 'mapa_solicitacoes ?status', 'conflitos_de')
+
+
+def plano_consulta(query):
+    """Linhas de detalhe do EXPLAIN QUERY PLAN de uma query ORM."""
+    compilada = query.statement.compile(
+        dialect=db.engine.dialect,
+        compile_kwargs={'literal_binds': True}  # valores no texto, IN (...) expandido
+    )
+    linhas = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compilada}")
+    return [linha[-1] for linha in linhas]
+
+
+def varreduras_completas(plano):
+    """Passos do plano que leem solicitacoes inteira (SCAN sem índice)."""
+    return [passo for passo in plano if passo.strip() == f"SCAN {TABELA}"]
+
+
+def problemas_plano(nome, plano):
+    """Varreduras completas e, nas CONSULTAS_AREA, a falta da busca por geohash."""
+    problemas = varreduras_completas(plano)
+    if nome in CONSULTAS_AREA and not any('geohash>?' in passo for passo in plano):
+        problemas.append('sem busca por faixa de geohash')
+    return problemas
+
+
+def verificar_indices():
+    """Retorna {nome: (plano, problemas)} de todas as CONSULTAS."""
+    resultado = {}
+    for nome, montar in CONSULTAS.items():
+        plano = plano_consulta(montar())
+        resultado[nome] = (plano, problemas_plano(nome, plano))
+    return resultado
+
+
+@click.command('verificar-indices')
+@with_appcontext
+def verificar_indices_command():
+    """Confere (EXPLAIN QUERY PLAN) se as consultas das rotas usam índice."""
+    if db.engine.dialect.name != 'sqlite':
+        click.echo(">>> Conferência disponível apenas no SQLite.")
+        return
+
+    falhas = 0
+    for nome, (plano, problemas) in verificar_indices().items():
+        marca = 'FALHOU' if problemas else 'ok'
+        click.echo(f"[{marca}] {nome}")
+        for passo in plano:
+            click.echo(f"        {passo}")
+        for problema in problemas:
+            click.echo(f"      ! {problema}")
+        falhas += bool(problemas)
+
+    if falhas:
+        click.echo(f">>> {falhas} consulta(s) sem o índice esperado em {TABELA}.")
+        sys.exit(1)
+    click.echo(">>> Todas as consultas usam índice.")
@@ -0,0 +1,259 @@
+import os
+import sys
+import time
+
+import click
+from alembic import command
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, insert, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app import db
+from app.models import Usuario, Solicitacao, SolicitacaoMensal
+from app.busca import garantir_indice_busca
+from app.mensal import reconstruir_mensal
+from app.usuarios import limpar_cache_usuarios
+
+
+# -------------------------------------------------------------
+# INICIALIZAÇÃO DO BANCO (substitui o verificar_banco do run.py)
+# -------------------------------------------------------------
+# Roda na subida (run.py / wsgi.py) e em `flask inicializar-banco`:
+#
+#   1. Versão do schema: compara a revisão gravada em alembic_version com
+#      a head de migrations/. Banco em dia: nenhum DDL. Banco vazio: cria
+#      as tabelas e grava a head. Banco anterior às migrações (sem revisão,
+#      com o schema da REVISAO_LEGADO, como o instance/sgsv.db distribuído):
+#      marca essa revisão e aplica as migrações até a head. Banco numa
+#      revisão antiga: só avisa para rodar `flask db upgrade` e a subida
+#      é recusada (create_all criaria tabelas por fora das migrações).
+#   2. Usuários padrão: uma consulta traz os logins existentes e os que
+#      faltam entram num único INSERT, com o hash da senha já pronto
+#      (gerar um scrypt por usuário a cada subida custava ~100 ms cada).
+#   3. Consolidado mensal: reconstruído só se estiver vazio com pedidos no banco.
+#
+# Com o banco em dia são três consultas curtas. Vários workers subindo
+# juntos não duplicam nada: login é UNIQUE e quem perder a corrida
+# apenas descarta o próprio INSERT.
+
+# Hashes gerados com werkzeug.security.generate_password_hash (senhas de
+# desenvolvimento: admin123, operario123 e 1234 para os demais). Para
+# trocar uma senha padrão, gere um novo hash e substitua aqui.
+USUARIOS_PADRAO = (
+    {
+        'login': 'admin', 'tipo_usuario': 'admin',
+        'nome_uvis': 'Administrador Original', 'regiao': 'CENTRAL', 'codigo_setor': '00',
+        'senha_hash': 'scrypt:32768:8:1$9heJjviwkJRkACg8$87060ea6b8a74254290839c1ad763582c1daa8f6cdc0fa465d87f6a211c399a9d4f6d1d92ca712a21b20f428c080ab4c8603d193d873a6d42afca1e250d2214a',
+    },
+    {
+        # Permissão total de alteração, mas não de relatório
+        'login': 'operario', 'tipo_usuario': 'operario',
+        'nome_uvis': 'Usuário Operário', 'regiao': 'OPERACIONAL', 'codigo_setor': '98',
+        'senha_hash': 'scrypt:32768:8:1$xvXDlin7UynfnUk7$c6d840acf2dc5fb39e59945e6ccad7e3b4fc67a1ffa8645093d4d7cd489744407b8683bb97fc0e16021fd305b09761cfe6f365268eb8ca36e477a95666d68769',
+    },
+    {
+        'login': 'visualizar', 'tipo_usuario': 'visualizar',
+        'nome_uvis': 'Usuário Somente Leitura', 'regiao': 'AUDITORIA', 'codigo_setor': '99',
+        'senha_hash': 'scrypt:32768:8:1$m5eGZHgYMY8uPWU3$8da0940f014befd279869df5a8e21cac5ecb49c76dfc05f9f0542e4d6797a29507c6aef48320584a7ca518c83015f34dc25cf62a0fc56c3e06601acfc3fc1fff',
+    },
+    {
+        'login': 'lapa', 'tipo_usuario': 'uvis',
+        'nome_uvis': 'UVIS Lapa/Pinheiros', 'regiao': 'OESTE', 'codigo_setor': '90',
+        'senha_hash': 'scrypt:32768:8:1$cTEcg3KIOhVpllXi$57971d3294bbeaa12b7a220fe245d1f3a5ef596399174d585e96219d8e041013faa7e4138c21fb84127fa485aa34ad529d1bc41028d9094d7bea227616d9fe4f',
+    },
+    {
+        'login': 'teste', 'tipo_usuario': 'uvis',
+        'nome_uvis': 'UVIS Teste QA', 'regiao': 'SUL', 'codigo_setor': '10',
+        'senha_hash': 'scrypt:32768:8:1$HuIgzZalnDVcpsRq$61eea0a6550cbe1f3a2f11fe9f8aa5ec09dfdbb8cfbb014760d7b0337778ab53e9ff1bfd58f8916166b2bd9c096e5a7d238dff27c2f843d8ba5e8abb77a3c482',
+    },
+)
+
+# Perfis de gestão que a inicialização devolve ao valor padrão se alguém alterar
+PERFIS_FIXOS = ('admin', 'operario', 'visualizar')
+
+# Primeira migração: schema dos bancos criados antes do alembic_version
+REVISAO_LEGADO = 'cd09f940837b'
+
+
+# -------------------------------------------------------------
+# Versão do schema
+# -------------------------------------------------------------
+def _diretorio_migracoes():
+    diretorio = current_app.extensions['migrate'].directory
+    if not os.path.isabs(diretorio):
+        diretorio = os.path.join(os.path.dirname(current_app.root_path), diretorio)
+    return diretorio
+
+
+def _scripts():
+    return ScriptDirectory(_diretorio_migracoes())
+
+
+def estado_schema():
+    """
+    'atual' (banco na head), 'vazio' (sem tabelas) ou 'desatualizado'.
+    Retorna (estado, revisão do banco, head das migrações).
+    """
+    head = _scripts().get_current_head()
+    with db.engine.connect() as conexao:
+        revisao = MigrationContext.configure(conexao).get_current_revision()
+        if revisao == head:
+            return 'atual', revisao, head
+        if revisao is None and not inspect(conexao).has_table(Usuario.__tablename__):
+            return 'vazio', revisao, head
+    return 'desatualizado', revisao, head
+
+
+def _criar_schema():
+    """Banco novo: tabelas dos modelos marcadas com a head (numa transação só) + índice de busca."""
+    with db.engine.connect() as conexao:
+        if conexao.dialect.name == 'sqlite':
+            # Pega a trava de escrita antes de conferir: quem chegar depois
+            # espera (busy_timeout) e encontra o banco já criado e marcado
+            conexao.exec_driver_sql('BEGIN IMMEDIATE')
+        contexto = MigrationContext.configure(conexao)
+        if contexto.get_current_revision() is None and not inspect(conexao).has_table(Usuario.__tablename__):
+            db.metadata.create_all(conexao)
+            contexto.stamp(_scripts(), 'head')
+        conexao.commit()
+    garantir_indice_busca()
+
+
+def _eh_legado(conexao):
+    """Tabelas da REVISAO_LEGADO sem revisão gravada: endereço já separado, nada das migrações seguintes."""
+    inspetor = inspect(conexao)
+    if not inspetor.has_table(Solicitacao.__tablename__) or inspetor.has_table(SolicitacaoMensal.__tablename__):
+        return False
+    colunas = {coluna['name'] for coluna in inspetor.get_columns(Solicitacao.__tablename__)}
+    return 'cep' in colunas and 'geohash' not in colunas
+
+
+def _atualizar_legado():
+    """
+    Banco anterior às migrações: grava a REVISAO_LEGADO e aplica as
+    migrações até a head, na mesma transação (com a trava de escrita, como
+    em _criar_schema: outro processo subindo junto espera e encontra o
+    banco já na head). Retorna False, sem tocar no banco, se ele não tiver
+    o schema esperado ou já tiver sido marcado.
+    """
+    with db.engine.connect() as conexao:
+        if conexao.dialect.name == 'sqlite':
+            conexao.exec_driver_sql('BEGIN IMMEDIATE')
+        contexto = MigrationContext.configure(conexao)
+        if contexto.get_current_revision() is not None or not _eh_legado(conexao):
+            conexao.rollback()
+            return False
+
+        contexto.stamp(_scripts(), REVISAO_LEGADO)
+        config = current_app.extensions['migrate'].migrate.get_config(_diretorio_migracoes())
+        config.attributes['connection'] = conexao  # migrations/env.py usa esta conexão
+        command.upgrade(config, 'head')
+        conexao.commit()
+    garantir_indice_busca()
+    return True
+
+
+# -------------------------------------------------------------
+# Dados iniciais
+# -------------------------------------------------------------
+def garantir_usuarios_padrao():
+    """Insere os usuários padrão que faltam (um SELECT + no máximo um INSERT). Retorna os logins criados."""
+    existentes = dict(
+        db.session.query(Usuario.login, Usuario.tipo_usuario)
+        .filter(Usuario.login.in_([usuario['login'] for usuario in USUARIOS_PADRAO]))
+    )
+
+    faltando = [usuario for usuario in USUARIOS_PADRAO if usuario['login'] not in existentes]
+    corrigir = [
+        usuario for usuario in USUARIOS_PADRAO
+        if usuario['login'] in existentes and usuario['tipo_usuario'] in PERFIS_FIXOS
+        and existentes[usuario['login']] != usuario['tipo_usuario']
+    ]
+    if not faltando and not corrigir:
+        return []
+
+    try:
+        if faltando:
+            db.session.execute(insert(Usuario), faltando)
+        for usuario in corrigir:
+            db.session.execute(
+                update(Usuario).where(Usuario.login == usuario['login'])
+                .values(tipo_usuario=usuario['tipo_usuario'])
+            )
+        db.session.commit()
+    except IntegrityError:
+        # Outro processo inseriu os mesmos usuários primeiro
+        db.session.rollback()
+        return []
+
+    limpar_cache_usuarios()
+    return [usuario['login'] for usuario in faltando]
+
+
+def garantir_consolidado_mensal():
+    """Reconstrói solicitacoes_mensal se estiver vazio e houver pedidos. Retorna True se reconstruiu."""
+    vazio = not db.session.query(SolicitacaoMensal.query.exists()).scalar()
+    if vazio and db.session.query(Solicitacao.query.exists()).scalar():
+        reconstruir_mensal()
+        return True
+    return False
+
+
+# -------------------------------------------------------------
+# Ponto de entrada
+# -------------------------------------------------------------
+def inicializar_banco(app, avisar=print):
+    """
+    Prepara o banco para servir: schema, usuários padrão e consolidado.
+    Retorna True se o banco ficou pronto; False (com aviso) se o schema
+    estiver desatualizado ou a inicialização falhar; quem sobe o servidor
+    (run.py / wsgi.py) não deve atender nesse caso.
+    """
+    inicio = time.perf_counter()
+    with app.app_context():
+        try:
+            estado, revisao, head = estado_schema()
+            if estado == 'vazio':
+                try:
+                    _criar_schema()
+                except OperationalError:
+                    # Outro processo criou as tabelas ao mesmo tempo
+                    db.session.rollback()
+                estado, revisao, head = estado_schema()
+            elif estado == 'desatualizado' and revisao is None:
+                if _atualizar_legado():
+                    avisar(f"--- Banco sem revisão marcado como {REVISAO_LEGADO} e migrado até a {head} ---")
+                estado, revisao, head = estado_schema()
+
+            if estado != 'atual' and revisao is None:
+                avisar(f"!!! Banco sem revisão das migrações (código na {head}): marque a revisão "
+                       f"do schema atual com `flask db stamp <revisão>` e rode `flask db upgrade`.")
+                return False
+            if estado != 'atual':
+                avisar(f"!!! Banco na revisão {revisao}, código na {head}: rode `flask db upgrade`.")
+                return False
+
+            criados = garantir_usuarios_padrao()
+            if criados:
+                avisar(f"--- Usuários padrão criados: {', '.join(criados)} ---")
+
+            if garantir_consolidado_mensal():
+                avisar("--- Consolidado mensal (solicitacoes_mensal) reconstruído ---")
+        except Exception as e:
+            db.session.rollback()
+            avisar(f"!!! ERRO FATAL NA INICIALIZAÇÃO DO BANCO: {e}")
+            return False
+
+    avisar(f">>> Banco de dados pronto ({(time.perf_counter() - inicio) * 1000:.0f} ms).")
+    return True
+
+
+@click.command('inicializar-banco')
+@with_appcontext
+def inicializar_banco_command():
+    """Confere o schema e garante os usuários padrão e o consolidado mensal."""
+    if not inicializar_banco(current_app._get_current_object(), avisar=click.echo):
+        sys.exit(1)
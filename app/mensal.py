@@ -0,0 +1,118 @@
+from collections import Counter
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete
+
+from app import db
+from app.models import Solicitacao, SolicitacaoMensal
+from app.banco import insert_upsert
+
+
+# -------------------------------------------------------------
+# CONSOLIDADO MENSAL (tabela solicitacoes_mensal)
+# -------------------------------------------------------------
+# Cada linha guarda quantas solicitações existem para um mês + UVIS +
+# status + foco + tipo de visita + altura. As rotas de escrita ajustam
+# os contadores e o comando `flask reconstruir-mensal` recria tudo.
+
+CAMPOS_CHAVE = ('mes', 'usuario_id', 'status', 'foco', 'tipo_visita', 'altura_voo')
+
+
+def chave_mensal(pedido):
+    """Retorna a chave do consolidado para uma Solicitacao."""
+    criacao = pedido.data_criacao or datetime.utcnow()
+    return (
+        criacao.strftime('%Y-%m'),
+        pedido.usuario_id,
+        pedido.status or '',
+        pedido.foco or '',
+        pedido.tipo_visita or '',
+        pedido.altura_voo or '',
+    )
+
+
+def ajustar_mensal(chave, delta):
+    """Soma `delta` ao contador da chave (cria ou remove a linha se preciso)."""
+    aplicar_deltas_mensal({chave: delta})
+
+
+def mover_mensal(chave_antiga, chave_nova):
+    """Transfere uma solicitação de uma chave para outra (após edição)."""
+    if chave_antiga != chave_nova:
+        aplicar_deltas_mensal({chave_antiga: -1, chave_nova: 1})
+
+
+def aplicar_deltas_mensal(deltas):
+    """
+    Aplica vários ajustes de uma vez ({chave: delta}, ex.: um Counter de um lote).
+
+    Um único UPSERT (total = total + delta no próprio banco), então
+    gravações concorrentes na mesma chave não se perdem nem colidem na
+    chave única; depois remove as linhas que zeraram.
+    """
+    parametros = [dict(zip(CAMPOS_CHAVE, chave), total=delta) for chave, delta in deltas.items() if delta]
+    if not parametros:
+        return
+
+    comando = insert_upsert(SolicitacaoMensal)
+    comando = comando.on_conflict_do_update(
+        index_elements=list(CAMPOS_CHAVE),
+        set_={'total': SolicitacaoMensal.total + comando.excluded.total}
+    )
+    db.session.execute(comando, parametros)
+
+    if any(parametro['total'] < 0 for parametro in parametros):
+        db.session.execute(
+            delete(SolicitacaoMensal).where(SolicitacaoMensal.total <= 0),
+            execution_options={'synchronize_session': False}
+        )
+
+
+def reconstruir_mensal():
+    """Recria a tabela inteira a partir de solicitacoes. Retorna o nº de linhas."""
+    contagem = Counter()
+    linhas = db.session.query(
+        Solicitacao.data_criacao,
+        Solicitacao.usuario_id,
+        Solicitacao.status,
+        Solicitacao.foco,
+        Solicitacao.tipo_visita,
+        Solicitacao.altura_voo
+    ).yield_per(1000)
+
+    for pedido in linhas:
+        contagem[chave_mensal(pedido)] += 1
+
+    SolicitacaoMensal.query.delete()
+    if contagem:
+        db.session.execute(
+            db.insert(SolicitacaoMensal),
+            [dict(zip(CAMPOS_CHAVE, chave), total=total) for chave, total in contagem.items()]
+        )
+    db.session.commit()
+    return len(contagem)
+
+
+def historico_mensal(uvis_id=None):
+    """Lista [(AAAA-MM, total)] em ordem cronológica, lida do consolidado."""
+    query = db.session.query(
+        SolicitacaoMensal.mes,
+        db.func.sum(SolicitacaoMensal.total)
+    )
+    if uvis_id:
+        query = query.filter(SolicitacaoMensal.usuario_id == uvis_id)
+
+    return [
+        (mes, int(total))
+        for mes, total in query.group_by(SolicitacaoMensal.mes).order_by(SolicitacaoMensal.mes)
+    ]
+
+
+@click.command('reconstruir-mensal')
+@with_appcontext
+def reconstruir_mensal_command():
+    """Recalcula a tabela solicitacoes_mensal a partir de todas as solicitações."""
+    total = reconstruir_mensal()
+    click.echo(f">>> Consolidado mensal reconstruído ({total} linhas).")
@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from app import geo
 
 # -------------------------------------------------------------
 # USUÁRIO
@@ -36,6 +37,23 @@ class Usuario(db.Model):
 # -------------------------------------------------------------
 class Solicitacao(db.Model):
     __tablename__ = 'solicitacoes'
+    __table_args__ = (
+        # Relatórios mensais: intervalo em data_criacao + filtro de UVIS/status
+        db.Index('ix_solicitacoes_data_usuario_status', 'data_criacao', 'usuario_id', 'status'),
+        # Painel UVIS: usuario_id (+ status) ordenado por data_criacao
+        db.Index('ix_solicitacoes_usuario_criacao', 'usuario_id', 'data_criacao'),
+        db.Index('ix_solicitacoes_usuario_status_criacao', 'usuario_id', 'status', 'data_criacao'),
+        # Painel de gestão: ordenado por (data_criacao, id), com ou sem status
+        # (sem status, ix_solicitacoes_data_usuario_status já serve)
+        db.Index('ix_solicitacoes_status_criacao', 'status', 'data_criacao'),
+        # Agenda: janela de data_agendamento (todas ou de uma UVIS)
+        db.Index('ix_solicitacoes_agendamento', 'data_agendamento', 'hora_agendamento'),
+        db.Index('ix_solicitacoes_usuario_agendamento', 'usuario_id', 'data_agendamento', 'hora_agendamento'),
+        # Conflitos: dia do voo (balde de tempo) + geohash (balde espacial)
+        db.Index('ix_solicitacoes_agendamento_geohash', 'data_agendamento', 'geohash'),
+        # Mapa com ?status: faixas de geohash dentro de um status
+        db.Index('ix_solicitacoes_status_geohash', 'status', 'geohash'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -70,8 +88,9 @@ class Solicitacao(db.Model):
     complemento = db.Column(db.String(100))
 
     # Gealocalização
-    latitude = db.Column(db.String(50))
-    longitude = db.Column(db.String(50))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12), index=True)  # preenchido por set_coordenadas
 
     # ----------------------
     # Controle Admin
@@ -85,4 +104,99 @@ class Solicitacao(db.Model):
         db.Integer,
         db.ForeignKey("usuarios.id"),
         nullable=False
-    )
\ No newline at end of file
+    )
+
+    def set_coordenadas(self, latitude, longitude):
+        """
+        Grava latitude/longitude (texto do formulário ou número) e o geohash.
+        Retorna False se algo foi informado mas não é uma coordenada válida.
+        """
+        self.latitude = geo.ler_latitude(latitude)
+        self.longitude = geo.ler_longitude(longitude)
+
+        if self.latitude is None or self.longitude is None:
+            self.latitude = self.longitude = self.geohash = None
+            return not (latitude or longitude)
+
+        self.geohash = geo.geohash(self.latitude, self.longitude)
+        return True
+
+# -------------------------------------------------------------
+# CONSOLIDADO MENSAL (rollup para gráficos históricos)
+# -------------------------------------------------------------
+class SolicitacaoMensal(db.Model):
+    __tablename__ = 'solicitacoes_mensal'
+    __table_args__ = (
+        db.UniqueConstraint(
+            'mes', 'usuario_id', 'status', 'foco', 'tipo_visita', 'altura_voo',
+            name='uq_solicitacoes_mensal_chave'
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Chave: mês de criação (AAAA-MM) + dimensões dos relatórios.
+    # Valores ausentes são gravados como '' para a chave única funcionar.
+    mes = db.Column(db.String(7), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuarios.id"), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='')
+    foco = db.Column(db.String(50), nullable=False, default='')
+    tipo_visita = db.Column(db.String(50), nullable=False, default='')
+    altura_voo = db.Column(db.String(20), nullable=False, default='')
+
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+
+# -------------------------------------------------------------
+# TAREFAS DE EXPORTAÇÃO (PDF/XLSX gerados em segundo plano)
+# -------------------------------------------------------------
+class TarefaExportacao(db.Model):
+    __tablename__ = 'tarefas_exportacao'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 (hex)
+
+    tipo = db.Column(db.String(30), nullable=False)       # relatorio_pdf, relatorio_excel...
+    parametros = db.Column(db.Text, nullable=False, default='{}')  # JSON com os filtros
+
+    # PENDENTE -> PROCESSANDO -> CONCLUIDO / ERRO
+    status = db.Column(db.String(20), nullable=False, default='PENDENTE')
+    caminho_arquivo = db.Column(db.String(255))
+    nome_arquivo = db.Column(db.String(150))
+    erro = db.Column(db.Text)
+
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    data_inicio = db.Column(db.DateTime)      # quando saiu da fila (PROCESSANDO)
+    data_conclusao = db.Column(db.DateTime)
+
+    usuario_id = db.Column(
+        db.Integer,
+        db.ForeignKey("usuarios.id"),
+        nullable=False
+    )
+
+
+# -------------------------------------------------------------
+# REVISÃO POR MÊS (versão dos dados para o cache de relatórios)
+# -------------------------------------------------------------
+class RevisaoMensal(db.Model):
+    __tablename__ = 'revisoes_mensais'
+
+    mes = db.Column(db.String(7), primary_key=True)  # AAAA-MM (data_criacao)
+    revisao = db.Column(db.Integer, nullable=False, default=0)
+
+
+# -------------------------------------------------------------
+# CACHE DE GEOCODIFICAÇÃO (endereço normalizado -> coordenadas)
+# -------------------------------------------------------------
+class Geocodificacao(db.Model):
+    __tablename__ = 'geocodificacoes'
+
+    # 'cep|logradouro|numero' normalizados (ver app/geocodificacao.py)
+    chave = db.Column(db.String(255), primary_key=True)
+
+    # Nulos = endereço procurado e não encontrado (fica em cache até o gazetteer mudar)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    precisao = db.Column(db.String(20))  # numero, logradouro, cep
+
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,150 @@
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from math import ceil
+
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import tuple_
+
+from app.models import Solicitacao
+
+
+# -------------------------------------------------------------
+# PAGINAÇÃO POR CURSOR (keyset / seek) em (data_criacao, id)
+# -------------------------------------------------------------
+# Em vez de OFFSET, cada página começa logo depois (ou antes) da última
+# linha vista, então a página 50 custa o mesmo que a página 1. O cursor
+# é um token assinado e opaco; o total exibido no paginador vem de um
+# COUNT guardado em cache por alguns segundos (LRU limitado a MAX_TOTAIS
+# combinações de filtro, já que a chave vem do que o usuário digita).
+
+TTL_TOTAL = 60  # segundos
+MAX_TOTAIS = 512
+
+_totais = OrderedDict()
+_totais_lock = threading.Lock()
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt='sgsv-cursor')
+
+
+def _gerar_cursor(pedido):
+    return _serializer().dumps([pedido.data_criacao.isoformat(), pedido.id])
+
+
+def _ler_cursor(token):
+    """Retorna (data_criacao, id) ou None se o token for inválido."""
+    if not token:
+        return None
+    try:
+        data_iso, pedido_id = _serializer().loads(token)
+        return datetime.fromisoformat(data_iso), int(pedido_id)
+    except (BadSignature, ValueError, TypeError):
+        return None
+
+
+def total_aproximado(chave, query):
+    """COUNT(*) da consulta, reaproveitado por TTL_TOTAL segundos por chave de filtro."""
+    agora = time.monotonic()
+    with _totais_lock:
+        em_cache = _totais.get(chave)
+        if em_cache and agora - em_cache[1] < TTL_TOTAL:
+            _totais.move_to_end(chave)
+            return em_cache[0]
+
+    total = query.order_by(None).count()
+    with _totais_lock:
+        _totais[chave] = (total, agora)
+        _totais.move_to_end(chave)
+
+        # Descarta os vencidos e, se ainda passar do limite, os menos usados
+        for antiga in [c for c, (_, momento) in _totais.items() if agora - momento >= TTL_TOTAL]:
+            del _totais[antiga]
+        while len(_totais) > MAX_TOTAIS:
+            _totais.popitem(last=False)
+    return total
+
+
+class PaginaKeyset:
+    """Página de resultados com os cursores para a anterior e a próxima."""
+
+    def __init__(self, items, pagina, por_pagina, total, cursor_anterior, cursor_proximo):
+        self.items = items
+        self.pagina = pagina
+        self.por_pagina = por_pagina
+        self.total = total
+        self.cursor_anterior = cursor_anterior
+        self.cursor_proximo = cursor_proximo
+
+    @property
+    def has_prev(self):
+        return self.cursor_anterior is not None
+
+    @property
+    def has_next(self):
+        return self.cursor_proximo is not None
+
+    @property
+    def paginas(self):
+        return max(1, ceil(self.total / self.por_pagina))
+
+
+def consulta_pagina(query, por_pagina, apos=None, antes=None):
+    """
+    Linhas de uma página (e uma a mais, para saber se há outra) depois do
+    cursor `apos` ou, voltando, antes do cursor `antes`.
+    """
+    chave = tuple_(Solicitacao.data_criacao, Solicitacao.id)
+    if antes:
+        # Voltando: pega as linhas logo acima do cursor, em ordem crescente
+        return query.filter(chave > tuple_(*antes)) \
+            .order_by(Solicitacao.data_criacao.asc(), Solicitacao.id.asc()) \
+            .limit(por_pagina + 1)
+    if apos:
+        query = query.filter(chave < tuple_(*apos))
+    return query.order_by(Solicitacao.data_criacao.desc(), Solicitacao.id.desc()) \
+        .limit(por_pagina + 1)
+
+
+def paginar_keyset(query, por_pagina, args, chave_total):
+    """
+    Pagina `query` (de Solicitacao) em ordem decrescente de (data_criacao, id).
+
+    Lê de `args` os parâmetros 'apos' (cursor da próxima página), 'antes'
+    (cursor da página anterior) e 'pagina' (número só para exibição).
+    """
+    pagina = max(args.get('pagina', 1, type=int), 1)
+
+    total = total_aproximado(chave_total, query)
+
+    apos = _ler_cursor(args.get('apos'))
+    antes = _ler_cursor(args.get('antes'))
+
+    if antes:
+        # Voltando: as linhas vêm em ordem crescente, então inverte
+        linhas = consulta_pagina(query, por_pagina, antes=antes).all()
+        tem_anterior = len(linhas) > por_pagina
+        items = list(reversed(linhas[:por_pagina]))
+        tem_proxima = True
+    else:
+        if not apos:
+            pagina = 1
+        linhas = consulta_pagina(query, por_pagina, apos=apos).all()
+        tem_proxima = len(linhas) > por_pagina
+        items = linhas[:por_pagina]
+        tem_anterior = apos is not None
+
+    if not tem_anterior:
+        pagina = 1
+
+    return PaginaKeyset(
+        items=items,
+        pagina=pagina,
+        por_pagina=por_pagina,
+        total=total,
+        cursor_anterior=_gerar_cursor(items[0]) if items and tem_anterior else None,
+        cursor_proximo=_gerar_cursor(items[-1]) if items and tem_proxima else None
+    )
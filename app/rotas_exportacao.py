@@ -0,0 +1,242 @@
+import tempfile
+
+from flask import (
+    Blueprint, Response, current_app, flash, jsonify, redirect, request,
+    send_file, stream_with_context, url_for
+)
+
+from app import db
+from app.models import TarefaExportacao
+from app.exportacao import (
+    gerar_planilha_solicitacoes, gerar_planilha_relatorio, gerar_pdf_relatorio,
+    nome_relatorio, transmitir_arquivo, gerar_csv_sarpas,
+    MIMETYPE_XLSX, NOME_PLANILHA_SOLICITACOES, NOME_CSV_SARPAS
+)
+from app.tarefas import TIPOS_EXPORTACAO, STATUS_EM_ANDAMENTO, ler_parametros, enfileirar, expirar_travadas
+from app.agregacoes import ler_mes_ano
+from app.cache_relatorios import relatorio_em_cache
+from app.usuarios import usuario_atual
+from app.banco import somente_leitura
+
+
+# -------------------------------------------------------------
+# ROTAS DE EXPORTAÇÃO (planilhas, PDF, SARPAS e fila)
+# -------------------------------------------------------------
+# Blueprint separado de app/routes.py. openpyxl e reportlab só são
+# importados (em app/exportacao.py) quando um arquivo é gerado de fato,
+# então registrar estas rotas não pesa na subida do worker.
+
+bp = Blueprint('exportacao', __name__)
+
+
+# ----------------------------------------------
+# Painel de gestão: planilha e CSV SARPAS
+# ----------------------------------------------
+@bp.route('/admin/exportar_excel')
+@somente_leitura
+def exportar_excel():
+    # Permite APENAS admin e operario
+    if not usuario_atual().pode_editar:
+        flash('Permissão negada para exportar.', 'danger')
+        return redirect(url_for('main.admin_dashboard'))
+
+    # --- Captura filtros ---
+    filtro_status = request.args.get("status")
+    filtro_unidade = request.args.get("unidade")
+    filtro_regiao = request.args.get("regiao")
+    filtro_busca = request.args.get("q")
+
+    # --- CRIA EXCEL (write-only, direto em arquivo temporário) ---
+    arquivo = tempfile.TemporaryFile(suffix=".xlsx")
+    gerar_planilha_solicitacoes(arquivo, filtro_status, filtro_unidade, filtro_regiao, filtro_busca)
+    arquivo.seek(0)
+
+    # Envia em blocos (chunked), sem carregar o arquivo inteiro na memória
+    return Response(
+        stream_with_context(transmitir_arquivo(arquivo)),
+        mimetype=MIMETYPE_XLSX,
+        headers={"Content-Disposition": f'attachment; filename="{NOME_PLANILHA_SOLICITACOES}"'}
+    )
+
+
+@bp.route('/admin/exportar_sarpas')
+@somente_leitura
+def exportar_sarpas():
+    # Mesmas permissões e filtros do exportar_excel
+    if not usuario_atual().pode_editar:
+        flash('Permissão negada para exportar.', 'danger')
+        return redirect(url_for('main.admin_dashboard'))
+
+    filtro_status = request.args.get("status")
+    filtro_unidade = request.args.get("unidade")
+    filtro_regiao = request.args.get("regiao")
+    filtro_busca = request.args.get("q")
+
+    # Comprime na hora (gzip) quando o navegador aceita; o arquivo salvo continua .csv
+    comprimir = 'gzip' in request.accept_encodings
+    headers = {
+        "Content-Disposition": f'attachment; filename="{NOME_CSV_SARPAS}"',
+        "Vary": "Accept-Encoding"
+    }
+    if comprimir:
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(
+        stream_with_context(gerar_csv_sarpas(
+            filtro_status, filtro_unidade, filtro_regiao, filtro_busca, comprimir=comprimir
+        )),
+        mimetype='text/csv',
+        headers=headers
+    )
+
+
+# =======================================================================
+# Relatório mensal em PDF (Com Filtro UVIS)
+# =======================================================================
+RELATORIO_MEMORIA_MAX_BYTES = 8 * 1024 * 1024  # acima disso o relatório vai para disco
+
+
+def _arquivo_relatorio(sufixo):
+    """
+    Destino do relatório gerado sem cache: fica em memória e, acima do
+    limite, passa para um arquivo temporário, apagado quando o send_file
+    fecha o arquivo.
+    """
+    return tempfile.SpooledTemporaryFile(
+        max_size=current_app.config.get('RELATORIO_MEMORIA_MAX_BYTES', RELATORIO_MEMORIA_MAX_BYTES),
+        suffix=sufixo
+    )
+
+
+@bp.route('/admin/exportar_relatorio_pdf')
+@somente_leitura
+def exportar_relatorio_pdf():
+    # -------------------------
+    # 1. Parâmetros e filtros
+    # -------------------------
+    ano, mes = ler_mes_ano(request.args)
+    uvis_id = request.args.get('uvis_id', type=int)
+    orient = request.args.get('orient', default='portrait')  # 'portrait' ou 'landscape'
+
+    # 2. Geração do PDF (ver app/exportacao.py), reaproveitando o cache
+    parametros = {'ano': ano, 'mes': mes, 'uvis_id': uvis_id, 'orient': orient}
+    arquivo_pdf = relatorio_em_cache('relatorio_pdf', parametros, gerar_pdf_relatorio, 'pdf')
+
+    if arquivo_pdf is None:
+        arquivo_pdf = _arquivo_relatorio(".pdf")
+        gerar_pdf_relatorio(arquivo_pdf, **parametros)
+        arquivo_pdf.seek(0)
+
+    # envia o pdf (send_file fecha o arquivo do cache ao terminar)
+    return send_file(
+        arquivo_pdf,
+        as_attachment=True,
+        download_name=f"{nome_relatorio(ano, mes, uvis_id)}.pdf",
+        mimetype="application/pdf"
+    )
+
+
+# =======================================================================
+# Relatório mensal em Excel (Com Filtro UVIS)
+# =======================================================================
+@bp.route('/admin/exportar_relatorio_excel')
+@somente_leitura
+def exportar_relatorio_excel():
+    # 1. Parâmetros de Filtro
+    if not usuario_atual().is_authenticated:
+        return redirect(url_for('main.login'))
+
+    ano, mes = ler_mes_ano(request.args)
+    uvis_id = request.args.get('uvis_id', type=int) # NOVO FILTRO
+
+    # 2. Geração da planilha (ver app/exportacao.py), reaproveitando o cache
+    parametros = {'ano': ano, 'mes': mes, 'uvis_id': uvis_id}
+    output = relatorio_em_cache('relatorio_excel', parametros, gerar_planilha_relatorio, 'xlsx')
+
+    if output is None:
+        output = _arquivo_relatorio(".xlsx")
+        gerar_planilha_relatorio(output, **parametros)
+        output.seek(0)
+
+    nome_arquivo = nome_relatorio(ano, mes, uvis_id)
+
+    return send_file(
+        output,
+        download_name=f"{nome_arquivo}.xlsx",
+        as_attachment=True,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+
+# ----------------------------------------------
+# FILA DE EXPORTAÇÕES (PDF / XLSX em segundo plano)
+# ----------------------------------------------
+def _tarefa_json(tarefa):
+    dados = {
+        "id": tarefa.id,
+        "tipo": tarefa.tipo,
+        "status": tarefa.status,
+        "erro": tarefa.erro,
+        "url_status": url_for("exportacao.status_exportacao", tarefa_id=tarefa.id),
+        "url_download": None
+    }
+    if tarefa.status == 'CONCLUIDO':
+        dados["url_download"] = url_for("exportacao.baixar_exportacao", tarefa_id=tarefa.id)
+    return dados
+
+
+def _tarefa_do_usuario(tarefa_id):
+    """Busca a tarefa garantindo que pertence ao usuário logado."""
+    tarefa = db.session.get(TarefaExportacao, tarefa_id)
+    if tarefa is None or tarefa.usuario_id != usuario_atual().id:
+        return None
+    return tarefa
+
+
+@bp.route('/exportacoes/<tipo>', methods=['POST'])
+def enfileirar_exportacao(tipo):
+    if not usuario_atual().is_authenticated:
+        return jsonify({"erro": "Sessão expirada."}), 401
+
+    config = TIPOS_EXPORTACAO.get(tipo)
+    if config is None:
+        return jsonify({"erro": "Tipo de exportação desconhecido."}), 404
+
+    # Mesmas permissões das rotas de exportação síncronas
+    if config['perfis'] and usuario_atual().tipo_usuario not in config['perfis']:
+        return jsonify({"erro": "Permissão negada para exportar."}), 403
+
+    parametros = ler_parametros(tipo, request.args)
+    tarefa = enfileirar(tipo, parametros, usuario_atual().id)
+
+    return jsonify(_tarefa_json(tarefa)), 202
+
+
+@bp.route('/exportacoes/tarefa/<tarefa_id>')
+def status_exportacao(tarefa_id):
+    tarefa = _tarefa_do_usuario(tarefa_id)
+    if tarefa is None:
+        return jsonify({"erro": "Exportação não encontrada."}), 404
+
+    # Tarefa parada há tempo demais (worker reciclado/morto): vira ERRO
+    # em vez de deixar o navegador consultando para sempre
+    if tarefa.status in STATUS_EM_ANDAMENTO and expirar_travadas(tarefa.id):
+        db.session.commit()
+        db.session.refresh(tarefa)
+
+    return jsonify(_tarefa_json(tarefa))
+
+
+@bp.route('/exportacoes/tarefa/<tarefa_id>/download')
+def baixar_exportacao(tarefa_id):
+    tarefa = _tarefa_do_usuario(tarefa_id)
+    if tarefa is None or tarefa.status != 'CONCLUIDO':
+        flash('Arquivo de exportação indisponível.', 'warning')
+        return redirect(url_for('main.dashboard'))
+
+    return send_file(
+        tarefa.caminho_arquivo,
+        as_attachment=True,
+        download_name=tarefa.nome_arquivo,
+        mimetype=TIPOS_EXPORTACAO[tarefa.tipo]['mimetype']
+    )
@@ -1,20 +1,26 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, Response
 from app import db
 from app.models import Usuario, Solicitacao
+from app.mensal import chave_mensal, ajustar_mensal, mover_mensal, aplicar_deltas_mensal, historico_mensal
+from app.agregacoes import agregar_solicitacoes, ler_mes_ano
+from app.cache_relatorios import registrar_alteracao, registrar_alteracoes
+from app.paginacao import paginar_keyset
+from app.busca import aplicar_busca
+from app.geo import filtro_area, ler_bbox
+from app.conflitos import conflitos_de, conflitos_por_pedido, resumo_conflitos
+from app.importacao import ler_linhas, importar, planilha_modelo, LIMITE_LINHAS
+from app.cep import buscar_cep, base_disponivel
+from app.geocodificacao import preencher_coordenadas, iniciar_preenchimento, gazetteer_disponivel
+from app.usuarios import usuario_atual, lista_uvis
+from app.banco import somente_leitura
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime, date
-from flask import json
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
-from io import BytesIO
-from flask import send_file
-from datetime import datetime, date 
-import tempfile
-from sqlalchemy.orm import joinedload
-
+from flask import jsonify
+from collections import Counter
+from types import SimpleNamespace
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload, contains_eager
 
-print("--- ROTAS CARREGADAS COM SUCESSO ---")
 
 bp = Blueprint('main', __name__)
 @bp.app_template_filter('datetimeformat')
@@ -25,92 +31,89 @@ def datetimeformat(value, format='%d-%m-%y'):
     except:
         return value  # se falhar, retorna como está
 
-# --- Context Processor: Simula o 'current_user' para o HTML ---
+# --- Context Processor: 'current_user' do HTML (contexto montado uma vez por requisição) ---
 @bp.context_processor
 def inject_user():
-    class MockUser:
-        is_authenticated = 'user_id' in session
-        name = session.get('user_nome')
-        id = session.get('user_id')
-        tipo_usuario = session.get('user_tipo')
-    return dict(current_user=MockUser())
+    return dict(current_user=usuario_atual())
 
 # --- DASHBOARD UVIS ---
 
+def consulta_painel_uvis(usuario_id, status=None):
+    """Pedidos de uma UVIS, com o filtro opcional de status (também usada em app/indices.py)."""
+    query = Solicitacao.query.filter_by(usuario_id=usuario_id)
+    if status:
+        query = query.filter(Solicitacao.status == status)
+    return query
+
+
 @bp.route('/')
 def dashboard():
-    if 'user_id' not in session:
+    if not usuario_atual().is_authenticated:
         return redirect(url_for('main.login'))
 
     # AJUSTE CHAVE: Se for admin, operario OU visualizar, redireciona para o painel de gestão
-    if session.get('user_tipo') in ['admin', 'operario', 'visualizar']:
+    if usuario_atual().eh_gestao:
         return redirect(url_for('main.admin_dashboard'))
 
-    try:
-        user_id = int(session.get('user_id'))
-    except (ValueError, TypeError):
-        session.clear()
-        flash('Sessão Inválida. Por favor, faça login novamente.', 'warning')
-        return redirect(url_for('main.login'))
-
-    # 1. Query Base: Pega os pedidos SÓ deste usuário
-    query = Solicitacao.query.filter_by(usuario_id=user_id)
+    user_id = usuario_atual().id
 
-    # 2. Lógica do Filtro: Verifica se veio algo na URL (ex: ?status=PENDENTE)
+    # 1. Query Base: pedidos SÓ deste usuário, com o filtro da URL (ex: ?status=PENDENTE)
     filtro_status = request.args.get('status')
+    query = consulta_painel_uvis(user_id, filtro_status)
 
-    if filtro_status:
-        query = query.filter(Solicitacao.status == filtro_status)
-
-    # 3. Lógica da Paginação:
-    page = request.args.get("page", 1, type=int)
-
-    paginacao = query.order_by(
-        Solicitacao.data_criacao.desc()
-    ).paginate(page=page, per_page=6, error_out=False)
+    # 3. Lógica da Paginação (por cursor, sem OFFSET):
+    paginacao = paginar_keyset(
+        query, por_pagina=6, args=request.args,
+        chave_total=('uvis', user_id, filtro_status)
+    )
 
     return render_template(
         'dashboard.html',
-        nome=session.get('user_nome'),
+        nome=usuario_atual().name,
         solicitacoes=paginacao.items,
         paginacao=paginacao
     )
 
 # --- PAINEL DE GESTÃO (Visualização para todos) ---
+def consulta_painel_gestao(status=None, unidade=None, regiao=None, busca=None):
+    """Pedidos de todas as UVIS com os filtros do painel de gestão (também usada em app/indices.py)."""
+    # JOIN com Usuario para filtrar por nome/região; o mesmo JOIN preenche
+    # p.autor, sem um SELECT em usuarios por autor na página
+    query = Solicitacao.query.join(Usuario).options(contains_eager(Solicitacao.autor))
+
+    if status:
+        query = query.filter(Solicitacao.status == status)
+
+    # Unidade, região e busca livre (q) passam pelo índice FTS5
+    return aplicar_busca(query, busca, unidade, regiao)
+
+
 @bp.route('/admin')
 def admin_dashboard():
     # AJUSTE CHAVE: Permite 'admin', 'operario' E 'visualizar'
-    if 'user_id' not in session or session.get('user_tipo') not in ['admin', 'operario', 'visualizar']:
+    if not usuario_atual().eh_gestao:
         flash('Acesso restrito.', 'danger')
         return redirect(url_for('main.login'))
     
     # Flag para controlar a renderização dos botões de edição no template
-    is_editable = session.get('user_tipo') in ['admin', 'operario']
+    is_editable = usuario_atual().pode_editar
     
     # --- Captura filtros enviados pelo GET ---
     filtro_status = request.args.get("status")
     filtro_unidade = request.args.get("unidade")
     filtro_regiao = request.args.get("regiao")
+    filtro_busca = request.args.get("q")
 
-    # --- Query base: Necessário dar JOIN com Usuario para filtrar por nome/região ---
-    query = Solicitacao.query.join(Usuario)
-    
-    # 🔑 APLICAÇÃO DOS FILTROS 🔑
-    if filtro_status:
-        query = query.filter(Solicitacao.status == filtro_status)
-
-    if filtro_unidade:
-        query = query.filter(Usuario.nome_uvis.ilike(f"%{filtro_unidade}%"))
+    # --- Query base com os filtros ---
+    query = consulta_painel_gestao(filtro_status, filtro_unidade, filtro_regiao, filtro_busca)
 
-    if filtro_regiao:
-        query = query.filter(Usuario.regiao.ilike(f"%{filtro_regiao}%"))
-    # 🔑 FIM APLICAÇÃO DOS FILTROS 🔑
-
-    page = request.args.get("page", 1, type=int)
+    paginacao = paginar_keyset(
+        query, por_pagina=6, args=request.args,
+        chave_total=('admin', filtro_status, filtro_unidade, filtro_regiao, filtro_busca)
+    )
 
-    paginacao = query.order_by(
-        Solicitacao.data_criacao.desc()
-    ).paginate(page=page, per_page=6)
+    # Conflitos de agenda só dos pedidos desta página (uma consulta indexada cada)
+    conflitos = conflitos_por_pedido(paginacao.items)
 
     # Injeta a data/hora atual (para evitar o erro 'now is undefined' se fosse usado)
     data_atual = datetime.now() 
@@ -119,197 +122,202 @@ def admin_dashboard():
         'admin.html',
         pedidos=paginacao.items,
         paginacao=paginacao,
+        conflitos=conflitos,
         is_editable=is_editable,
         now=data_atual
     )
 
-@bp.route('/admin/exportar_excel')
-def exportar_excel():
-    # Permite APENAS admin e operario
-    if 'user_id' not in session or session.get('user_tipo') not in ['admin', 'operario']:
-        flash('Permissão negada para exportar.', 'danger')
-        return redirect(url_for('main.admin_dashboard'))
+def _avisar_conflitos(pedido):
+    """Flash de aviso se o pedido cair perto (espaço e horário) de outro voo."""
+    conflitos = conflitos_de(pedido)
+    if conflitos:
+        flash(f"Atenção: possível conflito de voo com {resumo_conflitos(conflitos)}.", 'warning')
 
-    # --- Captura filtros ---
-    filtro_status = request.args.get("status")
-    filtro_unidade = request.args.get("unidade")
-    filtro_regiao = request.args.get("regiao")
-
-    # Query base
-    query = Solicitacao.query.join(Usuario)
-
-    if filtro_status:
-        query = query.filter(Solicitacao.status == filtro_status)
-
-    if filtro_unidade:
-        query = query.filter(Usuario.nome_uvis.ilike(f"%{filtro_unidade}%"))
-
-    if filtro_regiao:
-        query = query.filter(Usuario.regiao.ilike(f"%{filtro_regiao}%"))
-
-    pedidos = query.order_by(Solicitacao.data_criacao.desc()).all()
-
-    # --- CRIA EXCEL ---
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Relatório de Solicitações"
-
-    # Cabeçalho atualizado com ENDEREÇO ÚNICO
-    headers = [
-        "ID", "Unidade", "Região",
-        "Data Agendada", "Hora",
-        "Endereço Completo",       # <-- CAMPO ÚNICO
-        "Latitude", "Longitude",
-        "Foco", "Tipo Visita", "Altura",
-        "Criadouro?", "Apoio CET?",
-        "Observação",
-        "Status", "Protocolo", "Justificativa"
-    ]
-
-    # Estilos
-    header_fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
 
-    # Cabeçalho
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-        cell.border = thin_border
-
-    # Conteúdo
-    row_num = 2
-    for p in pedidos:
-
-        # --- ENDEREÇO COMPLETO ---
-        endereco_completo = (
-            f"{p.logradouro or ''}, {getattr(p, 'numero', '')} - "
-            f"{p.bairro or ''} - "
-            f"{(p.cidade or '')}/{(p.uf or '')} - "
-            f"{p.cep or ''}"
-        )
-
-        if getattr(p, 'complemento', None):
-            endereco_completo += f" - {p.complemento}"
-
-        # Booleans
-        criadouro_txt = "SIM" if getattr(p, 'criadouro', None) else "NÃO"
-        cet_txt = "SIM" if getattr(p, 'apoio_cet', None) else "NÃO"
-
-        # Data formatada
-        if p.data_agendamento:
-            try:
-                if isinstance(p.data_agendamento, (date, datetime)):
-                    data_formatada = p.data_agendamento.strftime("%d-%m-%y")
-                else:
-                    data_formatada = datetime.strptime(str(p.data_agendamento), "%Y-%m-%d").strftime("%d-%m-%y")
-            except ValueError:
-                data_formatada = str(p.data_agendamento)
-        else:
-            data_formatada = ""
-
-        # Linha completa
-        row = [
-            p.id,
-            p.autor.nome_uvis,
-            p.autor.regiao,
-            data_formatada,
-            p.hora_agendamento,
-
-            endereco_completo,     # <-- CAMPO ÚNICO AQUI
-
-            getattr(p, 'latitude', ''),
-            getattr(p, 'longitude', ''),
-
-            p.foco,
-            getattr(p, 'tipo_visita', ''),
-            getattr(p, 'altura_voo', ''),
-            criadouro_txt,
-            cet_txt,
-            getattr(p, 'observacao', ''),
-            p.status,
-            p.protocolo,
-            p.justificativa
-        ]
-
-        # Escreve na planilha
-        for col_num, value in enumerate(row, 1):
-            cell = ws.cell(row=row_num, column=col_num, value=value)
-            cell.border = thin_border
-            cell.alignment = Alignment(vertical="center", wrap_text=True)
-
-        row_num += 1
-
-    # Congela o cabeçalho
-    ws.freeze_panes = "A2"
+# --- PREENCHIMENTO DE COORDENADAS DOS PEDIDOS ANTIGOS (Admin) ---
+@bp.route('/admin/geocodificar', methods=['POST'])
+def geocodificar_pendentes():
+    if not usuario_atual().eh_admin:
+        flash('Permissão negada para esta ação.', 'danger')
+        return redirect(url_for('main.admin_dashboard'))
 
-    # Ajuste automático de largura
-    for col in ws.columns:
-        max_length = 0
-        column_letter = col[0].column_letter
+    if not gazetteer_disponivel():
+        flash('Gazetteer local não encontrado (instance/gazetteer.csv).', 'warning')
+    elif iniciar_preenchimento():
+        flash('Preenchimento de coordenadas iniciado em segundo plano.', 'info')
+    else:
+        flash('Já existe um preenchimento de coordenadas em andamento.', 'info')
 
-        for cell in col:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-
-        ws.column_dimensions[column_letter].width = max_length + 2
-
-    # Salvar em memória
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    # Enviar arquivo
-    return send_file(
-        output,
-        download_name="relatorio_solicitacoes.xlsx",
-        as_attachment=True,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    return redirect(url_for('main.admin_dashboard'))
 
 
 # --- ROTA DE ATUALIZAÇÃO SIMPLES (Admin/Operário) ---
 @bp.route('/admin/atualizar/<int:id>', methods=['POST'])
 def atualizar(id):
     # AJUSTE CHAVE: Permite APENAS 'admin' E 'operario'
-    if session.get('user_tipo') not in ['admin', 'operario']:
+    if not usuario_atual().pode_editar:
         flash('Permissão negada para esta ação.', 'danger')
         return redirect(url_for('main.admin_dashboard'))
 
     pedido = Solicitacao.query.get_or_404(id)
+    chave_antiga = chave_mensal(pedido)
+    status_antigo = pedido.status
 
     # Campos de Geo/Status:
     pedido.protocolo = request.form.get('protocolo')
     pedido.status = request.form.get('status')
     pedido.justificativa = request.form.get('justificativa')
-    pedido.latitude = request.form.get('latitude')
-    pedido.longitude = request.form.get('longitude')
+    if not pedido.set_coordenadas(request.form.get('latitude'), request.form.get('longitude')):
+        flash('Coordenadas inválidas foram descartadas (use o formato -23.550520).', 'warning')
+    if preencher_coordenadas(pedido):
+        flash('Coordenadas preenchidas a partir do endereço.', 'info')
 
+    mover_mensal(chave_antiga, chave_mensal(pedido))
+    registrar_alteracao(pedido)
 
     db.session.commit()
     flash('Pedido atualizado com sucesso!', 'success')
 
+    # Ao aprovar, confere se há outro voo no mesmo lugar e horário
+    if pedido.status == 'APROVADO' and status_antigo != 'APROVADO':
+        _avisar_conflitos(pedido)
+
     return redirect(url_for('main.admin_dashboard'))
 
+# --- ATUALIZAÇÃO EM LOTE (Admin/Operário) ---
+STATUS_VALIDOS = ('PENDENTE', 'EM ANÁLISE', 'APROVADO', 'NEGADO')
+CAMPOS_LOTE = ('status', 'protocolo', 'justificativa')
+LIMITE_LOTE = 500
+
+
+def _erro_item_lote(item):
+    """Motivo pelo qual o item do lote não pode ser gravado (None se estiver válido)."""
+    if 'status' in item and item['status'] not in STATUS_VALIDOS:
+        return f"status inválido: {item['status']}"
+
+    # protocolo/justificativa: texto (ou null, que limpa o campo) dentro do tamanho da coluna
+    for campo in ('protocolo', 'justificativa'):
+        valor = item.get(campo)
+        if valor is None:
+            continue
+        if not isinstance(valor, str):
+            return f"{campo} deve ser texto"
+        maximo = Solicitacao.__table__.c[campo].type.length
+        if len(valor) > maximo:
+            return f"{campo}: máximo de {maximo} caracteres"
+    return None
+
+
+@bp.route('/admin/atualizar_lote', methods=['POST'])
+def atualizar_lote():
+    """
+    JSON: {"itens": [{"id": 1, "status": "APROVADO", "protocolo": "...", "justificativa": "..."}, ...]}
+
+    Campos omitidos mantêm o valor atual. Todos os pedidos válidos são
+    gravados numa única transação, com um UPDATE executemany; a resposta
+    traz o resultado de cada item.
+    """
+    if not usuario_atual().pode_editar:
+        return jsonify({"erro": "Permissão negada para esta ação."}), 403
+
+    itens = (request.get_json(silent=True) or {}).get('itens')
+    if not isinstance(itens, list) or not itens:
+        return jsonify({"erro": "Envie 'itens' com pelo menos um pedido."}), 400
+    if len(itens) > LIMITE_LOTE:
+        return jsonify({"erro": f"Máximo de {LIMITE_LOTE} pedidos por lote."}), 400
+
+    # 1. Validação de cada item (o último vence se o id se repetir, inclusive
+    #    quando é inválido: aí a alteração anterior do mesmo id é descartada)
+    resultados = {}
+    ordem = []
+    pedidos_lote = {}
+    for indice, item in enumerate(itens):
+        if not isinstance(item, dict):
+            ordem.append(('item', indice))
+            resultados[ordem[-1]] = {"item": indice, "ok": False, "erro": "item deve ser um objeto"}
+            continue
+        try:
+            pedido_id = int(item.get('id'))
+        except (TypeError, ValueError):
+            ordem.append(str(item.get('id')))
+            resultados[ordem[-1]] = {"id": item.get('id'), "ok": False, "erro": "id inválido"}
+            continue
+        ordem.append(pedido_id)
+
+        erro = _erro_item_lote(item)
+        if erro:
+            resultados[pedido_id] = {"id": pedido_id, "ok": False, "erro": erro}
+            pedidos_lote.pop(pedido_id, None)
+            continue
+
+        pedidos_lote[pedido_id] = item
+        resultados.pop(pedido_id, None)
+
+    # 2. Estado atual (uma consulta) para o consolidado, cache e conflitos
+    atuais = {
+        linha.id: linha for linha in db.session.query(
+            Solicitacao.id, Solicitacao.data_criacao, Solicitacao.usuario_id,
+            Solicitacao.status, Solicitacao.foco, Solicitacao.tipo_visita, Solicitacao.altura_voo,
+            Solicitacao.protocolo, Solicitacao.justificativa,
+            Solicitacao.data_agendamento, Solicitacao.hora_agendamento,
+            Solicitacao.latitude, Solicitacao.longitude
+        ).filter(Solicitacao.id.in_(list(pedidos_lote)))
+    }
+
+    parametros = []
+    deltas = Counter()
+    alterados = []
+    aprovados = []
+    for pedido_id, item in pedidos_lote.items():
+        atual = atuais.get(pedido_id)
+        if atual is None:
+            resultados[pedido_id] = {"id": pedido_id, "ok": False, "erro": "pedido não encontrado"}
+            continue
+
+        novo = {campo: item.get(campo, getattr(atual, campo)) for campo in CAMPOS_LOTE}
+        parametros.append(dict(novo, id=pedido_id))
+
+        depois = SimpleNamespace(**dict(atual._asdict(), **novo))
+        deltas[chave_mensal(atual)] -= 1
+        deltas[chave_mensal(depois)] += 1
+        alterados.append(atual)
+        if novo['status'] == 'APROVADO' and atual.status != 'APROVADO':
+            aprovados.append(depois)
+
+        resultados[pedido_id] = {"id": pedido_id, "ok": True, "status": novo['status']}
+
+    # 3. Um UPDATE (executemany por chave primária) + consolidado + cache, um commit
+    if parametros:
+        try:
+            db.session.execute(update(Solicitacao), parametros)
+            aplicar_deltas_mensal(deltas)
+            registrar_alteracoes(alterados)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"erro": f"Nenhum pedido foi alterado: {e}"}), 500
+
+    # 4. Aprovações novas: avisa conflitos de agenda (como em atualizar)
+    for pedido in aprovados:
+        conflitos = conflitos_de(pedido)
+        if conflitos:
+            resultados[pedido.id]["conflitos"] = resumo_conflitos(conflitos)
+
+    return jsonify({
+        "atualizados": len(parametros),
+        "resultados": [resultados[chave] for chave in dict.fromkeys(ordem)]
+    })
+
 # --- ROTA DE EDIÇÃO COMPLETA (Admin) ---
 @bp.route('/admin/editar_completo/<int:id>', methods=['GET', 'POST'], endpoint='admin_editar') 
 def admin_editar_completo(id):
     # AJUSTE CHAVE: Permite APENAS 'admin'
-    if session.get('user_tipo') != 'admin':
+    if not usuario_atual().eh_admin:
         flash('Permissão negada. Apenas administradores podem acessar esta página.', 'danger')
         return redirect(url_for('main.admin_dashboard'))
 
     pedido = Solicitacao.query.get_or_404(id)
+    chave_antiga = chave_mensal(pedido)
 
     if request.method == 'POST':
         try:
@@ -340,16 +348,22 @@ def admin_editar_completo(id):
             pedido.complemento = request.form.get('complemento')
             
             # GPS
-            pedido.latitude = request.form.get('latitude')
-            pedido.longitude = request.form.get('longitude')
+            if not pedido.set_coordenadas(request.form.get('latitude'), request.form.get('longitude')):
+                flash('Coordenadas inválidas foram descartadas (use o formato -23.550520).', 'warning')
+            if preencher_coordenadas(pedido):
+                flash('Coordenadas preenchidas a partir do endereço.', 'info')
 
             # 4. Status e Decisão (Controle Interno)
             pedido.protocolo = request.form.get('protocolo')
             pedido.status = request.form.get('status')
             pedido.justificativa = request.form.get('justificativa')
 
+            mover_mensal(chave_antiga, chave_mensal(pedido))
+            registrar_alteracao(pedido)
+
             db.session.commit()
             flash('Solicitação atualizada (Edição Completa) com sucesso!', 'success')
+            _avisar_conflitos(pedido)
             return redirect(url_for('main.admin_dashboard'))
         
         except ValueError as ve:
@@ -365,14 +379,14 @@ def admin_editar_completo(id):
 # --- NOVO PEDIDO ---
 @bp.route('/novo_cadastro', methods=['GET', 'POST'], endpoint='novo')
 def novo():
-    if 'user_id' not in session:
+    if not usuario_atual().is_authenticated:
         return redirect(url_for('main.login'))
 
     hoje = date.today().isoformat()
 
     if request.method == 'POST':
         try:
-            user_id_int = int(session['user_id'])
+            user_id_int = usuario_atual().id
 
             data_str = request.form.get('data')
             hora_str = request.form.get('hora')
@@ -411,17 +425,21 @@ def novo():
                 apoio_cet=apoio_cet_bool,
                 observacao=request.form.get('observacao'),
 
-                latitude=request.form.get('latitude'),
-                longitude=request.form.get('longitude'),
-
                 usuario_id=user_id_int,
                 status='PENDENTE'
             )
+            if not nova_solicitacao.set_coordenadas(request.form.get('latitude'), request.form.get('longitude')):
+                flash('Coordenadas inválidas foram descartadas (use o formato -23.550520).', 'warning')
+            preencher_coordenadas(nova_solicitacao)  # vazias: pelo endereço (gazetteer local)
 
             db.session.add(nova_solicitacao)
+            db.session.flush()  # preenche data_criacao (default) para o consolidado
+            ajustar_mensal(chave_mensal(nova_solicitacao), 1)
+            registrar_alteracao(nova_solicitacao)
             db.session.commit()
 
             flash('Pedido enviado!', 'success')
+            _avisar_conflitos(nova_solicitacao)
             return redirect(url_for('main.dashboard'))
 
         except ValueError as ve:
@@ -433,12 +451,92 @@ def novo():
 
     return render_template('cadastro.html', hoje=hoje)
 
+# --- IMPORTAÇÃO DE PLANILHA (vários pedidos de uma vez) ---
+@bp.route('/importar', methods=['GET', 'POST'])
+def importar_planilha():
+    if not usuario_atual().is_authenticated:
+        return redirect(url_for('main.login'))
+
+    # UVIS importa para si mesma; o admin escolhe a unidade
+    tipo = usuario_atual().tipo_usuario
+    if tipo not in ['uvis', 'admin']:
+        flash('Permissão negada para importar pedidos.', 'danger')
+        return redirect(url_for('main.admin_dashboard'))
+
+    unidades = []
+    if tipo == 'admin':
+        unidades = lista_uvis()
+
+    relatorio = None
+    if request.method == 'POST':
+        arquivo = request.files.get('arquivo')
+        usuario_id = usuario_atual().id
+        if tipo == 'admin':
+            usuario_id = request.form.get('usuario_id', type=int)
+
+        if not arquivo or not arquivo.filename:
+            flash('Selecione um arquivo .csv ou .xlsx.', 'warning')
+        elif tipo == 'admin' and usuario_id not in {u.id for u in unidades}:
+            flash('Selecione a UVIS dona dos pedidos.', 'warning')
+        else:
+            somente_validar = request.form.get('somente_validar') == 'sim'
+            try:
+                linhas = ler_linhas(arquivo.stream, arquivo.filename)
+                relatorio = importar(linhas, usuario_id, somente_validar=somente_validar)
+            except ValueError as ve:
+                db.session.rollback()
+                flash(str(ve), 'warning')
+            except Exception as e:
+                # Blocos anteriores já foram gravados; o relatório parcial se perde
+                db.session.rollback()
+                flash(f"Erro ao importar: {e}", "danger")
+
+            if relatorio is not None:
+                relatorio['somente_validar'] = somente_validar
+                if relatorio['faltando']:
+                    flash(f"Colunas obrigatórias ausentes: {', '.join(relatorio['faltando'])}.", 'danger')
+                elif somente_validar:
+                    flash(f"{relatorio['importadas']} de {relatorio['total']} linhas válidas (nada foi gravado).", 'info')
+                elif relatorio['importadas']:
+                    flash(f"{relatorio['importadas']} de {relatorio['total']} pedidos importados!", 'success')
+
+    return render_template('importar.html', relatorio=relatorio, unidades=unidades,
+                           limite=LIMITE_LINHAS)
+
+
+@bp.route('/importar/modelo.csv')
+def importar_modelo():
+    if not usuario_atual().is_authenticated:
+        return redirect(url_for('main.login'))
+
+    return Response(
+        planilha_modelo(),
+        mimetype='text/csv',
+        headers={"Content-Disposition": 'attachment; filename="modelo_importacao_sgsv.csv"'}
+    )
+
+# --- CONSULTA DE CEP (base local, autopreenchimento do cadastro) ---
+@bp.route('/cep/<cep>')
+def consultar_cep(cep):
+    if not usuario_atual().is_authenticated:
+        return jsonify({"erro": "Sessão expirada."}), 401
+
+    endereco = buscar_cep(cep)
+    if endereco is None:
+        if not base_disponivel():
+            return jsonify({"erro": "Base de CEPs não carregada."}), 503
+        return jsonify({"erro": "CEP não encontrado."}), 404
+
+    resposta = jsonify(endereco)
+    resposta.headers['Cache-Control'] = 'private, max-age=86400'
+    return resposta
+
 # --- LOGIN ---
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
-    if 'user_id' in session:
+    if usuario_atual().is_authenticated:
         # AJUSTE CHAVE: Redireciona para admin_dashboard se for admin, operario OU visualizar
-        if session.get('user_tipo') in ['admin', 'operario', 'visualizar']:
+        if usuario_atual().eh_gestao:
             return redirect(url_for('main.admin_dashboard'))
         return redirect(url_for('main.dashboard'))
 
@@ -472,160 +570,38 @@ def forcar_erro():
     1 / 0  # erro proposital
     return "nunca vai chegar aqui"
 
-# ReportLab (PDF)
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import mm
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-)
-
-# Openpyxl (Excel)
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
-
-# O objeto 'bp' precisa ser definido (Exemplo: bp = Blueprint('main', __name__))
-# E 'Usuario' e 'Solicitacao' precisam ser seus modelos SQLAlchemy
-
-# =======================================================================
-# Função Auxiliar de Filtros (Reutilizada em todas as rotas)
-# =======================================================================
-
-def aplicar_filtros_base(query, filtro_data, uvis_id):
-    """Aplica o filtro de mês/ano e opcionalmente o filtro de UVIS (usuario_id)."""
-    
-    # Filtro de Mês/Ano (obrigatório)
-    query = query.filter(db.func.strftime('%Y-%m', Solicitacao.data_criacao) == filtro_data)
-    
-    # Filtro de UVIS (opcional)
-    if uvis_id:
-        query = query.filter(Solicitacao.usuario_id == uvis_id)
-        
-    return query
-
-
 # =======================================================================
 # ROTA 1: Visualização do Relatório (HTML)
 # =======================================================================
 @bp.route('/relatorios', methods=['GET'])
+@somente_leitura
 def relatorios():
-    if 'user_id' not in session:
+    if not usuario_atual().is_authenticated:
         return redirect(url_for('main.login'))
 
     # 1. Parâmetros de Filtro
-    mes_atual = request.args.get('mes', datetime.now().month, type=int)
-    ano_atual = request.args.get('ano', datetime.now().year, type=int)
+    ano_atual, mes_atual = ler_mes_ano(request.args)
     uvis_id = request.args.get('uvis_id', type=int)
     filtro_data = f"{ano_atual}-{mes_atual:02d}"
 
-    # 2. UVIS disponíveis para o dropdown
-    uvis_disponiveis = db.session.query(Usuario.id, Usuario.nome_uvis) \
-        .filter(Usuario.tipo_usuario == 'uvis') \
-        .order_by(Usuario.nome_uvis) \
-        .all()
+    # 2. UVIS disponíveis para o dropdown (cache de usuários, sem consulta por acesso)
+    uvis_disponiveis = lista_uvis()
 
     # 3. Histórico Mensal (usado para gerar anos disponíveis - não filtra por uvis_id)
-    dados_mensais_raw = (
-        db.session.query(
-            db.func.strftime('%Y-%m', Solicitacao.data_criacao).label('mes'),
-            db.func.count(Solicitacao.id)
-        )
-        .group_by('mes')
-        .order_by('mes')
-        .all()
-    )
-    dados_mensais = [tuple(row) for row in dados_mensais_raw]
+    # Lido do consolidado solicitacoes_mensal, não da tabela inteira
+    dados_mensais = historico_mensal()
 
     anos_disponiveis = sorted(list(set([d[0].split('-')[0] for d in dados_mensais])), reverse=True)
     if not anos_disponiveis:
         anos_disponiveis = [ano_atual]
 
-    # 4. Totalizações (usando a função de filtro)
-    base_query = db.session.query(Solicitacao)
+    # 4. Totalizações e agrupamentos (uma única consulta agregada)
+    resumo = agregar_solicitacoes(filtro_data, uvis_id)
 
-    total_solicitacoes = aplicar_filtros_base(base_query, filtro_data, uvis_id).count()
-    
-    total_aprovadas = aplicar_filtros_base(base_query, filtro_data, uvis_id) \
-        .filter(Solicitacao.status == "APROVADO").count()
-
-    total_recusadas = aplicar_filtros_base(base_query, filtro_data, uvis_id) \
-        .filter(Solicitacao.status == "NEGADO").count()
-
-    total_analise = aplicar_filtros_base(base_query, filtro_data, uvis_id) \
-        .filter(Solicitacao.status == "EM ANÁLISE").count()
-
-    total_pendentes = aplicar_filtros_base(base_query, filtro_data, uvis_id) \
-        .filter(Solicitacao.status == "PENDENTE").count()
-
-    # 5. Consultas Agrupadas (usando a função de filtro)
-
-    # Região (requer JOIN)
-    query_regiao = db.session.query(Usuario.regiao, db.func.count(Solicitacao.id)) \
-        .join(Usuario, Usuario.id == Solicitacao.usuario_id)
-    dados_regiao_raw = aplicar_filtros_base(query_regiao, filtro_data, uvis_id) \
-        .group_by(Usuario.regiao) \
-        .order_by(db.func.count(Solicitacao.id).desc()) \
-        .all()
-    dados_regiao = [tuple(row) for row in dados_regiao_raw]
-
-    # Status
-    query_status = db.session.query(Solicitacao.status, db.func.count(Solicitacao.id))
-    dados_status_raw = aplicar_filtros_base(query_status, filtro_data, uvis_id) \
-        .group_by(Solicitacao.status) \
-        .order_by(db.func.count(Solicitacao.id).desc()) \
-        .all()
-    dados_status = [tuple(row) for row in dados_status_raw]
-
-    # Foco
-    query_foco = db.session.query(Solicitacao.foco, db.func.count(Solicitacao.id))
-    dados_foco_raw = aplicar_filtros_base(query_foco, filtro_data, uvis_id) \
-        .group_by(Solicitacao.foco) \
-        .order_by(db.func.count(Solicitacao.id).desc()) \
-        .all()
-    dados_foco = [tuple(row) for row in dados_foco_raw]
-    
-    # Tipo Visita
-    query_tipo_visita = db.session.query(Solicitacao.tipo_visita, db.func.count(Solicitacao.id))
-    dados_tipo_visita_raw = aplicar_filtros_base(query_tipo_visita, filtro_data, uvis_id) \
-        .group_by(Solicitacao.tipo_visita) \
-        .order_by(db.func.count(Solicitacao.id).desc()) \
-        .all()
-    dados_tipo_visita = [tuple(row) for row in dados_tipo_visita_raw]
-    
-    # Altura de Voo
-    query_altura_voo = db.session.query(Solicitacao.altura_voo, db.func.count(Solicitacao.id))
-    dados_altura_voo_raw = aplicar_filtros_base(query_altura_voo, filtro_data, uvis_id) \
-        .group_by(Solicitacao.altura_voo) \
-        .order_by(db.func.count(Solicitacao.id).desc()) \
-        .all()
-    dados_altura_voo = [tuple(row) for row in dados_altura_voo_raw]
-
-    # Unidade (UVIS) - Requer JOIN e filtro adicional de tipo_usuario
-    query_unidade = db.session.query(Usuario.nome_uvis, db.func.count(Solicitacao.id)) \
-        .join(Usuario, Usuario.id == Solicitacao.usuario_id) \
-        .filter(Usuario.tipo_usuario == 'uvis')
-    dados_unidade_raw = aplicar_filtros_base(query_unidade, filtro_data, uvis_id) \
-        .group_by(Usuario.nome_uvis) \
-        .order_by(db.func.count(Solicitacao.id).desc()) \
-        .all()
-    dados_unidade = [tuple(row) for row in dados_unidade_raw]
-
-    # 6. Retorno
+    # 5. Retorno
     return render_template(
         'relatorios.html',
-        total_solicitacoes=total_solicitacoes,
-        total_aprovadas=total_aprovadas,
-        total_recusadas=total_recusadas,
-        total_analise=total_analise,
-        total_pendentes=total_pendentes,
-        dados_regiao=dados_regiao,
-        dados_status=dados_status,
-        dados_foco=dados_foco,
-        dados_tipo_visita=dados_tipo_visita,
-        dados_altura_voo=dados_altura_voo,
-        dados_unidade=dados_unidade,
+        **resumo,
         dados_mensais=dados_mensais,
         mes_selecionado=mes_atual,
         ano_selecionado=ano_atual,
@@ -635,581 +611,16 @@ def relatorios():
     )
 
 
-# =======================================================================
-# ROTA 2: Exportar PDF (Com Filtro UVIS)
-# =======================================================================
-import os
-import tempfile
-from io import BytesIO
-from datetime import datetime
-from math import ceil
-
-from flask import send_file, request
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.units import mm
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    PageBreak, Image as RLImage, Flowable, KeepTogether
-)
-
-# matplotlib é opcional — tentamos importar e marcamos se disponível
-try:
-    import matplotlib.pyplot as plt
-    MATPLOTLIB_AVAILABLE = True
-except Exception:
-    MATPLOTLIB_AVAILABLE = False
-
-@bp.route('/admin/exportar_relatorio_pdf')
-def exportar_relatorio_pdf():
-    # -------------------------
-    # 1. Parâmetros e filtros
-    # -------------------------
-    mes = int(request.args.get('mes', datetime.now().month))
-    ano = int(request.args.get('ano', datetime.now().year))
-    uvis_id = request.args.get('uvis_id', type=int)
-    orient = request.args.get('orient', default='portrait')  # 'portrait' ou 'landscape'
-    filtro_data = f"{ano}-{mes:02d}"
-
-    # 2. Busca Principal para Totais e Detalhes (mesma lógica sua)
-    query_base = db.session.query(Solicitacao, Usuario).join(Usuario, Usuario.id == Solicitacao.usuario_id)
-    query_base = aplicar_filtros_base(query_base, filtro_data, uvis_id)
-    query_results = query_base.order_by(Solicitacao.data_criacao.desc()).all()
-
-    # 3. Totais
-    total_solicitacoes = len(query_results)
-    total_aprovadas = sum(1 for s, u in query_results if s.status == "APROVADO")
-    total_recusadas = sum(1 for s, u in query_results if s.status == "NEGADO")
-    total_analise = sum(1 for s, u in query_results if s.status == "EM ANÁLISE")
-    total_pendentes = sum(1 for s, u in query_results if s.status == "PENDENTE")
-
-    # 4. Buscas agrupadas (mantendo sua lógica)
-    def aplicar_filtros_agrupados(query):
-        query = query.filter(db.func.strftime('%Y-%m', Solicitacao.data_criacao) == filtro_data)
-        if uvis_id:
-            query = query.filter(Solicitacao.usuario_id == uvis_id)
-        return query
-
-    dados_regiao_raw = aplicar_filtros_agrupados(
-        db.session.query(Usuario.regiao, db.func.count(Solicitacao.id)).join(Usuario, Usuario.id == Solicitacao.usuario_id)
-    ).group_by(Usuario.regiao).all()
-    dados_regiao = [(r or "Não informado", c) for r, c in dados_regiao_raw]
-
-    dados_status_raw = aplicar_filtros_agrupados(
-        db.session.query(Solicitacao.status, db.func.count(Solicitacao.id))
-    ).group_by(Solicitacao.status).all()
-    dados_status = [(s or "Não informado", c) for s, c in dados_status_raw]
-
-    dados_foco_raw = aplicar_filtros_agrupados(
-        db.session.query(Solicitacao.foco, db.func.count(Solicitacao.id))
-    ).group_by(Solicitacao.foco).all()
-    dados_foco = [(f or "Não informado", c) for f, c in dados_foco_raw]
-
-    dados_tipo_visita_raw = aplicar_filtros_agrupados(
-        db.session.query(Solicitacao.tipo_visita, db.func.count(Solicitacao.id))
-    ).group_by(Solicitacao.tipo_visita).all()
-    dados_tipo_visita = [(t or "Não informado", c) for t, c in dados_tipo_visita_raw]
-
-    dados_altura_raw = aplicar_filtros_agrupados(
-        db.session.query(Solicitacao.altura_voo, db.func.count(Solicitacao.id))
-    ).group_by(Solicitacao.altura_voo).all()
-    dados_altura_voo = [(a or "Não informado", c) for a, c in dados_altura_raw]
-
-    dados_unidade_query = db.session.query(Usuario.nome_uvis, db.func.count(Solicitacao.id)) \
-        .join(Usuario, Usuario.id == Solicitacao.usuario_id) \
-        .filter(Usuario.tipo_usuario == 'uvis')
-    dados_unidade_raw = aplicar_filtros_agrupados(dados_unidade_query).group_by(Usuario.nome_uvis).order_by(db.func.count(Solicitacao.id).desc()).all()
-    dados_unidade = [(u or "Não informado", c) for u, c in dados_unidade_raw]
-
-    dados_mensais_raw = (
-        db.session.query(
-            db.func.strftime('%Y-%m', Solicitacao.data_criacao).label('mes'),
-            db.func.count(Solicitacao.id)
-        )
-        .group_by('mes')
-        .order_by('mes')
-        .all()
-    )
-    dados_mensais = [(m, c) for m, c in dados_mensais_raw]
-
-    # -------------------------
-    # 5. Preparar documento PDF
-    # -------------------------
-    tmp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    caminho_pdf = tmp_pdf.name
-    tmp_pdf.close()
-
-    pagesize = A4
-    if orient == 'landscape':
-        pagesize = landscape(A4)
-
-    doc = SimpleDocTemplate(caminho_pdf,
-                            pagesize=pagesize,
-                            leftMargin=16*mm, rightMargin=16*mm,
-                            topMargin=16*mm, bottomMargin=20*mm)
-
-    # Styles aprimorados
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('title', parent=styles['Title'], fontSize=22, leading=26, alignment=1, spaceAfter=8, textColor=colors.HexColor('#0d6efd'))
-    subtitle_style = ParagraphStyle('subtitle', parent=styles['Normal'], fontSize=10, textColor=colors.HexColor('#666'), alignment=1, spaceAfter=6)
-    section_h = ParagraphStyle('sec', parent=styles['Heading2'], fontSize=12, spaceAfter=6, textColor=colors.HexColor('#0d6efd'))
-    normal = styles['Normal']
-    small = ParagraphStyle('small', parent=styles['BodyText'], fontSize=9, textColor=colors.HexColor('#555'))
-
-    story = []
-
-    # -------------------------
-    # Funções utilitárias
-    # -------------------------
-    def safe_img_from_plt(fig):
-        """Recebe um matplotlib.figure.Figure, retorna ReportLab Image (BytesIO)."""
-        bio = BytesIO()
-        fig.tight_layout()
-        fig.savefig(bio, format='png', dpi=150, bbox_inches='tight')
-        plt.close(fig)
-        bio.seek(0)
-        return RLImage(bio, width=170*mm)  # escala automática
-
-    def render_small_table(rows, colWidths):
-        tbl = Table(rows, colWidths=colWidths)
-        tbl.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0d6efd')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('ALIGN', (0,0), (-1,0), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('GRID', (0, 0), (-1, -1), 0.25, colors.lightgrey),
-            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor('#fbfdff')]),
-            ('LEFTPADDING', (0,0), (-1,-1), 6),
-            ('RIGHTPADDING', (0,0), (-1,-1), 6),
-            ('TOPPADDING', (0,0), (-1,-1), 4),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 4),
-        ]))
-        return tbl
-
-    # -------------------------
-    # Cabeçalho / Capa
-    # -------------------------
-    # Logo: procura em static/logo.png por padrão — se não existir, pula
-    logo_path = os.path.join(os.getcwd(), 'static', 'logo.png')
-    if os.path.exists(logo_path):
-        try:
-            logo = RLImage(logo_path, width=36*mm, height=36*mm)
-        except Exception:
-            logo = None
-    else:
-        logo = None
-
-    # Título e capa
-    story.append(Spacer(1, 6))
-    if logo:
-        # coloca o logo e título lado a lado
-        h = [[logo, Paragraph(f"<b>Relatório Mensal — {mes:02d}/{ano}</b>", title_style)]]
-        cap_tbl = Table(h, colWidths=[40*mm, (doc.width - 40*mm)])
-        cap_tbl.setStyle(TableStyle([('VALIGN', (0,0), (-1,-1), 'MIDDLE')]))
-        story.append(cap_tbl)
-    else:
-        story.append(Paragraph(f"Relatório Mensal — {mes:02d}/{ano}", title_style))
-
-    # subtítulo e linhas
-    titulo_uvis = ""
-    if uvis_id:
-        uvis_obj = db.session.query(Usuario.nome_uvis).filter(Usuario.id == uvis_id).first()
-        if uvis_obj:
-            titulo_uvis = f" — {uvis_obj.nome_uvis}"
-    story.append(Paragraph(f"Sistema de Gestão de Solicitações{titulo_uvis}", subtitle_style))
-    story.append(Spacer(1, 8))
-
-    # capa: box com resumo principal (centralizado)
-    resumo_box = [
-        ['Métrica', 'Quantidade'],
-        ['Total de Solicitações', str(total_solicitacoes)],
-        ['Aprovadas', str(total_aprovadas)],
-        ['Recusadas', str(total_recusadas)],
-        ['Em Análise', str(total_analise)],
-        ['Pendentes', str(total_pendentes)]
-    ]
-    story.append(render_small_table(resumo_box, [80*mm, 40*mm]))
-    story.append(Spacer(1, 12))
-
-    # Capa: breve meta-infos
-    story.append(Paragraph(f"Gerado por: Sistema SGSV — Gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}", small))
-    story.append(Spacer(1, 18))
-
-    # -------------------------
-    # Sumário simples (lista de seções)
-    # -------------------------
-    story.append(Paragraph("Sumário", section_h))
-    sumario_itens = [
-        "Resumo Geral",
-        "Solicitações por Região",
-        "Status Detalhado",
-        "Solicitações por Foco / Tipo / Altura",
-        "Solicitações por Unidade (UVIS)",
-        "Histórico Mensal",
-        "Gráficos (Visão Geral)",
-        "Registros Detalhados"
-    ]
-    for i, it in enumerate(sumario_itens, 1):
-        story.append(Paragraph(f"{i}. {it}", normal))
-    story.append(PageBreak())
-
-    # -------------------------
-    # Seções com tabelas (formatadas)
-    # -------------------------
-    # 1) Resumo Geral (repetição do box com estilo)
-    story.append(Paragraph("Resumo Geral", section_h))
-    story.append(render_small_table(resumo_box, [110*mm, 50*mm]))
-    story.append(Spacer(1, 8))
-
-    # 2) Regiões
-    story.append(Paragraph("Solicitações por Região", section_h))
-    rows = [['Região', 'Total']] + [[r, str(c)] for r, c in dados_regiao]
-    story.append(render_small_table(rows, [110*mm, 50*mm]))
-    story.append(Spacer(1, 8))
-
-    # 3) Status
-    story.append(Paragraph("Status Detalhado", section_h))
-    rows = [['Status', 'Total']] + [[s, str(c)] for s, c in dados_status]
-    story.append(render_small_table(rows, [110*mm, 50*mm]))
-    story.append(Spacer(1, 8))
-
-    # 4) Foco / Tipo / Altura
-    story.append(Paragraph("Solicitações por Foco", section_h))
-    rows = [['Foco', 'Total']] + [[f, str(c)] for f, c in dados_foco]
-    story.append(render_small_table(rows, [110*mm, 50*mm]))
-    story.append(Spacer(1, 6))
-
-    story.append(Paragraph("Solicitações por Tipo de Visita", section_h))
-    rows = [['Tipo', 'Total']] + [[t, str(c)] for t, c in dados_tipo_visita]
-    story.append(render_small_table(rows, [110*mm, 50*mm]))
-    story.append(Spacer(1, 6))
-
-    story.append(Paragraph("Solicitações por Altura de Voo", section_h))
-    rows = [['Altura (m)', 'Total']] + [[str(a), str(c)] for a, c in dados_altura_voo]
-    story.append(render_small_table(rows, [110*mm, 50*mm]))
-    story.append(Spacer(1, 8))
-
-    # 5) UVIS
-    story.append(Paragraph("Solicitações por Unidade (UVIS) — Top", section_h))
-    rows = [['Unidade', 'Total']] + [[u, str(c)] for u, c in dados_unidade]
-    story.append(render_small_table(rows, [110*mm, 50*mm]))
-    story.append(Spacer(1, 8))
-
-    # 6) Histórico mensal
-    story.append(Paragraph("Histórico Mensal (Total por Mês)", section_h))
-    rows = [['Mês', 'Total']] + [[m, str(c)] for m, c in dados_mensais]
-    story.append(render_small_table(rows, [70*mm, 40*mm]))
-    story.append(Spacer(1, 12))
-
-    # 7) Gráficos — somente se matplotlib disponível
-    story.append(PageBreak())
-    story.append(Paragraph("Gráficos (Visão Geral)", section_h))
-    if MATPLOTLIB_AVAILABLE:
-        try:
-            # Pie chart: distribuição por status
-            labels = [s for s, _ in dados_status]
-            values = [c for _, c in dados_status]
-            fig1, ax1 = plt.subplots(figsize=(6, 3))
-            ax1.pie(values or [1], labels=labels, autopct=lambda p: f'{p:.0f}%' if p > 0 else '', startangle=90, textprops={'fontsize': 8})
-            ax1.axis('equal')
-            story.append(safe_img_from_plt(fig1))
-            story.append(Spacer(1, 8))
-
-            # Bar chart: top UVIS
-            u_names = [u for u, _ in dados_unidade[:8]]
-            u_vals = [c for _, c in dados_unidade[:8]]
-            fig2, ax2 = plt.subplots(figsize=(8, 2.6))
-            ax2.barh(u_names[::-1] or ['Nenhum'], u_vals[::-1] or [0])
-            ax2.set_xlabel('Total')
-            ax2.set_title('Top UVIS (maiores)', fontsize=9)
-            ax2.tick_params(axis='y', labelsize=8)
-            story.append(safe_img_from_plt(fig2))
-            story.append(Spacer(1, 8))
-
-            # Line chart: histórico mensal
-            months = [m for m, _ in dados_mensais]
-            counts = [c for _, c in dados_mensais]
-            fig3, ax3 = plt.subplots(figsize=(8, 2.6))
-            if months:
-                ax3.plot(months, counts, marker='o', linewidth=1)
-                ax3.set_xticklabels(months, rotation=45, fontsize=8)
-            ax3.set_title('Histórico Mensal', fontsize=9)
-            ax3.grid(axis='y', linestyle=':', linewidth=0.5)
-            story.append(safe_img_from_plt(fig3))
-            story.append(Spacer(1, 6))
-        except Exception:
-            # se algo falhar nos gráficos, apenas passa
-            story.append(Paragraph("Gráficos indisponíveis (erro ao gerar).", normal))
-            story.append(Spacer(1, 8))
-    else:
-        story.append(Paragraph("Matplotlib não disponível — gráficos foram omitidos.", normal))
-        story.append(Spacer(1, 8))
-
-    # 8) Registros detalhados (tabela grande)
-    story.append(PageBreak())
-    story.append(Paragraph("Registros Detalhados", section_h))
-    story.append(Spacer(1, 6))
-
-    registros_header = ['Data', 'Hora', 'Unidade', 'Protocolo', 'Status', 'Região', 'Foco', 'Tipo Visita', 'Observação']
-    registros_rows = [registros_header]
-
-    for s, u in query_results:
-        # data/hora safe formatting
-        data_str = ''
-        try:
-            if getattr(s, 'data_agendamento', None):
-                data_str = s.data_agendamento.strftime("%d/%m/%Y") if hasattr(s.data_agendamento, 'strftime') else str(s.data_agendamento)
-            else:
-                data_str = s.data_criacao.strftime("%d/%m/%Y") if hasattr(s.data_criacao, 'strftime') else str(s.data_criacao)
-        except:
-            data_str = str(getattr(s, 'data_agendamento', '') or getattr(s, 'data_criacao', ''))
-
-        hora = getattr(s, 'hora_agendamento', '')
-        hora_str = hora.strftime("%H:%M") if hasattr(hora, 'strftime') else str(hora or '')
-
-        unidade = getattr(u, 'nome_uvis', '') or "Não informado"
-        protocolo = getattr(s, 'protocolo', '') or ''
-        status = getattr(s, 'status', '') or ''
-        regiao = getattr(u, 'regiao', '') or ''
-        foco = getattr(s, 'foco', '') or ''
-        tipo_visita = getattr(s, 'tipo_visita', '') or ''
-        obs = getattr(s, 'observacao', '') or ''
-
-        registros_rows.append([data_str, hora_str, unidade, protocolo, status, regiao, foco, tipo_visita, obs])
-
-    # Dividimos a tabela em pedaços para evitar problemas de memória/páginas
-    # e garantir que não estoure
-    chunk_size = 40
-    for i in range(0, len(registros_rows), chunk_size):
-        chunk = registros_rows[i:i+chunk_size]
-        tbl = Table(chunk, repeatRows=1, colWidths=[18*mm, 14*mm, 35*mm, 26*mm, 22*mm, 28*mm, 28*mm, 30*mm, 45*mm])
-        tbl.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#0d6efd')),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 9),
-            ('GRID', (0,0), (-1,-1), 0.25, colors.lightgrey),
-            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor('#fbfdff')]),
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-            ('LEFTPADDING', (0,0), (-1,-1), 4),
-            ('RIGHTPADDING', (0,0), (-1,-1), 4),
-            ('TOPPADDING', (0,0), (-1,-1), 3),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 3),
-        ]))
-        story.append(tbl)
-        story.append(Spacer(1, 8))
-        # adiciona quebra de página entre chunks (exceto se for o último)
-        if i + chunk_size < len(registros_rows):
-            story.append(PageBreak())
-
-    # -------------------------
-    # Footer fixo e page numbers
-    # -------------------------
-    # Usaremos canvas callbacks quando build() for chamado.
-    def _header_footer(canvas, doc):
-        # header (linha superior colorida)
-        canvas.saveState()
-        w, h = pagesize
-        # linha azul
-        canvas.setFillColor(colors.HexColor('#0d6efd'))
-        canvas.rect(doc.leftMargin, h - (12*mm), doc.width, 4, fill=1, stroke=0)
-
-        # rodapé: texto e número de página
-        footer_text = "Sistema de Gestão de Solicitações — SGSV"
-        canvas.setFont("Helvetica", 8)
-        canvas.setFillColor(colors.HexColor('#777'))
-        canvas.drawString(doc.leftMargin, 10*mm, footer_text)
-
-        # número de páginas
-        page_num_text = f"Página {canvas.getPageNumber()}"
-        canvas.drawRightString(doc.leftMargin + doc.width, 10*mm, page_num_text)
-        canvas.restoreState()
-
-    # -------------------------
-    # Build e retorno
-    # -------------------------
-    doc.build(story, onFirstPage=_header_footer, onLaterPages=_header_footer)
-
-    # nome do arquivo
-    nome_arquivo = f"relatorio_SGSV_{ano}_{mes:02d}"
-    if uvis_id:
-        nome_arquivo += f"_UVIS_{uvis_id}"
-
-    # envia o pdf
-    return send_file(
-        caminho_pdf,
-        as_attachment=True,
-        download_name=f"{nome_arquivo}.pdf",
-        mimetype="application/pdf"
-    )
-
-# =======================================================================
-# ROTA 3: Exportar Excel (Com Filtro UVIS)
-# =======================================================================
-@bp.route('/admin/exportar_relatorio_excel')
-def exportar_relatorio_excel():
-    # 1. Parâmetros de Filtro
-    if 'user_id' not in session:
-        return redirect(url_for('main.login'))
-
-    mes = request.args.get('mes', datetime.now().month, type=int)
-    ano = request.args.get('ano', datetime.now().year, type=int)
-    uvis_id = request.args.get('uvis_id', type=int) # NOVO FILTRO
-    filtro_data = f"{ano}-{mes:02d}"
-
-    # 2. Busca de Dados
-    query_dados = db.session.query(
-        Solicitacao.id,
-        Solicitacao.status,
-        Solicitacao.foco,
-        Solicitacao.tipo_visita,
-        Solicitacao.altura_voo,
-        Solicitacao.data_agendamento,
-        Solicitacao.hora_agendamento,
-        Solicitacao.cep,
-        Solicitacao.logradouro,
-        Solicitacao.numero,
-        Solicitacao.bairro,
-        Solicitacao.cidade,
-        Solicitacao.uf,
-        Solicitacao.latitude,
-        Solicitacao.longitude,
-        Usuario.nome_uvis,
-        Usuario.regiao
-    ) \
-        .join(Usuario, Usuario.id == Solicitacao.usuario_id) \
-        .filter(db.func.strftime('%Y-%m', Solicitacao.data_criacao) == filtro_data)
-
-    # APLICAÇÃO DO NOVO FILTRO
-    if uvis_id:
-        query_dados = query_dados.filter(Solicitacao.usuario_id == uvis_id)
-
-    dados = query_dados.all()
-
-    # 3. Criar arquivo Excel
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Relatório"
-
-    # Cabeçalho
-    colunas = [
-        "ID", "Status", "Foco", "Tipo Visita", "Altura Voo",
-        "Data Agendamento", "Hora Agendamento",
-        "CEP", "Logradouro", "Número", "Bairro", "Cidade", "UF",
-        "Latitude", "Longitude", "UVIS", "Região"
-    ]
-
-    # ... (Estilos e escrita do cabeçalho) ...
-    header_fill = PatternFill(start_color="1E90FF", end_color="1E90FF", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-    center = Alignment(horizontal="center", vertical="center")
-    thin = Side(style='thin', color="000000")
-    thin_border = Border(left=thin, right=thin, top=thin, bottom=thin)
-    zebra1 = PatternFill(start_color="FFFFFFFF", end_color="FFFFFFFF", fill_type="solid")
-    zebra2 = PatternFill(start_color="FFF7FBFF", end_color="FFF7FBFF", fill_type="solid")
-
-    for col_num, col_name in enumerate(colunas, 1):
-        cell = ws.cell(row=1, column=col_num, value=col_name)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center
-        cell.border = thin_border
-
-    # 4. Preenchimento das linhas
-    for row_num, row in enumerate(dados, 2):
-
-        # ---- FORMATAR DATAS ----
-        data_agendamento_fmt = ""
-        if row.data_agendamento:
-            try:
-                data_agendamento_fmt = row.data_agendamento.strftime("%d/%m/%Y")
-            except:
-                data_agendamento_fmt = str(row.data_agendamento)
-
-        # ---- FORMATAR HORA ----
-        hora_agendamento_fmt = ""
-        if row.hora_agendamento:
-            try:
-                hora_agendamento_fmt = row.hora_agendamento.strftime("%H:%M")
-            except:
-                hora_agendamento_fmt = str(row.hora_agendamento)
-
-        # ---- PREENCHER LINHAS ----
-        values = [
-            row.id,
-            row.status,
-            row.foco,
-            row.tipo_visita,
-            row.altura_voo,
-            data_agendamento_fmt,
-            hora_agendamento_fmt,
-            row.cep,
-            row.logradouro,
-            row.numero,
-            row.bairro,
-            row.cidade,
-            row.uf,
-            row.latitude,
-            row.longitude,
-            row.nome_uvis,
-            row.regiao
-        ]
-
-        for col_index, value in enumerate(values, 1):
-            cell = ws.cell(row=row_num, column=col_index, value=value)
-            cell.border = thin_border
-            if col_index in (1, 3, 6, 8, 15, 16):
-                cell.alignment = center
-            else:
-                cell.alignment = Alignment(vertical="top", horizontal="left")
-
-            fill = zebra1 if (row_num % 2 == 0) else zebra2
-            cell.fill = fill
-
-    # 5. Ajustar e Finalizar
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter
-        for cell in col:
-            try:
-                if cell.value is not None:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        ws.column_dimensions[column].width = max(10, min(max_length + 2, 60))
-
-    ws.freeze_panes = "A2"
-    ws.auto_filter.ref = f"A1:{get_column_letter(len(colunas))}1"
-
-    # Gerar arquivo em memória
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    # Nome do arquivo
-    nome_arquivo = f"relatorio_SGSV_{ano}_{mes:02d}"
-    if uvis_id:
-        nome_arquivo += f"_UVIS_{uvis_id}"
-
-    return send_file(
-        output,
-        download_name=f"{nome_arquivo}.xlsx",
-        as_attachment=True,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-    
     # NOVO: ROTA PARA EDIÇÃO COMPLETA (Apenas ADMIN)
 @bp.route('/admin/editar_completo/<int:id>', methods=['GET', 'POST'])
 def admin_editar_completo(id):
     # Permite APENAS 'admin'
-    if session.get('user_tipo') != 'admin':
+    if not usuario_atual().eh_admin:
         flash('Acesso restrito. Apenas administradores podem editar detalhes do registro.', 'danger')
         return redirect(url_for('main.admin_dashboard'))
 
     pedido = Solicitacao.query.get_or_404(id)
+    chave_antiga = chave_mensal(pedido)
 
     if request.method == 'POST':
         try:
@@ -1247,11 +658,17 @@ def admin_editar_completo(id):
             pedido.protocolo = request.form.get('protocolo')
             pedido.status = request.form.get('status')
             pedido.justificativa = request.form.get('justificativa')
-            pedido.latitude = request.form.get('latitude')
-            pedido.longitude = request.form.get('longitude')
-            
+            if not pedido.set_coordenadas(request.form.get('latitude'), request.form.get('longitude')):
+                flash('Coordenadas inválidas foram descartadas (use o formato -23.550520).', 'warning')
+            if preencher_coordenadas(pedido):
+                flash('Coordenadas preenchidas a partir do endereço.', 'info')
+
+            mover_mensal(chave_antiga, chave_mensal(pedido))
+            registrar_alteracao(pedido)
+
             db.session.commit()
             flash('Registro atualizado (ADMIN).', 'success')
+            _avisar_conflitos(pedido)
             return redirect(url_for('main.admin_dashboard'))
 
         except Exception as e:
@@ -1271,7 +688,7 @@ from flask import session, flash, redirect, url_for
 @bp.route('/admin/deletar/<int:id>', methods=['POST'], endpoint='deletar_registro')
 def deletar(id):
 
-    if session.get('user_tipo') != 'admin':
+    if not usuario_atual().eh_admin:
         flash('Permissão negada. Apenas administradores podem deletar registros.', 'danger')
         return redirect(url_for('main.admin_dashboard'))
 
@@ -1286,6 +703,8 @@ def deletar(id):
     autor_nome = pedido.autor.nome_uvis if pedido.autor else "UVIS"
 
     try:
+        ajustar_mensal(chave_mensal(pedido), -1)
+        registrar_alteracao(pedido)
         db.session.delete(pedido)
         db.session.commit()
     except Exception:
@@ -1299,39 +718,160 @@ def deletar(id):
 # ROTA DA AGENDA / CALENDÁRIO
 # ----------------------------------------------
 @bp.route("/agenda")
+@somente_leitura
 def agenda():
-    if 'user_id' not in session:
+    if not usuario_atual().is_authenticated:
         return redirect(url_for('main.login'))
 
-    user_tipo = session.get("user_tipo")
-    user_id = session.get("user_id")
+    # Os eventos são buscados pelo FullCalendar em /agenda/eventos,
+    # somente para a janela de datas visível no calendário
+    return render_template("agenda.html")
+
+
+def _data_janela(valor):
+    """Lê a data (AAAA-MM-DD) do início de um parâmetro ISO do FullCalendar."""
+    try:
+        return date.fromisoformat((valor or '')[:10])
+    except ValueError:
+        return None
+
+
+def consulta_agenda(inicio, fim, usuario_id=None):
+    """Eventos da janela [inicio, fim), de todas as UVIS ou de uma (também usada em app/indices.py)."""
+    # Somente as colunas usadas no calendário
+    query = db.session.query(
+        Solicitacao.id,
+        Solicitacao.data_agendamento,
+        Solicitacao.hora_agendamento,
+        Solicitacao.foco,
+        Solicitacao.status,
+        Usuario.nome_uvis
+    ).join(Usuario, Usuario.id == Solicitacao.usuario_id) \
+        .filter(Solicitacao.data_agendamento >= inicio,
+                Solicitacao.data_agendamento < fim)
+
+    if usuario_id:
+        query = query.filter(Solicitacao.usuario_id == usuario_id)
+
+    return query.order_by(Solicitacao.data_agendamento, Solicitacao.hora_agendamento)
 
-    # Admin, Operário e Visualizar enxergam tudo
-    if user_tipo in ['admin', 'operario', 'visualizar']:
-        eventos = Solicitacao.query.options(joinedload(Solicitacao.autor)).all()
-    else:
-        # UVIS vê apenas seus próprios agendamentos
-        eventos = Solicitacao.query \
-            .filter_by(usuario_id=user_id) \
-            .options(joinedload(Solicitacao.autor)).all()
+
+@bp.route("/agenda/eventos")
+@somente_leitura
+def agenda_eventos():
+    if not usuario_atual().is_authenticated:
+        return jsonify({"erro": "Sessão expirada."}), 401
+
+    inicio = _data_janela(request.args.get("start"))
+    fim = _data_janela(request.args.get("end"))
+    if not inicio or not fim:
+        return jsonify({"erro": "Parâmetros 'start' e 'end' são obrigatórios."}), 400
+
+    user_tipo = usuario_atual().tipo_usuario
+    user_id = usuario_atual().id
+
+    # Admin, Operário e Visualizar enxergam tudo; UVIS apenas os seus
+    query = consulta_agenda(
+        inicio, fim,
+        usuario_id=None if user_tipo in ['admin', 'operario', 'visualizar'] else user_id
+    )
+
+    pode_editar = user_tipo in ["admin", "operario"]
 
     # Converter eventos para o FullCalendar (JSON)
     agenda_eventos = []
-    for e in eventos:
-        if not e.data_agendamento:
-            continue
-
+    for e in query:
         data = e.data_agendamento.strftime("%Y-%m-%d")
         hora = e.hora_agendamento.strftime("%H:%M") if e.hora_agendamento else "00:00"
 
         agenda_eventos.append({
-            "title": f"{e.foco} - {e.autor.nome_uvis}",
+            "title": f"{e.foco} - {e.nome_uvis}",
             "start": f"{data}T{hora}",
-            "url": url_for("main.admin_editar", id=e.id) if user_tipo in ["admin", "operario"] else None,
+            "url": url_for("main.admin_editar", id=e.id) if pode_editar else None,
             "color": "#198754" if e.status == "APROVADO" else
                      "#dc3545" if e.status == "NEGADO" else
                      "#ffc107" if e.status == "EM ANÁLISE" else
                      "#0d6efd"
         })
 
-    return render_template("agenda.html", eventos_json=json.dumps(agenda_eventos))
+    # ETag do conteúdo: janela sem mudanças responde 304 (If-None-Match)
+    resposta = jsonify(agenda_eventos)
+    resposta.cache_control.private = True
+    resposta.cache_control.no_cache = True
+    resposta.add_etag()
+    return resposta.make_conditional(request)
+
+
+# ----------------------------------------------
+# MAPA: solicitações dentro de uma área (bbox)
+# ----------------------------------------------
+LIMITE_MAPA = 2000
+
+
+def consulta_mapa(area, status=None, inicio=None, fim=None, usuario_id=None):
+    """Pedidos dentro de `area` (pelo índice de geohash), com os filtros do mapa (também usada em app/indices.py)."""
+    query = db.session.query(
+        Solicitacao.id,
+        Solicitacao.latitude,
+        Solicitacao.longitude,
+        Solicitacao.data_agendamento,
+        Solicitacao.foco,
+        Solicitacao.status,
+        Usuario.nome_uvis
+    ).join(Usuario, Usuario.id == Solicitacao.usuario_id) \
+        .filter(filtro_area(
+            Solicitacao, *area,
+            # status junto de cada faixa de geohash (ix_solicitacoes_status_geohash)
+            condicoes=[Solicitacao.status == status] if status else ()
+        ))
+
+    if inicio:
+        query = query.filter(Solicitacao.data_agendamento >= inicio)
+    if fim:
+        query = query.filter(Solicitacao.data_agendamento < fim)
+    if usuario_id:
+        query = query.filter(Solicitacao.usuario_id == usuario_id)
+
+    return query.limit(LIMITE_MAPA + 1)
+
+
+@bp.route("/mapa/solicitacoes")
+@somente_leitura
+def mapa_solicitacoes():
+    """
+    ?bbox=oeste,sul,leste,norte [&status=APROVADO] [&inicio=AAAA-MM-DD&fim=AAAA-MM-DD]
+
+    Responde só a partir do índice de geohash; o período é [inicio, fim)
+    sobre data_agendamento, como na agenda.
+    """
+    if not usuario_atual().is_authenticated:
+        return jsonify({"erro": "Sessão expirada."}), 401
+
+    area = ler_bbox(request.args.get("bbox"))
+    if not area:
+        return jsonify({"erro": "Parâmetro 'bbox' inválido (oeste,sul,leste,norte)."}), 400
+
+    # UVIS enxerga apenas os seus pedidos (igual à agenda)
+    linhas = consulta_mapa(
+        area,
+        status=request.args.get("status"),
+        inicio=_data_janela(request.args.get("inicio")),
+        fim=_data_janela(request.args.get("fim")),
+        usuario_id=None if usuario_atual().eh_gestao else usuario_atual().id
+    ).all()
+
+    return jsonify({
+        "truncado": len(linhas) > LIMITE_MAPA,
+        "itens": [
+            {
+                "id": s.id,
+                "lat": s.latitude,
+                "lng": s.longitude,
+                "data": s.data_agendamento.isoformat() if s.data_agendamento else None,
+                "foco": s.foco,
+                "status": s.status,
+                "unidade": s.nome_uvis
+            }
+            for s in linhas[:LIMITE_MAPA]
+        ]
+    })
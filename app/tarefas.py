@@ -0,0 +1,297 @@
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from flask import current_app
+from sqlalchemy import update
+
+from app import db
+from app.models import TarefaExportacao
+from app.agregacoes import ler_mes_ano
+from app.cache_relatorios import relatorio_em_cache
+from app.exportacao import (
+    gerar_planilha_solicitacoes, gerar_planilha_relatorio, gerar_pdf_relatorio,
+    nome_relatorio, MIMETYPE_XLSX, NOME_PLANILHA_SOLICITACOES
+)
+
+
+# -------------------------------------------------------------
+# FILA DE EXPORTAÇÕES
+# -------------------------------------------------------------
+# A rota só grava a tarefa no banco e a entrega para um pool local de
+# processos. O processo filho gera o arquivo em instance/exportacoes e
+# atualiza o status; o navegador consulta o status até poder baixar.
+# Se o worker for reciclado ou morto no meio, ninguém conclui a tarefa:
+# PROCESSANDO há mais de MINUTOS_LIMITE_TAREFA (contados do início da
+# execução) ou PENDENTE há mais de MINUTOS_LIMITE_FILA ela é dada como
+# ERRO (ver expirar_travadas). O processo só começa tarefas PENDENTE e só
+# conclui as que ainda estão PROCESSANDO, então uma tarefa expirada não volta.
+
+PERFIS_GESTAO = ('admin', 'operario')
+
+TIPOS_EXPORTACAO = {
+    'planilha_solicitacoes': {
+        'gerar': gerar_planilha_solicitacoes,
+        'extensao': 'xlsx',
+        'mimetype': MIMETYPE_XLSX,
+        'perfis': PERFIS_GESTAO,
+        'cache': False,  # depende de filtros livres, não do mês
+    },
+    'relatorio_excel': {
+        'gerar': gerar_planilha_relatorio,
+        'extensao': 'xlsx',
+        'mimetype': MIMETYPE_XLSX,
+        'perfis': None,  # qualquer usuário logado
+        'cache': True,
+    },
+    'relatorio_pdf': {
+        'gerar': gerar_pdf_relatorio,
+        'extensao': 'pdf',
+        'mimetype': 'application/pdf',
+        'perfis': None,
+        'cache': True,
+    },
+}
+
+HORAS_RETENCAO = 24
+MINUTOS_LIMITE_TAREFA = 30  # PROCESSANDO há mais tempo que isso: travada
+MINUTOS_LIMITE_FILA = 120   # PENDENTE (pool ocupado) há mais tempo que isso: perdida
+STATUS_EM_ANDAMENTO = ('PENDENTE', 'PROCESSANDO')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def ler_parametros(tipo, args):
+    """Extrai da query string os parâmetros aceitos por cada tipo de exportação."""
+    if tipo == 'planilha_solicitacoes':
+        return {
+            'filtro_status': args.get('status') or None,
+            'filtro_unidade': args.get('unidade') or None,
+            'filtro_regiao': args.get('regiao') or None,
+            'filtro_busca': args.get('q') or None,
+        }
+
+    ano, mes = ler_mes_ano(args)
+    parametros = {'ano': ano, 'mes': mes, 'uvis_id': args.get('uvis_id', type=int)}
+    if tipo == 'relatorio_pdf':
+        parametros['orient'] = args.get('orient', 'portrait')
+    return parametros
+
+
+def nome_download(tipo, parametros):
+    """Nome do arquivo entregue ao usuário."""
+    if tipo == 'planilha_solicitacoes':
+        return NOME_PLANILHA_SOLICITACOES
+
+    base = nome_relatorio(parametros['ano'], parametros['mes'], parametros.get('uvis_id'))
+    return f"{base}.{TIPOS_EXPORTACAO[tipo]['extensao']}"
+
+
+def diretorio_artefatos(app):
+    caminho = os.path.join(app.instance_path, 'exportacoes')
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+
+def _obter_executor(app):
+    """Cria o pool de processos sob demanda (nunca no import, por causa do fork)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config.get('EXPORTACAO_PROCESSOS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_iniciar_processo,
+                initargs=(_config_do_app(app), app.instance_path)
+            )
+        return _executor
+
+
+def enfileirar(tipo, parametros, usuario_id):
+    """Registra a tarefa e a envia para o pool. Retorna a TarefaExportacao."""
+    app = current_app._get_current_object()
+    limpar_tarefas_antigas()
+
+    tarefa = TarefaExportacao(
+        id=uuid.uuid4().hex,
+        tipo=tipo,
+        parametros=json.dumps(parametros),
+        status='PENDENTE',
+        nome_arquivo=nome_download(tipo, parametros),
+        usuario_id=usuario_id
+    )
+    db.session.add(tarefa)
+    db.session.commit()
+
+    future = _obter_executor(app).submit(executar_tarefa, tarefa.id)
+    future.add_done_callback(lambda f, tarefa_id=tarefa.id: _ao_terminar(app, tarefa_id, f))
+    return tarefa
+
+
+def executar_em_segundo_plano(funcao, *args):
+    """
+    Roda `funcao(*args)` num processo do pool, dentro de um app context
+    (ex.: preenchimento de coordenadas). `funcao` precisa ser de módulo,
+    para poder ser enviada ao processo. Retorna o Future.
+    """
+    app = current_app._get_current_object()
+    return _obter_executor(app).submit(_executar_com_app, funcao, *args)
+
+
+def _ao_terminar(app, tarefa_id, future):
+    """Se o processo filho morrer, marca a tarefa como ERRO (e descarta o pool)."""
+    global _executor
+    erro = future.exception()
+    if erro is None:
+        return
+
+    with _executor_lock:
+        _executor = None
+
+    with app.app_context():
+        tarefa = db.session.get(TarefaExportacao, tarefa_id)
+        if tarefa and tarefa.status in STATUS_EM_ANDAMENTO:
+            tarefa.status = 'ERRO'
+            tarefa.erro = f"Falha no processo de exportação: {erro}"
+            tarefa.data_conclusao = datetime.utcnow()
+            db.session.commit()
+
+
+def expirar_travadas(tarefa_id=None):
+    """
+    Marca como ERRO as tarefas PROCESSANDO há mais de EXPORTACAO_TIMEOUT_MINUTOS
+    (contados de data_inicio) e as PENDENTE há mais de
+    EXPORTACAO_FILA_TIMEOUT_MINUTOS (o processo que as executava, ou o pool
+    onde esperavam, morreu junto com o worker). Só `tarefa_id`, se
+    informado. Sem commit; retorna quantas foram marcadas.
+    """
+    config = current_app.config
+    agora = datetime.utcnow()
+    limites = (
+        ('PROCESSANDO', TarefaExportacao.data_inicio,
+         config.get('EXPORTACAO_TIMEOUT_MINUTOS', MINUTOS_LIMITE_TAREFA),
+         "A exportação não terminou em {} minutos (processo interrompido)."),
+        ('PENDENTE', TarefaExportacao.data_criacao,
+         config.get('EXPORTACAO_FILA_TIMEOUT_MINUTOS', MINUTOS_LIMITE_FILA),
+         "A exportação não começou em {} minutos (fila interrompida)."),
+    )
+
+    marcadas = 0
+    for status, desde, minutos, mensagem in limites:
+        # UPDATE condicional: se o processo mudar o status ao mesmo tempo,
+        # a mudança dele não é sobrescrita
+        comando = update(TarefaExportacao).where(
+            TarefaExportacao.status == status,
+            desde < agora - timedelta(minutes=minutos)
+        )
+        if tarefa_id is not None:
+            comando = comando.where(TarefaExportacao.id == tarefa_id)
+
+        marcadas += db.session.execute(
+            comando.values(status='ERRO', erro=mensagem.format(minutos), data_conclusao=agora),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+    return marcadas
+
+
+def limpar_tarefas_antigas(horas=HORAS_RETENCAO):
+    """Marca as tarefas travadas como ERRO e remove as (e os arquivos) mais antigas que `horas`."""
+    travadas = expirar_travadas()
+
+    limite = datetime.utcnow() - timedelta(hours=horas)
+    antigas = TarefaExportacao.query.filter(TarefaExportacao.data_criacao < limite).all()
+
+    for tarefa in antigas:
+        if tarefa.caminho_arquivo and os.path.exists(tarefa.caminho_arquivo):
+            os.remove(tarefa.caminho_arquivo)
+        db.session.delete(tarefa)
+
+    if antigas or travadas:
+        db.session.commit()
+
+
+# -------------------------------------------------------------
+# Execução (roda dentro do processo filho)
+# -------------------------------------------------------------
+_app_processo = None
+_config_processo = None  # (config, instance_path) do app pai
+
+
+def _config_do_app(app):
+    """Configuração do app que criou o pool, enviada a cada processo filho."""
+    return {chave: valor for chave, valor in app.config.items() if chave.isupper()}
+
+
+def _iniciar_processo(config, instance_path):
+    """Initializer do pool: guarda a configuração e a pasta instance do app pai."""
+    global _config_processo
+    _config_processo = (config, instance_path)
+
+
+def _app_do_processo():
+    """Cada processo do pool cria o próprio app (e engine) uma única vez, com a config do pai."""
+    global _app_processo
+    if _app_processo is None:
+        from app import create_app
+        config, instance_path = _config_processo
+        _app_processo = create_app(SimpleNamespace(**config))
+        _app_processo.instance_path = instance_path  # exportacoes/ e cache no mesmo lugar do pai
+    return _app_processo
+
+
+def _executar_com_app(funcao, *args):
+    with _app_do_processo().app_context():
+        return funcao(*args)
+
+
+def executar_tarefa(tarefa_id):
+    app = _app_do_processo()
+
+    with app.app_context():
+        # Só começa se ainda estiver PENDENTE (não expirou nem já foi executada)
+        if not _mudar_status(tarefa_id, 'PENDENTE', status='PROCESSANDO', data_inicio=datetime.utcnow()):
+            return
+
+        tarefa = db.session.get(TarefaExportacao, tarefa_id)
+        tipo = TIPOS_EXPORTACAO[tarefa.tipo]
+        destino = os.path.join(diretorio_artefatos(app), f"{tarefa.id}.{tipo['extensao']}")
+
+        try:
+            parametros = json.loads(tarefa.parametros)
+            em_cache = None
+            if tipo['cache']:
+                em_cache = relatorio_em_cache(tarefa.tipo, parametros, tipo['gerar'], tipo['extensao'])
+
+            if em_cache:
+                with em_cache, open(destino, 'wb') as saida:
+                    shutil.copyfileobj(em_cache, saida)
+            else:
+                tipo['gerar'](destino, **parametros)
+            resultado = {'status': 'CONCLUIDO', 'caminho_arquivo': destino}
+        except Exception as e:
+            db.session.rollback()
+            resultado = {'status': 'ERRO', 'erro': str(e)}
+
+        # Expirada enquanto rodava (expirar_travadas): continua ERRO, sem arquivo
+        concluida = _mudar_status(tarefa_id, 'PROCESSANDO', data_conclusao=datetime.utcnow(), **resultado)
+        if (resultado['status'] == 'ERRO' or not concluida) and os.path.exists(destino):
+            os.remove(destino)
+
+
+def _mudar_status(tarefa_id, status_atual, **valores):
+    """UPDATE da tarefa só se ela ainda estiver em `status_atual`, com commit. True se mudou."""
+    mudou = db.session.execute(
+        update(TarefaExportacao)
+        .where(TarefaExportacao.id == tarefa_id, TarefaExportacao.status == status_atual)
+        .values(**valores),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.session.commit()
+    return bool(mudou)
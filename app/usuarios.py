@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app, g, session
+from sqlalchemy import event
+
+from app import db
+from app.models import Usuario
+
+
+# -------------------------------------------------------------
+# CONTEXTO DO USUÁRIO LOGADO + CACHE DE USUÁRIOS
+# -------------------------------------------------------------
+# `usuario_atual()` monta, uma vez por requisição, o objeto com os dados
+# da sessão (id, nome, perfil) — é o `current_user` dos templates e o
+# que as rotas consultam para permissões. Dados que vêm do banco (linha
+# do Usuario, lista de UVIS dos filtros) passam por um cache em memória
+# com validade curta, limpo sempre que um Usuario é gravado neste
+# processo; nos demais processos a validade limita a defasagem.
+
+TTL_PADRAO = 300  # segundos
+
+PERFIS_GESTAO = ('admin', 'operario', 'visualizar')
+PERFIS_EDICAO = ('admin', 'operario')
+
+# Cópia somente leitura da linha (sem senha_hash), segura entre requisições
+DadosUsuario = namedtuple('DadosUsuario', 'id nome_uvis regiao codigo_setor login tipo_usuario')
+Uvis = namedtuple('Uvis', 'id nome_uvis')
+
+_cache = {}
+_trava = threading.Lock()
+
+
+def _ttl():
+    return current_app.config.get('USUARIOS_CACHE_TTL', TTL_PADRAO)
+
+
+def _em_cache(chave, carregar):
+    agora = time.monotonic()
+    item = _cache.get(chave)
+    if item is not None and item[0] > agora:
+        return item[1]
+
+    valor = carregar()
+    with _trava:
+        _cache[chave] = (agora + _ttl(), valor)
+    return valor
+
+
+def limpar_cache_usuarios():
+    with _trava:
+        _cache.clear()
+
+
+@event.listens_for(Usuario, 'after_insert')
+@event.listens_for(Usuario, 'after_update')
+@event.listens_for(Usuario, 'after_delete')
+def _usuario_alterado(mapper, connection, alvo):
+    limpar_cache_usuarios()
+
+
+def dados_usuario(usuario_id):
+    """DadosUsuario do id (ou None), sem ir ao banco enquanto o cache valer."""
+    if usuario_id is None:
+        return None
+
+    def carregar():
+        linha = db.session.query(
+            Usuario.id, Usuario.nome_uvis, Usuario.regiao,
+            Usuario.codigo_setor, Usuario.login, Usuario.tipo_usuario
+        ).filter(Usuario.id == usuario_id).first()
+        return DadosUsuario(*linha) if linha else None
+
+    return _em_cache(('usuario', usuario_id), carregar)
+
+
+def lista_uvis():
+    """[(id, nome_uvis)] das UVIS, em ordem alfabética (dropdowns de filtro)."""
+    def carregar():
+        return [
+            Uvis(*linha) for linha in db.session.query(Usuario.id, Usuario.nome_uvis)
+            .filter(Usuario.tipo_usuario == 'uvis')
+            .order_by(Usuario.nome_uvis)
+        ]
+
+    return _em_cache(('uvis',), carregar)
+
+
+def nome_uvis(usuario_id):
+    dados = dados_usuario(usuario_id)
+    return dados.nome_uvis if dados else None
+
+
+# -------------------------------------------------------------
+# Contexto por requisição
+# -------------------------------------------------------------
+class ContextoUsuario:
+    """Usuário da requisição (lido da sessão). Também é o `current_user` dos templates."""
+
+    def __init__(self, sessao):
+        try:
+            self.id = int(sessao['user_id']) if 'user_id' in sessao else None
+        except (TypeError, ValueError):
+            self.id = None
+        self.is_authenticated = self.id is not None
+        self.name = sessao.get('user_nome') if self.is_authenticated else None
+        self.tipo_usuario = sessao.get('user_tipo') if self.is_authenticated else None
+
+    @property
+    def eh_admin(self):
+        return self.tipo_usuario == 'admin'
+
+    @property
+    def eh_gestao(self):
+        """admin, operário ou visualizar (painel de gestão)."""
+        return self.tipo_usuario in PERFIS_GESTAO
+
+    @property
+    def pode_editar(self):
+        return self.tipo_usuario in PERFIS_EDICAO
+
+    @property
+    def dados(self):
+        """Linha do Usuario (DadosUsuario) via cache; None se não logado."""
+        return dados_usuario(self.id)
+
+
+def usuario_atual():
+    """ContextoUsuario da requisição, criado no primeiro uso."""
+    if 'usuario' not in g:
+        g.usuario = ContextoUsuario(session)
+    return g.usuario
@@ -0,0 +1,92 @@
+"""
+Benchmark de inicialização: quanto custa um create_app() a frio.
+
+    python benchmark_inicializacao.py                  # 5 execuções, orçamento padrão
+    python benchmark_inicializacao.py --orcamento-ms 500 --execucoes 10
+
+Cada execução é um processo Python novo rodando com `-X importtime`
+(nada em cache no interpretador). O script mostra a mediana do tempo do
+create_app() e os módulos que mais pesaram, e termina com código 1 se:
+
+  - a mediana passar do orçamento (--orcamento-ms ou SGSV_ORCAMENTO_INICIALIZACAO_MS);
+  - openpyxl, reportlab ou matplotlib forem importados na subida (eles
+    devem carregar só na primeira exportação/importação).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ORCAMENTO_PADRAO_MS = 600
+MODULOS_PESADOS = ('openpyxl', 'reportlab', 'matplotlib')
+
+CODIGO = """
+import time
+inicio = time.perf_counter()
+from app import create_app
+create_app()
+print(round((time.perf_counter() - inicio) * 1000, 1))
+"""
+
+
+def medir():
+    """Roda um create_app() num processo novo. Retorna (ms, {módulo: (próprio_us, acumulado_us)})."""
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CODIGO],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+
+    modulos = {}
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith('import time:'):
+            continue
+        proprio, acumulado, nome = linha[len('import time:'):].split('|')
+        if not proprio.strip().isdigit():
+            continue  # cabeçalho
+        modulos[nome.strip()] = (int(proprio), int(acumulado))
+
+    return float(resultado.stdout.strip().splitlines()[-1]), modulos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--execucoes', type=int, default=5)
+    parser.add_argument('--orcamento-ms', type=float,
+                        default=float(os.environ.get('SGSV_ORCAMENTO_INICIALIZACAO_MS', ORCAMENTO_PADRAO_MS)))
+    parser.add_argument('--top', type=int, default=15, help='Módulos mais lentos exibidos.')
+    args = parser.parse_args()
+
+    tempos = []
+    modulos = {}
+    for _ in range(args.execucoes):
+        ms, modulos = medir()
+        tempos.append(ms)
+
+    mediana = statistics.median(tempos)
+    print(f"create_app() a frio: mediana {mediana:.0f} ms "
+          f"(mín {min(tempos):.0f}, máx {max(tempos):.0f}, {args.execucoes} execuções)")
+
+    print("\nMódulos com maior tempo próprio (última execução):")
+    for nome, (proprio, acumulado) in sorted(modulos.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {proprio / 1000:7.1f} ms  (acumulado {acumulado / 1000:7.1f} ms)  {nome}")
+
+    falhas = []
+    if mediana > args.orcamento_ms:
+        falhas.append(f"mediana {mediana:.0f} ms acima do orçamento de {args.orcamento_ms:.0f} ms")
+
+    carregados = [nome for nome in MODULOS_PESADOS if nome in modulos]
+    if carregados:
+        falhas.append(f"importados na subida: {', '.join(carregados)}")
+
+    if falhas:
+        print("\nFALHOU: " + "; ".join(falhas))
+        return 1
+
+    print(f"\nOK: dentro do orçamento de {args.orcamento_ms:.0f} ms, sem {', '.join(MODULOS_PESADOS)} na subida.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
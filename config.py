@@ -1,10 +1,34 @@
 import os
 
+
+def _url_banco(url):
+    """Aceita o formato 'postgres://' (Heroku/Render) que o SQLAlchemy 2 não reconhece."""
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
 class Config:
     # Gera uma chave secreta aleatória ou usa uma fixa
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'uma-chave-muito-secreta-dev'
-    
-    # Caminho do Banco de Dados
+    SECRET_KEY = os.environ.get('SECRET_KEY') or 'chave-secreta'
+
+    # Caminho do Banco de Dados (DATABASE_URL troca para PostgreSQL sem mexer no código)
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'instance', 'sgsv.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = _url_banco(os.environ.get('DATABASE_URL')) or \
+        'sqlite:///' + os.path.join(BASE_DIR, 'instance', 'sgsv.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Réplica para as rotas somente leitura (sem ela, o SQLite é reaberto com mode=ro)
+    SQLALCHEMY_LEITURA_URI = _url_banco(os.environ.get('DATABASE_REPLICA_URL'))
+
+    # Pool de conexões por processo: uma por thread do worker (gunicorn.conf.py)
+    # mais uma folga para os picos (fila de exportação, CLI)
+    BANCO_POOL_TAMANHO = int(os.environ.get('SGSV_DB_POOL') or os.environ.get('SGSV_THREADS') or 8)
+    BANCO_POOL_EXTRA = int(os.environ.get('SGSV_DB_POOL_EXTRA') or 4)
+    BANCO_POOL_ESPERA = 30      # segundos esperando uma conexão livre
+    BANCO_POOL_RECICLAR = 1800  # servidor (PostgreSQL): renova conexões antigas
+
+    # SQLite: PRAGMAs aplicados em cada conexão nova (app/banco.py)
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SGSV_SQLITE_BUSY_TIMEOUT_MS') or 5000)
+    SQLITE_CACHE_KB = 20000               # cache de páginas por conexão (~20 MB)
+    SQLITE_MMAP_BYTES = 256 * 1024 * 1024  # leitura do arquivo via mmap
@@ -0,0 +1,43 @@
+import os
+
+
+# -------------------------------------------------------------
+# GUNICORN (produção): gunicorn -c gunicorn.conf.py
+# -------------------------------------------------------------
+# Processos x threads: com 4 workers de 8 threads, 32 requisições são
+# atendidas ao mesmo tempo (as 27 UVIS + gestão). Exportações pesadas
+# vão para a fila em segundo plano (app/tarefas.py), então uma
+# exportação ocupa no máximo uma thread, sem travar o worker inteiro.
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('SGSV_BIND', '0.0.0.0:8000')
+
+workers = int(os.environ.get('SGSV_WORKERS', 4))
+worker_class = 'gthread'
+threads = int(os.environ.get('SGSV_THREADS', 8))
+
+# Importa o app (e roda a inicialização do banco) uma vez, no mestre
+preload_app = True
+
+timeout = 120            # exportações síncronas grandes (PDF/XLSX)
+graceful_timeout = 30
+keepalive = 5
+
+# Recicla workers aos poucos (vazamentos de memória de longo prazo);
+# o novo worker é um fork do mestre, com o app já carregado
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """Cada worker abre as próprias conexões (nunca reaproveita as do mestre)."""
+    from app import db
+    from wsgi import app
+
+    # Todos os engines: o principal e o somente leitura ('leitura', app/banco.py)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
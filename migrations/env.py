@@ -11,7 +11,10 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-fileConfig(config.config_file_name)
+# (not when called from app/inicializacao.py with its own connection:
+# the server's loggers, e.g. gunicorn's, must stay as they are)
+if config.attributes.get('connection') is None:
+    fileConfig(config.config_file_name)
 logger = logging.getLogger('alembic.env')
 
 
@@ -51,6 +54,13 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # A tabela FTS5 da busca (e as tabelas-sombra dela) não estão nos models
+    if type_ == "table" and reflected and name.startswith("solicitacoes_busca"):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -93,6 +103,20 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
+
+    # app/inicializacao.py passes the connection that holds the write lock:
+    # the migrations run inside its transaction
+    connection = config.attributes.get('connection')
+    if connection is not None:
+        context.configure(
+            connection=connection,
+            target_metadata=get_metadata(),
+            **conf_args
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        return
 
     connectable = get_engine()
 
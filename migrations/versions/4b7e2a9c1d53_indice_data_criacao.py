@@ -0,0 +1,30 @@
+"""Indice composto em data_criacao para relatorios mensais
+
+Revision ID: 4b7e2a9c1d53
+Revises: cd09f940837b
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2a9c1d53'
+down_revision = 'cd09f940837b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_solicitacoes_data_usuario_status',
+            ['data_criacao', 'usuario_id', 'status'],
+            unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        batch_op.drop_index('ix_solicitacoes_data_usuario_status')
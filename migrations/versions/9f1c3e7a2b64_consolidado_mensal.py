@@ -0,0 +1,40 @@
+"""Tabela solicitacoes_mensal (consolidado para historico mensal)
+
+Revision ID: 9f1c3e7a2b64
+Revises: 4b7e2a9c1d53
+Create Date: 2026-10-18 10:03:47.218530
+
+Depois do upgrade, popule a tabela com `flask reconstruir-mensal`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f1c3e7a2b64'
+down_revision = '4b7e2a9c1d53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'solicitacoes_mensal',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('mes', sa.String(length=7), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('foco', sa.String(length=50), nullable=False),
+        sa.Column('tipo_visita', sa.String(length=50), nullable=False),
+        sa.Column('altura_voo', sa.String(length=20), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('mes', 'usuario_id', 'status', 'foco', 'tipo_visita', 'altura_voo',
+                            name='uq_solicitacoes_mensal_chave')
+    )
+
+
+def downgrade():
+    op.drop_table('solicitacoes_mensal')
@@ -0,0 +1,32 @@
+"""Tabela geocodificacoes (cache de endereco -> coordenadas)
+
+Revision ID: a4f9c2e8d6b3
+Revises: d9e3b7c5a2f1
+Create Date: 2026-10-18 16:52:37.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f9c2e8d6b3'
+down_revision = 'd9e3b7c5a2f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'geocodificacoes',
+        sa.Column('chave', sa.String(length=255), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=True),
+        sa.Column('longitude', sa.Float(), nullable=True),
+        sa.Column('precisao', sa.String(length=20), nullable=True),
+        sa.Column('data_criacao', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('chave')
+    )
+
+
+def downgrade():
+    op.drop_table('geocodificacoes')
@@ -0,0 +1,38 @@
+"""Indices compostos para painel, painel de gestao e agenda
+
+Revision ID: a8d4e2f6b1c7
+Revises: f7b1d3a5c9e2
+Create Date: 2026-10-18 14:37:05.662913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4e2f6b1c7'
+down_revision = 'f7b1d3a5c9e2'
+branch_labels = None
+depends_on = None
+
+
+INDICES = [
+    ('ix_solicitacoes_usuario_criacao', ['usuario_id', 'data_criacao']),
+    ('ix_solicitacoes_usuario_status_criacao', ['usuario_id', 'status', 'data_criacao']),
+    ('ix_solicitacoes_criacao', ['data_criacao']),
+    ('ix_solicitacoes_status_criacao', ['status', 'data_criacao']),
+    ('ix_solicitacoes_agendamento', ['data_agendamento', 'hora_agendamento']),
+    ('ix_solicitacoes_usuario_agendamento', ['usuario_id', 'data_agendamento', 'hora_agendamento']),
+]
+
+
+def upgrade():
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        for nome, colunas in INDICES:
+            batch_op.create_index(nome, colunas, unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        for nome, _ in reversed(INDICES):
+            batch_op.drop_index(nome)
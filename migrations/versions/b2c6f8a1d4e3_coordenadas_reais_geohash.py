@@ -0,0 +1,121 @@
+"""latitude/longitude como REAL + coluna geohash indexada
+
+Revision ID: b2c6f8a1d4e3
+Revises: a8d4e2f6b1c7
+Create Date: 2026-10-18 15:10:42.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.geo import ler_latitude, ler_longitude, geohash
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2c6f8a1d4e3'
+down_revision = 'a8d4e2f6b1c7'
+branch_labels = None
+depends_on = None
+
+
+# A troca de tipo recria a tabela no SQLite. Os triggers da busca textual
+# (f7b1d3a5c9e2) citam solicitacoes e impedem o RENAME da cópia, então
+# saem antes do batch e são recriados no fim.
+COLUNAS_BUSCA = 'nome_uvis, regiao, logradouro, bairro, cep, protocolo, observacao'
+
+VALORES_NOVOS = """
+    new.id,
+    (SELECT nome_uvis FROM usuarios WHERE id = new.usuario_id),
+    (SELECT regiao FROM usuarios WHERE id = new.usuario_id),
+    new.logradouro, new.bairro, new.cep, new.protocolo, new.observacao
+"""
+
+TRIGGERS_BUSCA = [
+    f"""CREATE TRIGGER IF NOT EXISTS solicitacoes_busca_ai AFTER INSERT ON solicitacoes BEGIN
+        INSERT INTO solicitacoes_busca(rowid, {COLUNAS_BUSCA}) VALUES ({VALORES_NOVOS});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS solicitacoes_busca_au
+        AFTER UPDATE OF usuario_id, logradouro, bairro, cep, protocolo, observacao ON solicitacoes BEGIN
+        DELETE FROM solicitacoes_busca WHERE rowid = old.id;
+        INSERT INTO solicitacoes_busca(rowid, {COLUNAS_BUSCA}) VALUES ({VALORES_NOVOS});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS solicitacoes_busca_ad AFTER DELETE ON solicitacoes BEGIN
+        DELETE FROM solicitacoes_busca WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS usuarios_busca_au AFTER UPDATE OF nome_uvis, regiao ON usuarios BEGIN
+        UPDATE solicitacoes_busca SET nome_uvis = new.nome_uvis, regiao = new.regiao
+        WHERE rowid IN (SELECT id FROM solicitacoes WHERE usuario_id = new.id);
+    END""",
+]
+NOMES_TRIGGERS = ('solicitacoes_busca_ai', 'solicitacoes_busca_au', 'solicitacoes_busca_ad', 'usuarios_busca_au')
+
+
+def _busca_existe(conexao):
+    if conexao.dialect.name != 'sqlite':
+        return False
+    return conexao.execute(sa.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'solicitacoes_busca'"
+    )).scalar() is not None
+
+
+def _remover_triggers_busca():
+    for nome in NOMES_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {nome}")
+
+
+def _recriar_triggers_busca():
+    for ddl in TRIGGERS_BUSCA:
+        op.execute(ddl)
+
+
+def upgrade():
+    conexao = op.get_bind()
+
+    # 1. Lê os textos antes da troca de tipo (o CAST do SQLite não entende "-23,55")
+    antigos = conexao.execute(sa.text(
+        "SELECT id, latitude, longitude FROM solicitacoes "
+        "WHERE latitude IS NOT NULL OR longitude IS NOT NULL"
+    )).fetchall()
+
+    busca = _busca_existe(conexao)
+    if busca:
+        _remover_triggers_busca()
+
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        batch_op.alter_column('latitude', existing_type=sa.String(length=50), type_=sa.Float(), existing_nullable=True)
+        batch_op.alter_column('longitude', existing_type=sa.String(length=50), type_=sa.Float(), existing_nullable=True)
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index('ix_solicitacoes_geohash', ['geohash'], unique=False)
+
+    # 2. Backfill: coordenadas válidas viram REAL + geohash; o resto vira NULL
+    valores = []
+    for pedido_id, latitude, longitude in antigos:
+        lat, lon = ler_latitude(latitude), ler_longitude(longitude)
+        if lat is None or lon is None:
+            valores.append({'id': pedido_id, 'lat': None, 'lon': None, 'geohash': None})
+        else:
+            valores.append({'id': pedido_id, 'lat': lat, 'lon': lon, 'geohash': geohash(lat, lon)})
+
+    if valores:
+        conexao.execute(
+            sa.text("UPDATE solicitacoes SET latitude = :lat, longitude = :lon, geohash = :geohash WHERE id = :id"),
+            valores
+        )
+
+    if busca:
+        _recriar_triggers_busca()
+
+
+def downgrade():
+    busca = _busca_existe(op.get_bind())
+    if busca:
+        _remover_triggers_busca()
+
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        batch_op.drop_index('ix_solicitacoes_geohash')
+        batch_op.drop_column('geohash')
+        batch_op.alter_column('longitude', existing_type=sa.Float(), type_=sa.String(length=50), existing_nullable=True)
+        batch_op.alter_column('latitude', existing_type=sa.Float(), type_=sa.String(length=50), existing_nullable=True)
+
+    if busca:
+        _recriar_triggers_busca()
@@ -0,0 +1,26 @@
+"""Indice (status, geohash) para o mapa filtrado por status
+
+Revision ID: b7f3c9e5d2a8
+Revises: e6b2d8f4a1c9
+Create Date: 2026-10-18 18:47:12.904381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7f3c9e5d2a8'
+down_revision = 'e6b2d8f4a1c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        batch_op.create_index('ix_solicitacoes_status_geohash', ['status', 'geohash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        batch_op.drop_index('ix_solicitacoes_status_geohash')
@@ -0,0 +1,26 @@
+"""Coluna data_inicio em tarefas_exportacao (prazo conta do inicio da execucao)
+
+Revision ID: c1e8a5f3b9d6
+Revises: b7f3c9e5d2a8
+Create Date: 2026-10-18 21:14:37.218604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1e8a5f3b9d6'
+down_revision = 'b7f3c9e5d2a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tarefas_exportacao', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_inicio', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('tarefas_exportacao', schema=None) as batch_op:
+        batch_op.drop_column('data_inicio')
@@ -0,0 +1,38 @@
+"""Tabela tarefas_exportacao (fila de exportacoes em segundo plano)
+
+Revision ID: c5d82f4a7e19
+Revises: 9f1c3e7a2b64
+Create Date: 2026-10-18 11:26:05.774391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d82f4a7e19'
+down_revision = '9f1c3e7a2b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tarefas_exportacao',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('tipo', sa.String(length=30), nullable=False),
+        sa.Column('parametros', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('caminho_arquivo', sa.String(length=255), nullable=True),
+        sa.Column('nome_arquivo', sa.String(length=150), nullable=True),
+        sa.Column('erro', sa.Text(), nullable=True),
+        sa.Column('data_criacao', sa.DateTime(), nullable=True),
+        sa.Column('data_conclusao', sa.DateTime(), nullable=True),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('tarefas_exportacao')
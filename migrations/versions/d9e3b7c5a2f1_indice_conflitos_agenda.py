@@ -0,0 +1,30 @@
+"""Indice (data_agendamento, geohash) para deteccao de conflitos de voo
+
+Revision ID: d9e3b7c5a2f1
+Revises: b2c6f8a1d4e3
+Create Date: 2026-10-18 15:48:13.270561
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9e3b7c5a2f1'
+down_revision = 'b2c6f8a1d4e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_solicitacoes_agendamento_geohash',
+            ['data_agendamento', 'geohash'],
+            unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        batch_op.drop_index('ix_solicitacoes_agendamento_geohash')
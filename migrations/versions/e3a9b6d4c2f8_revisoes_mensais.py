@@ -0,0 +1,29 @@
+"""Tabela revisoes_mensais (versao dos dados por mes para o cache)
+
+Revision ID: e3a9b6d4c2f8
+Revises: c5d82f4a7e19
+Create Date: 2026-10-18 13:41:19.503826
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a9b6d4c2f8'
+down_revision = 'c5d82f4a7e19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'revisoes_mensais',
+        sa.Column('mes', sa.String(length=7), nullable=False),
+        sa.Column('revisao', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('mes')
+    )
+
+
+def downgrade():
+    op.drop_table('revisoes_mensais')
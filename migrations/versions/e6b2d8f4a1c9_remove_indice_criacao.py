@@ -0,0 +1,28 @@
+"""Remove ix_solicitacoes_criacao (coberto por ix_solicitacoes_data_usuario_status)
+
+Revision ID: e6b2d8f4a1c9
+Revises: a4f9c2e8d6b3
+Create Date: 2026-10-18 18:21:44.530716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b2d8f4a1c9'
+down_revision = 'a4f9c2e8d6b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # data_criacao já é a primeira coluna de ix_solicitacoes_data_usuario_status,
+    # que atende a ordenação do painel de gestão; o índice só custava escrita
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        batch_op.drop_index('ix_solicitacoes_criacao')
+
+
+def downgrade():
+    with op.batch_alter_table('solicitacoes', schema=None) as batch_op:
+        batch_op.create_index('ix_solicitacoes_criacao', ['data_criacao'], unique=False)
@@ -0,0 +1,75 @@
+"""Indice de busca textual solicitacoes_busca (SQLite FTS5 trigram + triggers)
+
+Revision ID: f7b1d3a5c9e2
+Revises: e3a9b6d4c2f8
+Create Date: 2026-10-18 14:02:47.118350
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b1d3a5c9e2'
+down_revision = 'e3a9b6d4c2f8'
+branch_labels = None
+depends_on = None
+
+
+COLUNAS = 'nome_uvis, regiao, logradouro, bairro, cep, protocolo, observacao'
+
+VALORES_NOVOS = """
+    new.id,
+    (SELECT nome_uvis FROM usuarios WHERE id = new.usuario_id),
+    (SELECT regiao FROM usuarios WHERE id = new.usuario_id),
+    new.logradouro, new.bairro, new.cep, new.protocolo, new.observacao
+"""
+
+
+def upgrade():
+    # Tabela virtual só existe no SQLite; nos outros bancos a busca usa ILIKE
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(f"CREATE VIRTUAL TABLE solicitacoes_busca USING fts5({COLUNAS}, tokenize='trigram')")
+
+    op.execute(f"""
+        CREATE TRIGGER solicitacoes_busca_ai AFTER INSERT ON solicitacoes BEGIN
+            INSERT INTO solicitacoes_busca(rowid, {COLUNAS}) VALUES ({VALORES_NOVOS});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER solicitacoes_busca_au
+        AFTER UPDATE OF usuario_id, logradouro, bairro, cep, protocolo, observacao ON solicitacoes BEGIN
+            DELETE FROM solicitacoes_busca WHERE rowid = old.id;
+            INSERT INTO solicitacoes_busca(rowid, {COLUNAS}) VALUES ({VALORES_NOVOS});
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER solicitacoes_busca_ad AFTER DELETE ON solicitacoes BEGIN
+            DELETE FROM solicitacoes_busca WHERE rowid = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER usuarios_busca_au AFTER UPDATE OF nome_uvis, regiao ON usuarios BEGIN
+            UPDATE solicitacoes_busca SET nome_uvis = new.nome_uvis, regiao = new.regiao
+            WHERE rowid IN (SELECT id FROM solicitacoes WHERE usuario_id = new.id);
+        END
+    """)
+
+    # Popula com o que já existe
+    op.execute(f"""
+        INSERT INTO solicitacoes_busca(rowid, {COLUNAS})
+        SELECT s.id, u.nome_uvis, u.regiao, s.logradouro, s.bairro, s.cep, s.protocolo, s.observacao
+        FROM solicitacoes s LEFT JOIN usuarios u ON u.id = s.usuario_id
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS usuarios_busca_au")
+    op.execute("DROP TRIGGER IF EXISTS solicitacoes_busca_ad")
+    op.execute("DROP TRIGGER IF EXISTS solicitacoes_busca_au")
+    op.execute("DROP TRIGGER IF EXISTS solicitacoes_busca_ai")
+    op.execute("DROP TABLE IF EXISTS solicitacoes_busca")
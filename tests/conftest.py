@@ -0,0 +1,52 @@
+import os
+import sys
+from datetime import date, datetime, time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App com um banco SQLite novo em tmp_path, inicializado como na subida."""
+    from app import create_app, db
+    from app.inicializacao import inicializar_banco
+    from app.models import Solicitacao, Usuario
+
+    class ConfigTeste(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'sgsv.db')
+        SQLALCHEMY_LEITURA_URI = None
+
+    app = create_app(ConfigTeste)
+    app.instance_path = str(tmp_path)  # exportações, cache de relatórios e bases locais
+    assert inicializar_banco(app, avisar=lambda *args: None)
+
+    with app.app_context():
+        uvis = Usuario.query.filter_by(login='lapa').one()
+        for i in range(30):
+            db.session.add(Solicitacao(
+                data_agendamento=date(2026, 10, 1 + i % 28), hora_agendamento=time(9, 0),
+                foco=('Escorpião', 'Pombo', 'Mosquito')[i % 3], tipo_visita='Monitoramento',
+                altura_voo='10m', cep='01001-000', logradouro='Praça da Sé', bairro='Sé',
+                cidade='São Paulo', uf='SP', status=('EM ANÁLISE', 'APROVADO', 'NEGADO')[i % 3],
+                data_criacao=datetime(2026, 10, 1 + i % 28, 8, 0), usuario_id=uvis.id
+            ))
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.engine.dispose()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def cliente_admin(app):
+    cliente = app.test_client()
+    cliente.post('/login', data={'login': 'admin', 'senha': 'admin123'})
+    return cliente
@@ -0,0 +1,34 @@
+from app.models import Solicitacao
+
+
+def test_valores_invalidos_viram_erro_do_item(app, cliente_admin):
+    with app.app_context():
+        ids = [s.id for s in Solicitacao.query.order_by(Solicitacao.id).limit(6)]
+
+    itens = [
+        {'id': ids[0], 'status': 'APROVADO', 'protocolo': 'BR-1', 'justificativa': None},
+        {'id': ids[1], 'protocolo': {'numero': 1}},
+        {'id': ids[2], 'justificativa': ['a', 'b']},
+        {'id': ids[3], 'protocolo': 123},
+        {'id': ids[4], 'protocolo': 'x' * 51},
+        {'id': ids[5], 'status': ['APROVADO']},
+        'lixo',
+    ]
+    resposta = cliente_admin.post('/admin/atualizar_lote', json={'itens': itens})
+
+    assert resposta.status_code == 200
+    assert resposta.json['atualizados'] == 1
+    assert resposta.json['resultados'] == [
+        {'id': ids[0], 'ok': True, 'status': 'APROVADO'},
+        {'id': ids[1], 'ok': False, 'erro': 'protocolo deve ser texto'},
+        {'id': ids[2], 'ok': False, 'erro': 'justificativa deve ser texto'},
+        {'id': ids[3], 'ok': False, 'erro': 'protocolo deve ser texto'},
+        {'id': ids[4], 'ok': False, 'erro': 'protocolo: máximo de 50 caracteres'},
+        {'id': ids[5], 'ok': False, 'erro': "status inválido: ['APROVADO']"},
+        {'item': 6, 'ok': False, 'erro': 'item deve ser um objeto'},
+    ]
+
+    with app.app_context():
+        pedidos = {s.id: s for s in Solicitacao.query.filter(Solicitacao.id.in_(ids))}
+        assert (pedidos[ids[0]].status, pedidos[ids[0]].protocolo) == ('APROVADO', 'BR-1')
+        assert all(pedidos[i].protocolo is None for i in ids[1:])
@@ -0,0 +1,59 @@
+from datetime import date, datetime, time
+
+from app import db
+from app.busca import busca_disponivel
+from app.models import Solicitacao, Usuario
+from app.routes import consulta_painel_gestao
+
+
+def _ids(busca=None, unidade=None, regiao=None):
+    return {s.id for s in consulta_painel_gestao(busca=busca, unidade=unidade, regiao=regiao)}
+
+
+def test_busca_acompanha_insert_update_e_delete(app):
+    with app.app_context():
+        assert busca_disponivel()
+
+        uvis = Usuario.query.filter_by(login='teste').one()
+        pedido = Solicitacao(
+            data_agendamento=date(2026, 10, 9), hora_agendamento=time(14, 0),
+            foco='Pombo', tipo_visita='Monitoramento', altura_voo='10m', cep='05422-010',
+            logradouro='Rua Fradique Coutinho', bairro='Pinheiros', cidade='São Paulo', uf='SP',
+            protocolo='PRT-7731', observacao='Telhado com acesso pela lateral',
+            status='EM ANÁLISE', data_criacao=datetime(2026, 10, 9, 8, 0), usuario_id=uvis.id
+        )
+        db.session.add(pedido)
+        db.session.commit()
+        pedido_id = pedido.id
+
+        # Insert: qualquer trecho de 3+ letras de qualquer campo, sem
+        # diferenciar maiúsculas; várias palavras precisam aparecer todas
+        assert _ids('fradique') == {pedido_id}
+        assert _ids('PRT-7731') == {pedido_id}
+        assert _ids('lateral pinheiros') == {pedido_id}
+        assert _ids('lateral inexistente') == set()
+        assert pedido_id in _ids(unidade='Teste QA', regiao='sul')
+        assert pedido_id not in _ids(regiao='OESTE')
+
+        # Termos de 1-2 letras não usam o trigram, mas continuam filtrando
+        assert _ids('fradique 77') == {pedido_id}
+        assert _ids('fradique zz') == set()
+        assert pedido_id in _ids('77')
+
+        # Update: o texto antigo sai do índice e o novo entra
+        pedido.logradouro = 'Avenida Rebouças'
+        db.session.commit()
+        assert _ids('fradique') == set()
+        assert _ids('rebouças') == {pedido_id}
+
+        # Renomear a UVIS atualiza as linhas dos pedidos dela
+        uvis.nome_uvis = 'UVIS Butantã'
+        db.session.commit()
+        assert pedido_id in _ids(unidade='butantã')
+        assert pedido_id not in _ids(unidade='Teste QA')
+
+        # Delete: some da busca
+        db.session.delete(pedido)
+        db.session.commit()
+        assert _ids('rebouças') == set()
+        assert _ids('PRT-7731') == set()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import pytest
+
+from app import graficos
+
+
+EXPORTACOES = 5
+
+
+@pytest.fixture(autouse=True)
+def _encerrar_pool_graficos():
+    yield
+    if graficos._executor is not None:
+        graficos._executor.shutdown()
+        graficos._executor = None
+
+
+@pytest.mark.parametrize('rota, assinatura', [
+    ('/admin/exportar_relatorio_pdf?ano=2026&mes=10', b'%PDF'),
+    ('/admin/exportar_relatorio_excel?ano=2026&mes=10', b'PK\x03\x04'),
+])
+def test_relatorio_sem_cache_nao_deixa_temporarios(app, cliente_admin, rota, assinatura):
+    # Cache desligado e limite de memória baixo: cada exportação passa pelo
+    # arquivo temporário em disco, que precisa sumir quando a resposta fecha
+    app.config['RELATORIOS_CACHE_MAX_BYTES'] = 0
+    app.config['RELATORIO_MEMORIA_MAX_BYTES'] = 1024
+
+    antes = set(os.listdir(tempfile.gettempdir()))
+
+    for _ in range(EXPORTACOES):
+        resposta = cliente_admin.get(rota)
+        conteudo = resposta.get_data()
+        resposta.close()
+
+        assert resposta.status_code == 200
+        assert conteudo.startswith(assinatura)
+        assert len(conteudo) > 1024
+
+    assert set(os.listdir(tempfile.gettempdir())) - antes == set()
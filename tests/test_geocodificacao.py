@@ -0,0 +1,53 @@
+import os
+import time
+
+from app import db
+from app.geocodificacao import geocodificar, preencher_pendentes
+from app.models import Geocodificacao, Solicitacao
+
+CABECALHO = 'cep,logradouro,numero,latitude,longitude\n'
+
+
+def _gravar_gazetteer(caminho, linhas):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(CABECALHO + ''.join(linha + '\n' for linha in linhas))
+    # mtime claramente depois dos registros já gravados no cache
+    momento = time.time() + 2
+    os.utime(caminho, (momento, momento))
+
+
+def test_nao_encontrado_vence_quando_o_gazetteer_muda(app, tmp_path):
+    caminho = str(tmp_path / 'gazetteer.csv')
+    app.config['GAZETTEER_ARQUIVO'] = caminho
+
+    with app.app_context():
+        _gravar_gazetteer(caminho, ['01001000,Praça da Sé,1,-23.5503,-46.6340'])
+        assert geocodificar('05422-010', 'R. Fradique Coutinho', '50') is None
+        db.session.commit()
+        assert Geocodificacao.query.filter(Geocodificacao.latitude.is_(None)).count() == 1
+
+        # Mesmo gazetteer: o "não encontrado" continua valendo (nem relê o arquivo)
+        os.remove(caminho)
+        _gravar_gazetteer(caminho, ['05422010,Rua Fradique Coutinho,,-23.5610,-46.6880'])
+        os.utime(caminho, (0, 0))
+        assert geocodificar('05422-010', 'R. Fradique Coutinho', '50') is None
+
+        # Gazetteer alterado depois do registro: procura de novo e atualiza o cache
+        _gravar_gazetteer(caminho, ['05422010,Rua Fradique Coutinho,,-23.5610,-46.6880'])
+        assert geocodificar('05422-010', 'R. Fradique Coutinho', '50') == (-23.5610, -46.6880)
+        db.session.commit()
+        registro = db.session.get(Geocodificacao, '05422010|rua fradique coutinho|50')
+        assert (registro.latitude, registro.precisao) == (-23.5610, 'logradouro')
+
+
+def test_preenchimento_em_lote_revisa_nao_encontrados_vencidos(app, tmp_path):
+    caminho = str(tmp_path / 'gazetteer.csv')
+    app.config['GAZETTEER_ARQUIVO'] = caminho
+
+    with app.app_context():
+        _gravar_gazetteer(caminho, ['05422010,Rua Fradique Coutinho,,-23.5610,-46.6880'])
+        assert preencher_pendentes() == (30, 0)  # pedidos do conftest: Praça da Sé
+
+        _gravar_gazetteer(caminho, ['01001000,Praça da Sé,,-23.5503,-46.6340'])
+        assert preencher_pendentes() == (30, 30)
+        assert Solicitacao.query.filter(Solicitacao.latitude.is_(None)).count() == 0
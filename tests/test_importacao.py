@@ -0,0 +1,69 @@
+import io
+
+import pytest
+
+from app.importacao import ler_linhas, importar
+from app.mensal import reconstruir_mensal
+from app.models import Solicitacao, SolicitacaoMensal, Usuario
+
+
+CABECALHO = ['Data', 'Hora', 'Foco', 'Tipo Visita', 'Altura', 'Criadouro', 'Apoio CET',
+             'CEP', 'Logradouro', 'Nº', 'Bairro', 'Cidade', 'UF', 'Latitude', 'Longitude']
+LINHAS = [
+    ['05/11/2026', '09:30', 'Terreno Baldio', 'aedes', '20m', 'sim', 'não',
+     '01001-000', 'Rua Importada Boa', '100', 'Sé', 'São Paulo', 'sp', '-23.550520', '-46.633308'],
+    ['31/02/2026', '25:00', 'Pombo', 'aedes', '20m', 'talvez', 'não',
+     '01001-000', 'Rua Importada Ruim', '7', 'Sé', 'São Paulo', '', '-123', '-46.6'],
+]
+
+
+def _csv():
+    texto = '\n'.join(';'.join(linha) for linha in [CABECALHO] + LINHAS)
+    return io.BytesIO(texto.encode('utf-8-sig'))
+
+
+def _xlsx():
+    from openpyxl import Workbook
+
+    livro = Workbook()
+    for linha in [CABECALHO] + LINHAS:
+        livro.active.append(linha)
+    arquivo = io.BytesIO()
+    livro.save(arquivo)
+    arquivo.seek(0)
+    return arquivo
+
+
+def _consolidado():
+    return sorted(
+        (m.mes, m.usuario_id, m.status, m.foco, m.tipo_visita, m.altura_voo, m.total)
+        for m in SolicitacaoMensal.query
+    )
+
+
+@pytest.mark.parametrize('nome, montar', [('pedidos.csv', _csv), ('pedidos.xlsx', _xlsx)])
+def test_importa_so_as_linhas_validas(app, nome, montar):
+    with app.app_context():
+        reconstruir_mensal()  # conftest grava os pedidos sem passar pelo consolidado
+        uvis = Usuario.query.filter_by(login='teste').one()
+        antes = Solicitacao.query.count()
+
+        relatorio = importar(ler_linhas(montar(), nome), uvis.id)
+
+        assert relatorio['total'] == 2
+        assert relatorio['importadas'] == 1
+        assert relatorio['faltando'] == []
+        assert [erro['linha'] for erro in relatorio['erros']] == [3]
+        campos = {mensagem.split(':')[0] for mensagem in relatorio['erros'][0]['erros']}
+        assert campos == {'uf', 'data_agendamento', 'hora_agendamento', 'criadouro', 'latitude/longitude'}
+
+        assert Solicitacao.query.count() == antes + 1
+        importado = Solicitacao.query.filter_by(logradouro='Rua Importada Boa').one()
+        assert (importado.usuario_id, importado.status, importado.uf) == (uvis.id, 'PENDENTE', 'SP')
+        assert importado.geohash is not None
+        assert Solicitacao.query.filter_by(logradouro='Rua Importada Ruim').count() == 0
+
+        # O consolidado ajustado pela importação é o mesmo de uma reconstrução completa
+        incremental = _consolidado()
+        reconstruir_mensal()
+        assert incremental == _consolidado()
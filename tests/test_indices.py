@@ -0,0 +1,12 @@
+import pytest
+
+from app.indices import CONSULTAS, plano_consulta, problemas_plano
+
+
+@pytest.mark.parametrize('nome', list(CONSULTAS))
+def test_consultas_das_rotas_usam_indice(app, nome):
+    # Mesmas consultas de `flask verificar-indices`: um índice removido (ou
+    # uma consulta que deixou de usá-lo) aparece aqui como varredura completa
+    with app.app_context():
+        plano = plano_consulta(CONSULTAS[nome]())
+        assert problemas_plano(nome, plano) == [], plano
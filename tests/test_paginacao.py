@@ -0,0 +1,71 @@
+from datetime import date, datetime, time
+
+from werkzeug.datastructures import MultiDict
+
+from app import db
+from app.models import Solicitacao, Usuario
+from app.paginacao import paginar_keyset
+from app.routes import consulta_painel_gestao
+
+
+POR_PAGINA = 6
+EMPATADOS = 13
+
+
+def _empatar(app):
+    # Mais pedidos com a mesma data_criacao: o desempate tem de vir do id
+    with app.app_context():
+        uvis = Usuario.query.filter_by(login='lapa').one()
+        for _ in range(EMPATADOS):
+            db.session.add(Solicitacao(
+                data_agendamento=date(2026, 10, 5), hora_agendamento=time(9, 0),
+                foco='Pombo', tipo_visita='Monitoramento', altura_voo='10m', cep='01001-000',
+                logradouro='Praça da Sé', bairro='Sé', cidade='São Paulo', uf='SP',
+                status='EM ANÁLISE', data_criacao=datetime(2026, 10, 5, 8, 0), usuario_id=uvis.id
+            ))
+        db.session.commit()
+        return [s.id for s in Solicitacao.query.order_by(
+            Solicitacao.data_criacao.desc(), Solicitacao.id.desc())]
+
+
+def _pagina(args):
+    return paginar_keyset(consulta_painel_gestao(), POR_PAGINA, MultiDict(args), ('teste',))
+
+
+def test_avanca_e_volta_sem_repetir_nem_pular(app):
+    esperado = _empatar(app)
+
+    with app.test_request_context():
+        # Avançando pelo cursor 'apos' até a última página
+        paginas = [_pagina({})]
+        while paginas[-1].has_next:
+            atual = paginas[-1]
+            paginas.append(_pagina({'apos': atual.cursor_proximo, 'pagina': atual.pagina + 1}))
+
+        ids = [s.id for p in paginas for s in p.items]
+        assert ids == esperado
+        assert [p.pagina for p in paginas] == list(range(1, len(paginas) + 1))
+        assert all(p.total == len(esperado) for p in paginas)
+        assert not paginas[0].has_prev
+
+        # Voltando pelo cursor 'antes' até a primeira: as mesmas páginas
+        volta = [paginas[-1]]
+        while volta[-1].has_prev:
+            atual = volta[-1]
+            volta.append(_pagina({'antes': atual.cursor_anterior, 'pagina': atual.pagina - 1}))
+
+        volta.reverse()
+        assert [[s.id for s in p.items] for p in volta] == [[s.id for s in p.items] for p in paginas]
+        assert [p.pagina for p in volta] == [p.pagina for p in paginas]
+
+
+def test_cursor_adulterado_volta_para_a_primeira_pagina(app):
+    with app.test_request_context():
+        primeira = _pagina({})
+        segunda = _pagina({'apos': primeira.cursor_proximo, 'pagina': 2})
+
+        for token in (segunda.cursor_proximo + 'x', 'lixo', segunda.cursor_proximo[::-1]):
+            for parametro in ('apos', 'antes'):
+                pagina = _pagina({parametro: token, 'pagina': 3})
+                assert pagina.pagina == 1
+                assert [s.id for s in pagina.items] == [s.id for s in primeira.items]
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app import graficos
+from app.tarefas import ler_parametros
+
+
+@pytest.fixture(autouse=True)
+def _encerrar_pool_graficos():
+    yield
+    if graficos._executor is not None:
+        graficos._executor.shutdown()
+        graficos._executor = None
+
+
+@pytest.mark.parametrize('rota', [
+    '/relatorios', '/admin/exportar_relatorio_pdf', '/admin/exportar_relatorio_excel',
+])
+@pytest.mark.parametrize('consulta', ['ano=2026&mes=13', 'ano=2026&mes=0', 'ano=0&mes=5', 'ano=2026&mes=x'])
+def test_mes_invalido_cai_no_mes_atual(cliente_admin, rota, consulta):
+    resposta = cliente_admin.get(f'{rota}?{consulta}')
+    resposta.close()
+    assert resposta.status_code == 200
+
+
+def test_fila_nao_aceita_mes_invalido():
+    agora = datetime.now()
+    parametros = ler_parametros('relatorio_excel', MultiDict({'ano': '2026', 'mes': '13'}))
+    assert (parametros['ano'], parametros['mes']) == (agora.year, agora.month)
+
+    parametros = ler_parametros('relatorio_excel', MultiDict({'ano': '2026', 'mes': '3'}))
+    assert (parametros['ano'], parametros['mes']) == (2026, 3)
@@ -0,0 +1,97 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import db, tarefas
+from app.models import TarefaExportacao, Usuario
+from app.tarefas import TIPOS_EXPORTACAO, enfileirar, executar_tarefa, expirar_travadas
+
+
+@pytest.fixture(autouse=True)
+def _encerrar_pool():
+    yield
+    if tarefas._executor is not None:
+        tarefas._executor.shutdown()
+        tarefas._executor = None
+    tarefas._app_processo = None
+    tarefas._config_processo = None
+
+
+def _tarefa(status, criada_ha, iniciada_ha=None, tipo='relatorio_excel'):
+    agora = datetime.utcnow()
+    tarefa = TarefaExportacao(
+        id=os.urandom(16).hex(), tipo=tipo, parametros='{}', status=status,
+        data_criacao=agora - timedelta(minutes=criada_ha),
+        data_inicio=None if iniciada_ha is None else agora - timedelta(minutes=iniciada_ha),
+        usuario_id=Usuario.query.filter_by(login='admin').one().id
+    )
+    db.session.add(tarefa)
+    db.session.commit()
+    return tarefa.id
+
+
+def _status(tarefa_id):
+    db.session.expire_all()
+    return db.session.get(TarefaExportacao, tarefa_id).status
+
+
+def test_pool_usa_a_configuracao_do_app(app):
+    # O processo filho (spawn) precisa abrir o banco do teste, não o de config.Config
+    with app.app_context():
+        tarefa_id = enfileirar('relatorio_excel', {'ano': 2026, 'mes': 10, 'uvis_id': None},
+                               Usuario.query.filter_by(login='admin').one().id).id
+
+        limite = time.monotonic() + 60
+        while _status(tarefa_id) in tarefas.STATUS_EM_ANDAMENTO and time.monotonic() < limite:
+            time.sleep(0.2)
+
+        tarefa = db.session.get(TarefaExportacao, tarefa_id)
+        assert tarefa.status == 'CONCLUIDO', tarefa.erro
+        assert tarefa.data_inicio is not None
+        assert tarefa.caminho_arquivo.startswith(app.instance_path)
+        assert os.path.exists(tarefa.caminho_arquivo)
+
+
+def test_prazo_conta_do_inicio_e_fila_tem_prazo_proprio(app):
+    with app.app_context():
+        na_fila = _tarefa('PENDENTE', criada_ha=60)
+        perdida_na_fila = _tarefa('PENDENTE', criada_ha=121)
+        acabou_de_comecar = _tarefa('PROCESSANDO', criada_ha=90, iniciada_ha=1)
+        travada = _tarefa('PROCESSANDO', criada_ha=40, iniciada_ha=31)
+
+        assert expirar_travadas() == 2
+        db.session.commit()
+
+        assert _status(na_fila) == 'PENDENTE'
+        assert _status(acabou_de_comecar) == 'PROCESSANDO'
+        assert _status(perdida_na_fila) == 'ERRO'
+        assert _status(travada) == 'ERRO'
+
+
+def test_tarefa_expirada_nao_volta(app, monkeypatch):
+    with app.app_context():
+        tarefas._iniciar_processo(tarefas._config_do_app(app), app.instance_path)
+
+        # Expirada antes de sair da fila: o processo não a executa
+        expirada = _tarefa('ERRO', criada_ha=0)
+        executar_tarefa(expirada)
+        assert _status(expirada) == 'ERRO'
+
+        # Expirada enquanto gerava o arquivo: não vira CONCLUIDO e o arquivo sai
+        def gerar_e_expirar(destino, **parametros):
+            with open(destino, 'wb') as saida:
+                saida.write(b'x')
+            db.session.execute(update(TarefaExportacao).values(status='ERRO'))
+            db.session.commit()
+
+        monkeypatch.setitem(TIPOS_EXPORTACAO['planilha_solicitacoes'], 'gerar', gerar_e_expirar)
+        tarefa_id = _tarefa('PENDENTE', criada_ha=0, tipo='planilha_solicitacoes')
+        executar_tarefa(tarefa_id)
+
+        tarefa = db.session.get(TarefaExportacao, tarefa_id)
+        assert _status(tarefa_id) == 'ERRO'
+        assert tarefa.caminho_arquivo is None
+        assert not os.path.exists(os.path.join(app.instance_path, 'exportacoes', f'{tarefa_id}.xlsx'))
@@ -0,0 +1,39 @@
+"""
+Ponto de entrada WSGI (produção).
+
+    gunicorn -c gunicorn.conf.py            # Linux (config em gunicorn.conf.py)
+    waitress-serve --threads=32 wsgi:app    # Windows
+
+Com preload_app (gunicorn.conf.py) este módulo é importado uma única vez,
+no processo mestre, antes dos workers serem criados: a inicialização do
+banco roda uma vez só e o app já importado fica em páginas de memória
+compartilhadas com os workers.
+
+create_app() não carrega openpyxl nem reportlab (a subida do `flask run` e
+da CLI fica leve, ver benchmark_inicializacao.py); em produção eles são
+importados aqui, no mestre, para a primeira exportação de cada worker não
+pagar o import. O matplotlib fica de fora: os gráficos são desenhados no
+pool de processos de app/graficos.py, que carrega o matplotlib no próprio
+initializer (processos spawn não herdam os imports do mestre).
+"""
+import importlib
+
+from app import db
+from app.inicializacao import inicializar_banco
+from run import app
+
+# Bibliotecas das exportações, carregadas no mestre (ver acima)
+for modulo in ('openpyxl', 'openpyxl.styles', 'reportlab.lib.styles', 'reportlab.platypus'):
+    importlib.import_module(modulo)
+
+# Banco fora da versão do código (ou falha na inicialização): o gunicorn
+# não sobe os workers, em vez de atender com um schema diferente do modelo
+if not inicializar_banco(app):
+    raise SystemExit("Banco de dados não inicializado (ver aviso acima).")
+
+# O mestre não atende requisições: fecha as conexões abertas pela
+# inicialização (nos dois engines, o principal e o somente leitura) para
+# nenhum worker herdar um socket/arquivo do SQLite.
+with app.app_context():
+    for engine in db.engines.values():
+        engine.dispose()